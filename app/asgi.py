@@ -0,0 +1,17 @@
+# app/asgi.py
+"""
+ASGI entry point serving the async endpoints, e.g. `hypercorn app.asgi:app`.
+"""
+from quart import Quart
+from quart_cors import cors
+
+from app.controllers.async_controller import async_app
+
+
+def create_async_app():
+    app = cors(Quart(__name__))
+    app.register_blueprint(async_app)
+    return app
+
+
+app = create_async_app()
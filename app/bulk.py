@@ -0,0 +1,266 @@
+"""
+Offline bulk parsing of scheduling orders, for backfilling archives without
+going through the HTTP endpoints.
+The documents are parsed with PdfService on a pool of worker processes which
+load the spaCy pipeline once. One JSON record per document is appended to the
+output file as soon as it is parsed, with the case details, the events, the
+timings or the error. The output file is also the checkpoint: when the run is
+started again, documents already in it are skipped.
+
+Documents are either local PDFs, found in a directory, or the entries of a
+manifest file with one local path or S3 key (key or s3://bucket/key) per line.
+Local files are copied before parsing, the originals are never modified.
+
+Usage:
+    python -m app.bulk archive/ --output results.jsonl --workers 8
+    python -m app.bulk keys.txt --bucket orders --output results.jsonl
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from app import config
+from app.services import profiles
+from app.services.pdf_service import PdfService, document_hash
+
+_s3_client = None
+
+
+def find_documents(source):
+    """
+    Lists the documents to parse.
+
+    Args:
+        source (str): A directory, searched recursively for PDFs, or a manifest
+            file with one path or S3 key per line. Blank lines and lines
+            starting with # are skipped.
+
+    Returns:
+        list: The document sources, in a stable order.
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(root, name)
+                      for root, _, names in os.walk(source)
+                      for name in names if name.lower().endswith(".pdf"))
+    with open(source, encoding="utf-8") as manifest:
+        lines = (line.strip() for line in manifest)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def load_checkpoint(output, retry_errors=False):
+    """
+    Returns the sources already in the output file.
+    A record cut short by an interruption is ignored, its document is parsed again.
+
+    Args:
+        output (str): The JSONL output file.
+        retry_errors (bool): Leave out failed documents, so they are parsed again.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or "source" not in record:
+                # A truncated or hand-edited line, the document is parsed again
+                continue
+            if retry_errors and record.get("status") != "ok":
+                continue
+            done.add(record["source"])
+    return done
+
+
+def _drop_cut_record(output):
+    """
+    Truncates the output file after its last complete line, so the records
+    appended next don't run into a record cut short by an interruption.
+    """
+    if not os.path.exists(output):
+        return
+    with open(output, "rb+") as file:
+        end = position = file.seek(0, os.SEEK_END)
+        while position > 0:
+            size = min(4096, position)
+            position -= size
+            file.seek(position)
+            newline = file.read(size).rfind(b"\n")
+            if newline != -1:
+                position += newline + 1
+                break
+        if position < end:
+            file.truncate(position)
+
+
+def _init_worker(profile):
+    # The documents already keep every core busy
+    config.EVENT_WORKERS = 0
+    # The records aren't sent to clients, so they keep the memory figures
+    config.MEMORY_REPORT = True
+    profiles.load_pipeline(profile)
+
+
+def _fetch(source, bucket, directory):
+    """
+    Copies a local document or downloads an S3 object into the directory.
+
+    Returns:
+        str: The path of the copy.
+    """
+    global _s3_client
+    filepath = os.path.join(directory, "document.pdf")
+    if os.path.exists(source):
+        shutil.copyfile(source, filepath)
+        return filepath
+
+    key = source
+    if source.startswith("s3://"):
+        bucket, _, key = source[len("s3://"):].partition("/")
+    if not bucket:
+        raise Exception("Error fetching document:", f"No such file or S3 bucket for {source}")
+    if _s3_client is None:
+        import boto3
+        _s3_client = boto3.client("s3")
+    _s3_client.download_file(bucket, key, filepath)
+    return filepath
+
+
+def process_document(source, profile=None, bucket=None, index=True):
+    """
+    Parses one document, in a worker process.
+
+    Args:
+        source (str): Local path or S3 key of the document.
+        profile (str): The parser profile.
+        bucket (str): S3 bucket of keys without s3://, defaults to config.S3_BUCKET.
+        index (bool): Add the result to the case index.
+
+    Returns:
+        dict: The JSON record of the document.
+    """
+    record = {"source": source, "worker": os.getpid()}
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bulk-") as directory:
+            filepath = _fetch(source, bucket or config.S3_BUCKET, directory)
+            fetched = time.perf_counter()
+            doc_hash = document_hash(filepath)
+            service = PdfService(filepath=filepath, profile=profile,
+                                 doc_hash=doc_hash if index else None)
+            details = service.parse_pdf(False)
+        record.update({
+            "status": "ok",
+            "documentHash": doc_hash,
+            "case": details["case"],
+            "events": [event.to_dict() for event in details["events"]],
+            "length": details["length"],
+            "meta": details.get("meta", {}),
+            "timings": {"fetch": round(fetched - start, 4),
+                        "parse": round(time.perf_counter() - fetched, 4)},
+        })
+    except Exception as error:
+        record.update({"status": "error", "error": str(error),
+                       "timings": {"total": round(time.perf_counter() - start, 4)}})
+    return record
+
+
+def run(sources, output, workers=None, profile=None, bucket=None, index=True,
+        retry_errors=False, progress=None):
+    """
+    Parses the documents which are not in the output file yet.
+
+    Args:
+        sources (list): Local paths or S3 keys, see find_documents.
+        output (str): The JSONL file the records are appended to.
+        workers (int): Worker processes, defaults to the number of CPUs.
+        profile (str): The parser profile.
+        bucket (str): S3 bucket of keys without s3://.
+        index (bool): Add the results to the case index.
+        retry_errors (bool): Parse documents which failed in an earlier run again.
+        progress (callable): Called with each record as it is written.
+
+    Returns:
+        dict: The number of documents parsed, failed and skipped and the elapsed seconds.
+    """
+    profile = profiles.get_profile(profile)["name"]
+    done = load_checkpoint(output, retry_errors)
+    pending = [source for source in dict.fromkeys(sources) if source not in done]
+    summary = {"parsed": 0, "failed": 0, "skipped": len(sources) - len(pending)}
+    start = time.perf_counter()
+    if not pending:
+        summary["seconds"] = 0.0
+        return summary
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(config.EVENT_WORKER_START_METHOD),
+        initializer=_init_worker,
+        initargs=(profile,),
+    )
+    queue = iter(pending)
+    in_flight = set()
+    _drop_cut_record(output)
+    try:
+        with open(output, "a", encoding="utf-8") as file:
+            while True:
+                # A few documents per worker, so a long manifest isn't queued at once
+                for source in queue:
+                    in_flight.add(executor.submit(
+                        process_document, source, profile, bucket, index))
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    break
+                finished, in_flight = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    file.write(json.dumps(record) + "\n")
+                    file.flush()
+                    summary["parsed" if record["status"] == "ok" else "failed"] += 1
+                    if progress:
+                        progress(record)
+    finally:
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True)
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("source", help="directory of PDFs or manifest file")
+    arg_parser.add_argument("--output", required=True, help="JSONL file, also the checkpoint")
+    arg_parser.add_argument("--workers", type=int, default=None,
+                            help="worker processes, defaults to the number of CPUs")
+    arg_parser.add_argument("--profile", default=None, help="parser profile")
+    arg_parser.add_argument("--bucket", default=None,
+                            help="S3 bucket of manifest keys, defaults to S3_BUCKET")
+    arg_parser.add_argument("--no-index", dest="index", action="store_false",
+                            help="don't add the results to the case index")
+    arg_parser.add_argument("--retry-errors", action="store_true",
+                            help="parse documents which failed in an earlier run again")
+    args = arg_parser.parse_args()
+
+    def progress(record):
+        print(record["status"], record["source"], record.get("error", ""), file=sys.stderr)
+
+    summary = run(find_documents(args.source), args.output, args.workers, args.profile,
+                  args.bucket, args.index, args.retry_errors, progress)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,75 @@ from dotenv import load_dotenv
 load_dotenv()
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 S3_BUCKET = os.environ.get("S3_BUCKET")
+
+# Pre-flight limits applied before a file is handed to the parser
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+MAX_PDF_PAGES = int(os.environ.get("MAX_PDF_PAGES", 100))
+
+# Concurrency limits, 0 disables the limit
+MAX_CONCURRENT_UPLOADS = int(os.environ.get("MAX_CONCURRENT_UPLOADS", 4))
+MAX_CONCURRENT_ORDER_DETAILS = int(
+    os.environ.get("MAX_CONCURRENT_ORDER_DETAILS", 4))
+MAX_CONCURRENT_PARSES = int(os.environ.get("MAX_CONCURRENT_PARSES", 6))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", 5))
+
+# Caption layout templates, set LAYOUT_TEMPLATE_PATH to keep them across restarts
+LAYOUT_TEMPLATE_CACHE_SIZE = int(
+    os.environ.get("LAYOUT_TEMPLATE_CACHE_SIZE", 256))
+LAYOUT_TEMPLATE_PATH = os.environ.get("LAYOUT_TEMPLATE_PATH")
+
+# Parser profile used when a request doesn't pick one: "accurate", "balanced" or "fast"
+PARSER_PROFILE = os.environ.get("PARSER_PROFILE", "accurate")
+# Overrides the sentence splitting of the profile: "spacy" (dependency parser) or "rules"
+SENTENCE_SEGMENTER = os.environ.get("SENTENCE_SEGMENTER")
+
+# Section-level parallelism in get_events, 0 or 1 keeps it in the request process
+EVENT_WORKERS = int(os.environ.get("EVENT_WORKERS", 0))
+EVENT_PARALLEL_MIN_CHARS = int(os.environ.get("EVENT_PARALLEL_MIN_CHARS", 20000))
+EVENT_WORKER_START_METHOD = os.environ.get("EVENT_WORKER_START_METHOD", "spawn")
+
+# Responses smaller than this are sent uncompressed
+RESPONSE_COMPRESSION_MIN_BYTES = int(
+    os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+
+# Parsed documents whose revision is kept for incremental re-parsing of amended orders
+REVISION_CACHE_SIZE = int(os.environ.get("REVISION_CACHE_SIZE", 128))
+
+# Cropped page text, keyed by page content. Set PAGE_TEXT_CACHE_DIR to keep it on disk too
+PAGE_TEXT_CACHE_SIZE = int(os.environ.get("PAGE_TEXT_CACHE_SIZE", 2048))
+PAGE_TEXT_CACHE_DIR = os.environ.get("PAGE_TEXT_CACHE_DIR")
+PAGE_TEXT_CACHE_DISK_SIZE = int(
+    os.environ.get("PAGE_TEXT_CACHE_DISK_SIZE", 10000))
+
+# SQLite index of parsed orders behind the /cases, /documents and /events lookups
+CASE_INDEX_PATH = os.environ.get("CASE_INDEX_PATH", "./case_index.db")
+# Seconds a write waits for a locked index, parse results are returned even if it fails
+CASE_INDEX_TIMEOUT = int(os.environ.get("CASE_INDEX_TIMEOUT", 5))
+
+# Crop boxes found for a document, keyed by its page contents
+CROP_BOX_CACHE_SIZE = int(os.environ.get("CROP_BOX_CACHE_SIZE", 256))
+
+# Threads of the async app (app.asgi) which wait on S3 transfers
+ASYNC_IO_WORKERS = int(os.environ.get("ASYNC_IO_WORKERS", 32))
+
+# Memory budget of a worker process in MB, 0 disables it. Documents expected to exceed
+# it are parsed page by page, MEMORY_BYTES_PER_CHAR estimates the cost of the text
+MEMORY_BUDGET_MB = int(os.environ.get("MEMORY_BUDGET_MB", 0))
+MEMORY_BYTES_PER_CHAR = int(os.environ.get("MEMORY_BYTES_PER_CHAR", 200))
+# Longest text given to spaCy at once in low-memory processing
+LOW_MEMORY_CHUNK_CHARS = int(os.environ.get("LOW_MEMORY_CHUNK_CHARS", 4000))
+# Trace Python allocations per stage with tracemalloc, slows parsing down
+MEMORY_TRACEMALLOC = os.environ.get("MEMORY_TRACEMALLOC", "").lower() in ("1", "true", "yes")
+# Add the memory figures of each parse to the response meta, they describe the server process
+MEMORY_REPORT = os.environ.get("MEMORY_REPORT", "").lower() in ("1", "true", "yes")
+
+# How authorized requests use ChatGPT: "wait" for its events, or "hedged" to extract the
+# rule-based events meanwhile and return them if ChatGPT misses GPT_DEADLINE_SECONDS
+GPT_MODE = os.environ.get("GPT_MODE", "wait")
+GPT_DEADLINE_SECONDS = float(os.environ.get("GPT_DEADLINE_SECONDS", 8))
+GPT_HEDGE_WORKERS = int(os.environ.get("GPT_HEDGE_WORKERS", 8))
+# ChatGPT events of hedged requests kept by document hash, late ones upgrade the next request
+GPT_RESULT_CACHE_SIZE = int(os.environ.get("GPT_RESULT_CACHE_SIZE", 256))
+
+# Skip the sentences of get_events which can't contain a date before spaCy and dateparser
+DATE_PRESCREEN = os.environ.get("DATE_PRESCREEN", "true").lower() in ("1", "true", "yes")
@@ -0,0 +1,95 @@
+"""
+Admission control for the parsing endpoints.
+Each endpoint gets its own concurrency limit (429 when saturated) and all of
+them share a service wide parse limit (503 when saturated), so a burst on one
+endpoint can't starve the rest of the service.
+"""
+import functools
+import inspect
+import threading
+
+from app import config
+
+
+class ConcurrencyLimiter:
+    """
+    Non-blocking counting semaphore. A limit of 0 (or None) never rejects.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit) if limit else None
+
+    def acquire(self):
+        """
+        Returns True if a slot was taken, False if the limiter is saturated.
+        """
+        if self._semaphore is None:
+            return True
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        """
+        Frees a slot taken with acquire.
+        """
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+
+parse_limiter = ConcurrencyLimiter(config.MAX_CONCURRENT_PARSES)
+
+
+def _busy_response(message, status_code):
+    # A view return value, so it works for the Flask and the Quart endpoints
+    return ({"error": message}, status_code,
+            {"Retry-After": str(config.RETRY_AFTER_SECONDS)})
+
+
+def limit_concurrency(limit):
+    """
+    Decorator which rejects a request when the endpoint already has `limit`
+    requests in flight (429) or when the service wide parse limit is reached (503).
+    Works for plain and async views.
+    """
+    endpoint_limiter = ConcurrencyLimiter(limit)
+
+    def admit():
+        if not endpoint_limiter.acquire():
+            return _busy_response(
+                "Too many requests for this endpoint, please retry later", 429)
+        if not parse_limiter.acquire():
+            endpoint_limiter.release()
+            return _busy_response(
+                "Service is at capacity, please retry later", 503)
+        return None
+
+    def release():
+        parse_limiter.release()
+        endpoint_limiter.release()
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(*args, **kwargs):
+                rejected = admit()
+                if rejected:
+                    return rejected
+                try:
+                    return await view(*args, **kwargs)
+                finally:
+                    release()
+        else:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                rejected = admit()
+                if rejected:
+                    return rejected
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    release()
+
+        wrapper.limiter = endpoint_limiter
+        return wrapper
+
+    return decorator
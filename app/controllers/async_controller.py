@@ -0,0 +1,196 @@
+"""
+Async variant of the endpoints, served by app.asgi on an ASGI server.
+S3 transfers run on a dedicated I/O thread pool and OpenAI requests are
+awaited, so a request waiting on the network doesn't hold a worker.
+Parsing is CPU bound and runs on a separate parse executor.
+The routes and responses are the same as app.controllers.controller,
+both serve the view logic of app.controllers.common.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Blueprint, Response, request
+
+from app import config
+from app.controllers import common
+from app.controllers.admission import limit_concurrency
+from app.controllers.responses import make_api_response as _make_api_response
+from app.controllers.responses import not_modified as _not_modified
+from app.services.pdf_service import PdfService, document_hash, temp_path
+from app.services.preflight import PreflightError, check_pdf_stream
+from app.services.singleflight import flights
+
+async_app = Blueprint("async_app", __name__)
+
+# S3 calls wait on the network, parsing keeps a core busy
+io_executor = ThreadPoolExecutor(config.ASYNC_IO_WORKERS,
+                                 thread_name_prefix="s3-io")
+parse_executor = ThreadPoolExecutor(config.MAX_CONCURRENT_PARSES or None,
+                                    thread_name_prefix="parse")
+
+
+async def run_io(func, *args, **kwargs):
+    """
+    Runs a blocking I/O call on the I/O thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_cpu(func, *args, **kwargs):
+    """
+    Runs a CPU bound call on the parse executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_executor, functools.partial(func, *args, **kwargs))
+
+
+def make_api_response(payload, **kwargs):
+    return _make_api_response(payload, req=request, response_class=Response, **kwargs)
+
+
+def not_modified(doc_hash, variant):
+    return _not_modified(doc_hash, variant, req=request, response_class=Response)
+
+
+async def run_steps(steps):
+    """
+    Runs the steps of a view from app.controllers.common on the executors.
+    """
+    return await common.run_steps_async(steps, run_io, run_cpu, parse_executor)
+
+
+@async_app.route("/", methods=["GET"])
+async def index():
+    """
+    Index page for the server
+    """
+    return "You have reached the Homepage of LegalAid Backend"
+
+
+async def _save_and_parse(file, profile, is_authorized, upload_hash, amends):
+    """
+    Saves an upload to a unique temporary path, parses it and removes it.
+    """
+    # Quart's FileStorage.save is a coroutine, so the file is saved here
+    filepath = temp_path(file.filename)
+    await file.save(filepath)
+    try:
+        pdf_service = PdfService(filepath=filepath, profile=profile, doc_hash=upload_hash,
+                                 amends=amends)
+        return await pdf_service.parse_pdf_async(is_authorized, parse_executor)
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+@async_app.route("/order-details", methods=["GET"])
+@limit_concurrency(config.MAX_CONCURRENT_ORDER_DETAILS)
+async def get_details():
+    """
+    Checks if the request contains the file name,
+    Get the file from S3 bucket and process it.
+    Supports conditional requests with If-None-Match.
+    Returns
+        200 : Suceess
+        304 : Not modified
+        400 : Invalid file
+        413 : File too large
+        429/503 : Too many requests in flight
+    """
+    steps = common.order_details(request.args, request.headers,
+                                 make_api_response, not_modified)
+    return await run_steps(steps)
+
+
+@async_app.route("/upload", methods=["POST"])
+@limit_concurrency(config.MAX_CONCURRENT_UPLOADS)
+async def upload_file():
+    """
+    Checks if the request consists of a pdf file and
+    saves it in as a temporary file before processing it.
+    Sends the file to pdfparser and returns the case and events in a json format (as dict).
+    Returns
+        200 : Suceess
+        400 : Invalid file
+        413 : File too large
+        429/503 : Too many requests in flight
+    """
+    try:
+        files = await request.files
+        if "file" not in files:
+            return {"error": "No file provided"}, 400
+
+        file = files["file"]
+        if not file.filename.lower().endswith(".pdf"):
+            return {"error": "Invalid file format, only PDF files are allowed"}, 400
+        await run_cpu(check_pdf_stream, file.stream)
+
+        is_authorized, profile, amends = common.upload_options(await request.form)
+        upload_hash = document_hash(file.stream)
+        variant = common.make_variant(is_authorized, profile, amends)
+
+        # Uploads of the same bytes in flight share one parse
+        case_and_events, _ = await flights.do_async(
+            ("upload", upload_hash, variant), _save_and_parse,
+            file, profile, is_authorized, upload_hash, amends)
+
+        return make_api_response(case_and_events, document_hash=upload_hash,
+                                 variant=variant)
+
+    except PreflightError as error:
+        return {"error": error.message}, error.status_code
+
+    except Exception as error:
+        return {"error": str(error)}, 400
+
+
+@async_app.route("/cases/<case_num>", methods=["GET"])
+async def get_case(case_num):
+    """
+    Returns the case details and events of the latest parsed order of a case.
+    Returns
+        200 : Success
+        404 : Case not parsed yet
+        500 : Error
+    """
+    return await run_steps(common.get_case(case_num, make_api_response))
+
+
+@async_app.route("/cases/<case_num>/documents", methods=["GET"])
+async def get_case_documents(case_num):
+    """
+    Lists the parsed orders of a case, newest first.
+    Returns
+        200 : Success
+        404 : Case not parsed yet
+        500 : Error
+    """
+    return await run_steps(common.get_case_documents(case_num, make_api_response))
+
+
+@async_app.route("/documents/<doc_hash>", methods=["GET"])
+async def get_document(doc_hash):
+    """
+    Returns the parse result of a document by its SHA-256 hash.
+    Returns
+        200 : Success
+        404 : Document not parsed yet
+        500 : Error
+    """
+    return await run_steps(common.get_document(doc_hash, make_api_response))
+
+
+@async_app.route("/events", methods=["GET"])
+async def get_events_between():
+    """
+    Returns the events between the from and to dates (YYYY-MM-DD, inclusive)
+    of the latest order of every case, optionally only for one court.
+    Returns
+        200 : Success
+        400 : Missing or invalid dates
+        500 : Error
+    """
+    return await run_steps(common.get_events_between(request.args, make_api_response))
@@ -0,0 +1,275 @@
+"""
+View logic shared by the Flask endpoints (app.controllers.controller) and
+their async variant (app.controllers.async_controller).
+The views are written once, as generators of steps: every blocking call is
+yielded as a (kind, func, args) tuple and its result is sent back. The Flask
+views run the steps in the request thread with run_steps, the async views
+run them on their executors with run_steps_async.
+Responses are built with the make_api_response and not_modified of the
+calling controller, errors are returned as ({"error": ...}, status).
+"""
+import json
+import os
+from datetime import date
+
+import boto3
+
+from app import config
+from app.services.case_index import case_index
+from app.services.pdf_service import PdfService, document_hash, temp_path
+from app.services.preflight import PreflightError, check_pdf_file, check_size
+from app.services.profiles import get_profile
+from app.services.singleflight import flights
+
+# Kinds of steps
+IO = "io"  # Waits on the network or the disk
+CPU = "cpu"  # Keeps a core busy
+PARSE = "parse"  # Parses with the PdfService func
+FLIGHT = "flight"  # Runs the steps in args once for the key func, see SingleFlight
+
+
+def make_variant(is_authorized, profile, amends):
+    """
+    Request options which change the parse result, part of the ETag.
+    """
+    return f"{is_authorized}|{profile}|{amends or ''}"
+
+
+def upload_options(form):
+    """
+    Reads the options of an upload from the data field of the form.
+
+    Returns:
+        tuple: is_authorized, the profile name and the hash of the amended order.
+    """
+    is_authorized = False
+    profile = None
+    amends = None
+    if "data" in form:
+        request_data = json.loads(form.get('data'))
+        # Check if 'is_authorized' is present in the request body and is a boolean
+        is_authorized = request_data.get('is_authorized')
+        if is_authorized is None or not isinstance(is_authorized, bool):
+            is_authorized = False
+        profile = request_data.get('profile')
+        # SHA-256 of the previous version when the order is an amendment
+        amends = request_data.get('amends')
+        if not isinstance(amends, str):
+            amends = None
+    # Reject unknown profiles before any parsing
+    profile = get_profile(profile)["name"]
+    return is_authorized, profile, amends
+
+
+def _head_object(s3_client, filename):
+    return s3_client.head_object(Bucket=config.S3_BUCKET, Key=filename)
+
+
+def _upload_pdf(s3_client, filepath, bucket_name, filename):
+    s3_client.upload_file(filepath, bucket_name, filename, ExtraArgs={
+        'ContentType': 'application/pdf'})
+
+
+def fetch_and_parse(s3_client, filename, profile, is_authorized, amends, variant,
+                    not_modified):
+    """
+    Steps which download an order from S3, parse it and upload the masked
+    file back. The parse is skipped when the request already has the events
+    of the downloaded file.
+
+    Returns:
+        tuple: The hash of the downloaded file, the parse result (None when
+            skipped) and the hash of the masked file.
+    """
+    bucket_name = config.S3_BUCKET
+    filepath = temp_path(filename)
+    yield IO, s3_client.download_file, (bucket_name, filename, filepath)
+    try:
+        yield CPU, check_pdf_file, (filepath,)
+        # The client already has the events of this exact (masked) file
+        original_hash = yield IO, document_hash, (filepath,)
+        if not_modified(original_hash, variant):
+            return original_hash, None, None
+
+        pdf_service = PdfService(filepath=filepath, profile=profile,
+                                 doc_hash=original_hash, amends=amends,
+                                 hash_saved_file=True)
+        case_and_events = yield PARSE, pdf_service, (is_authorized,)
+
+        # re-upload the updated(masked) file to s3
+        yield IO, _upload_pdf, (s3_client, filepath, bucket_name, filename)
+        # The ETag and the case index describe the file now stored in S3
+        return original_hash, case_and_events, pdf_service.index_hash
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def order_details(args, headers, make_api_response, not_modified):
+    """
+    Steps of /order-details, see controller.get_details.
+    """
+    try:
+        filename = str(args['filename'])
+        profile = args.get("profile") or headers.get("Parser-Profile")
+        # Reject unknown profiles before any download or parsing
+        profile = get_profile(profile)["name"]
+        is_authorized = headers['Is-Authorized'].lower() == "true"
+        # SHA-256 of the previous version when the order is an amendment
+        amends = args.get("amends")
+        variant = make_variant(is_authorized, profile, amends)
+        s3_client = boto3.client('s3')
+        # Reject oversized objects before downloading them
+        head = yield IO, _head_object, (s3_client, filename)
+        check_size(head["ContentLength"])
+
+        # Requests for the same object version share one download and parse.
+        # A call which only answered its own request with a 304 has no events,
+        # the others then join the next call or parse it themselves.
+        key = ("order-details", filename, head.get("ETag"), variant)
+        while True:
+            steps = fetch_and_parse(s3_client, filename, profile, is_authorized,
+                                    amends, variant, not_modified)
+            (original_hash, case_and_events, masked_hash), _ = yield FLIGHT, key, (steps,)
+            cached = not_modified(original_hash, variant)
+            if cached:
+                return cached
+            if case_and_events is not None:
+                break
+
+        return make_api_response(case_and_events, document_hash=masked_hash,
+                                 variant=variant)
+
+    except PreflightError as error:
+        return {"error": error.message}, error.status_code
+
+    except Exception as error:
+        return {"error": str(error)}, 400
+
+
+def get_case(case_num, make_api_response):
+    """
+    Steps of /cases/<case_num>, see controller.get_case.
+    """
+    try:
+        case = yield IO, case_index.get_case, (case_num,)
+        if case is None:
+            return {"error": f"No parsed order for case {case_num}"}, 404
+        return make_api_response(case)
+
+    except Exception as error:
+        return {"error": str(error)}, 500
+
+
+def get_case_documents(case_num, make_api_response):
+    """
+    Steps of /cases/<case_num>/documents, see controller.get_case_documents.
+    """
+    try:
+        documents = yield IO, case_index.case_documents, (case_num,)
+        if not documents:
+            return {"error": f"No parsed order for case {case_num}"}, 404
+        return make_api_response({"caseNum": case_num, "documents": documents})
+
+    except Exception as error:
+        return {"error": str(error)}, 500
+
+
+def get_document(doc_hash, make_api_response):
+    """
+    Steps of /documents/<doc_hash>, see controller.get_document.
+    """
+    try:
+        document = yield IO, case_index.get_document, (doc_hash.lower(),)
+        if document is None:
+            return {"error": "Document not parsed yet"}, 404
+        return make_api_response(document)
+
+    except Exception as error:
+        return {"error": str(error)}, 500
+
+
+def get_events_between(args, make_api_response):
+    """
+    Steps of /events, see controller.get_events_between.
+    """
+    try:
+        start = date.fromisoformat(args["from"]).isoformat()
+        end = date.fromisoformat(args["to"]).isoformat()
+    except (KeyError, ValueError):
+        return {"error": "from and to must be dates as YYYY-MM-DD"}, 400
+
+    try:
+        events = yield IO, case_index.events_between, (start, end, args.get("court"))
+        return make_api_response({"events": events, "length": len(events)})
+
+    except Exception as error:
+        return {"error": str(error)}, 500
+
+
+def run_steps(steps):
+    """
+    Runs the steps of a view in the calling thread.
+
+    Returns:
+        The return value of the steps.
+    """
+    value, error = None, None
+    try:
+        while True:
+            try:
+                if error is None:
+                    kind, func, args = steps.send(value)
+                else:
+                    kind, func, args = steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                if kind == PARSE:
+                    value = func.parse_pdf(*args)
+                elif kind == FLIGHT:
+                    value = flights.do(func, run_steps, *args)
+                else:
+                    value = func(*args)
+            except Exception as exc:
+                error = exc
+    finally:
+        # Runs the cleanup of steps left behind, e.g. by a cancelled request
+        steps.close()
+
+
+async def run_steps_async(steps, run_io, run_cpu, parse_executor):
+    """
+    Runs the steps of a view on the executors of the async views:
+    IO steps with run_io, CPU steps with run_cpu and parses on parse_executor.
+
+    Returns:
+        The return value of the steps.
+    """
+    value, error = None, None
+    try:
+        while True:
+            try:
+                if error is None:
+                    kind, func, args = steps.send(value)
+                else:
+                    kind, func, args = steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                if kind == PARSE:
+                    value = await func.parse_pdf_async(*args, parse_executor)
+                elif kind == FLIGHT:
+                    value = await flights.do_async(func, run_steps_async, *args,
+                                                   run_io, run_cpu, parse_executor)
+                elif kind == CPU:
+                    value = await run_cpu(func, *args)
+                else:
+                    value = await run_io(func, *args)
+            except Exception as exc:
+                error = exc
+    finally:
+        # Runs the cleanup of steps left behind, e.g. by a cancelled request
+        steps.close()
@@ -4,11 +4,13 @@ Handles the calls to make the Outlook API authentication
 Adds new events to the calendar.
 """
 
-import json
-import os
-import boto3
 from flask import Blueprint, jsonify, request
-from app.services.pdf_service import PdfService
+from app.controllers import common
+from app.controllers.admission import limit_concurrency
+from app.controllers.responses import make_api_response, not_modified
+from app.services.pdf_service import PdfService, document_hash
+from app.services.preflight import PreflightError, check_pdf_stream
+from app.services.singleflight import flights
 from app import config
 
 main_app = Blueprint("main_app", __name__)
@@ -24,38 +26,27 @@ def index():
 
 
 @main_app.route("/order-details", methods=["GET"])
+@limit_concurrency(config.MAX_CONCURRENT_ORDER_DETAILS)
 def get_details():
     """
     Checks if the request contains the file name,
     Get the file from S3 bucket and process it.
+    Supports conditional requests with If-None-Match.
     Returns
         200 : Suceess
+        304 : Not modified
+        400 : Invalid file
+        413 : File too large
+        429/503 : Too many requests in flight
         500 : Error
     """
-    try:
-        filename = str(request.args['filename'])
-        filepath = f"./temp_files/{filename}"
-        bucket_name = config.S3_BUCKET
-        s3_client = boto3.client('s3')
-        s3_client.download_file(bucket_name, filename, filepath)
-
-        pdf_service = PdfService(filepath=filepath)
-
-        is_authorized = request.headers['Is-Authorized'].lower() == "true"
-        case_and_events = pdf_service.parse_pdf(is_authorized)
-
-        # re-upload the updated(masked) file to s3
-        s3_client.upload_file(filepath, bucket_name, filename, ExtraArgs={
-            'ContentType': 'application/pdf'})
-        os.remove(filepath)
-
-        return jsonify(case_and_events), 200
-
-    except Exception as error:
-        return jsonify({"error": str(error)}), 400
+    steps = common.order_details(request.args, request.headers,
+                                 make_api_response, not_modified)
+    return common.run_steps(steps)
 
 
 @main_app.route("/upload", methods=["POST"])
+@limit_concurrency(config.MAX_CONCURRENT_UPLOADS)
 def upload_file():
     """
     Checks if the request consists of a pdf file and
@@ -63,6 +54,9 @@ def upload_file():
     Sends the file to pdfparser and returns the case and events in a json format (as dict).
     Returns
         200 : Suceess
+        400 : Invalid file
+        413 : File too large
+        429/503 : Too many requests in flight
         500 : Error
     """
     try:
@@ -76,20 +70,74 @@ def upload_file():
                     {"error": "Invalid file format, only PDF files are allowed"}),
                 400,
             )
+        check_pdf_stream(file.stream)
+
+        is_authorized, profile, amends = common.upload_options(request.form)
+        print("is Auth: ", is_authorized)
+        upload_hash = document_hash(file.stream)
+        variant = common.make_variant(is_authorized, profile, amends)
 
-        is_authorized = False
-        if "data" in request.form:
-            request_data = json.loads(request.form.get('data'))
-            # Check if 'is_authorized' is present in the request body and is a boolean
-            is_authorized = request_data.get('is_authorized')
-            if is_authorized is None or not isinstance(is_authorized, bool):
-                is_authorized = False
-            print("is Auth: ", is_authorized)
+        # Uploads of the same bytes in flight share one parse
+        pdf_service = PdfService(file, profile=profile, doc_hash=upload_hash,
+                                 amends=amends)
+        case_and_events, _ = flights.do(("upload", upload_hash, variant),
+                                        pdf_service.parse_pdf, is_authorized)
 
-        pdf_service = PdfService(file)
-        case_and_events = pdf_service.parse_pdf(is_authorized)
+        return make_api_response(case_and_events, document_hash=upload_hash,
+                                 variant=variant)
 
-        return jsonify(case_and_events), 200
+    except PreflightError as error:
+        return jsonify({"error": error.message}), error.status_code
 
     except Exception as error:
         return jsonify({"error": str(error)}), 400
+
+
+@main_app.route("/cases/<case_num>", methods=["GET"])
+def get_case(case_num):
+    """
+    Returns the case details and events of the latest parsed order of a case,
+    from the case index.
+    Returns
+        200 : Success
+        404 : Case not parsed yet
+        500 : Error
+    """
+    return common.run_steps(common.get_case(case_num, make_api_response))
+
+
+@main_app.route("/cases/<case_num>/documents", methods=["GET"])
+def get_case_documents(case_num):
+    """
+    Lists the parsed orders of a case, newest first.
+    Returns
+        200 : Success
+        404 : Case not parsed yet
+        500 : Error
+    """
+    return common.run_steps(common.get_case_documents(case_num, make_api_response))
+
+
+@main_app.route("/documents/<doc_hash>", methods=["GET"])
+def get_document(doc_hash):
+    """
+    Returns the parse result of a document by its SHA-256 hash.
+    Returns
+        200 : Success
+        404 : Document not parsed yet
+        500 : Error
+    """
+    return common.run_steps(common.get_document(doc_hash, make_api_response))
+
+
+@main_app.route("/events", methods=["GET"])
+def get_events_between():
+    """
+    Returns the events between the from and to dates (YYYY-MM-DD, inclusive)
+    of the latest order of every case, optionally only for one court.
+    Returns
+        200 : Success
+        400 : Missing or invalid dates
+        500 : Error
+    """
+    return common.run_steps(common.get_events_between(request.args, make_api_response))
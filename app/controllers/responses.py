@@ -0,0 +1,180 @@
+"""
+Encoding of the API responses.
+The representation is negotiated from the request headers: MessagePack or
+JSON from Accept, br or gzip compression from Accept-Encoding.
+Responses carry a weak ETag built from the document hash, so clients can make
+conditional requests. Two parses of a document have the same events, but the
+event ids, timings and memory figures differ, so the bodies are only
+equivalent, not byte for byte the same.
+orjson, msgpack and brotli are in the requirements but optional: without them
+responses fall back to the standard library JSON encoder and gzip.
+The async (Quart) endpoints pass their own request and response class.
+"""
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+
+from app import config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+
+def _default(obj):
+    """
+    Serializes the objects the encoders don't know, such as EventRecord.
+    """
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def negotiate(accept_mimetypes, accept_encodings):
+    """
+    Picks the response mimetype and content encoding.
+
+    Args:
+        accept_mimetypes (werkzeug.datastructures.MIMEAccept): The parsed Accept header.
+        accept_encodings (werkzeug.datastructures.Accept): The parsed Accept-Encoding header.
+
+    Returns:
+        tuple: The mimetype and the content encoding ("br", "gzip" or None).
+    """
+    offered = [JSON] + (list(MSGPACK_TYPES) if msgpack else [])
+    mimetype = accept_mimetypes.best_match(offered, default=JSON)
+    if mimetype in MSGPACK_TYPES:
+        mimetype = MSGPACK
+
+    encodings = ["gzip"] + (["br"] if brotli else [])
+    quality = {encoding: accept_encodings[encoding] for encoding in encodings}
+    encoding = max(encodings, key=lambda name: (quality[name], name == "br"))
+    return mimetype, encoding if quality[encoding] else None
+
+
+def encode(payload, mimetype):
+    """
+    Serializes the payload to bytes in the given mimetype.
+    """
+    if mimetype == MSGPACK:
+        return msgpack.packb(payload, default=_default)
+    if orjson:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default).encode("utf-8")
+
+
+def compress(body, encoding):
+    """
+    Compresses the body with the content encoding, None leaves it as is.
+    """
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body)
+    return body
+
+
+def make_etag(document_hash, variant, mimetype, encoding):
+    """
+    Builds the ETag of a representation, sent as a weak ETag.
+
+    Args:
+        document_hash (str): SHA-256 digest of the document the response describes.
+        variant (str): Request options which change the payload, e.g. the profile.
+        mimetype (str): The negotiated mimetype.
+        encoding (str): The negotiated content encoding or None.
+
+    Returns:
+        str: The unquoted ETag.
+    """
+    key = hashlib.sha256(
+        f"{document_hash}|{variant}|{mimetype}".encode("utf-8")).hexdigest()[:32]
+    return f"{key}-{encoding}" if encoding else key
+
+
+def _candidate_etags(req, document_hash, variant):
+    """
+    ETags the request could have been given for the document.
+    """
+    mimetype, encoding = negotiate(req.accept_mimetypes, req.accept_encodings)
+    if encoding and config.RESPONSE_COMPRESSION_MIN_BYTES:
+        # Small bodies are sent uncompressed, so the client may hold either tag
+        return [make_etag(document_hash, variant, mimetype, encoding),
+                make_etag(document_hash, variant, mimetype, None)]
+    return [make_etag(document_hash, variant, mimetype, encoding)]
+
+
+def not_modified(document_hash, variant, req=None, response_class=Response):
+    """
+    Returns a 304 response if the request's If-None-Match matches the document,
+    None otherwise.
+    """
+    req = request if req is None else req
+    etags = _candidate_etags(req, document_hash, variant)
+    if any(req.if_none_match.contains_weak(etag) for etag in etags):
+        response = response_class(status=304)
+        response.set_etag(etags[0], weak=True)
+        return response
+    return None
+
+
+def is_provisional(payload):
+    """
+    Checks if the payload holds rule-based events returned while the ChatGPT
+    events are still pending, see PdfService._parse_hedged.
+    """
+    if not isinstance(payload, dict):
+        return False
+    return bool(payload.get("meta", {}).get("events", {}).get("gptPending"))
+
+
+def make_api_response(payload, status=200, document_hash=None, variant="",
+                      req=None, response_class=Response):
+    """
+    Builds the response for a payload in the negotiated representation.
+
+    Args:
+        payload: JSON serializable data, EventRecord objects are allowed.
+        status (int): The HTTP status code.
+        document_hash (str): SHA-256 digest of the parsed document, adds an ETag.
+            Provisional payloads get no ETag, so the client asks again.
+        variant (str): Request options which change the payload.
+        req: The request to negotiate with, defaults to Flask's request.
+        response_class: The response class to build, defaults to flask.Response.
+
+    Returns:
+        flask.Response: The encoded response.
+    """
+    req = request if req is None else req
+    mimetype, encoding = negotiate(req.accept_mimetypes, req.accept_encodings)
+    body = encode(payload, mimetype)
+    if len(body) < config.RESPONSE_COMPRESSION_MIN_BYTES:
+        encoding = None
+
+    response = response_class(compress(body, encoding),
+                              status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if document_hash and not is_provisional(payload):
+        response.set_etag(make_etag(
+            document_hash, variant, mimetype, encoding), weak=True)
+    return response
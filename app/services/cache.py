@@ -0,0 +1,63 @@
+"""
+Module with the small in-process caches shared by the services
+"""
+import threading
+from collections import OrderedDict
+
+
+class LruCache:
+    """
+    Thread-safe bounded mapping which evicts the least recently used entry.
+
+    Attributes:
+        maxsize: Maximum number of entries kept, 0 disables the cache.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for key and marks it as recently used.
+        """
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        """
+        Stores the value for key, evicting the oldest entry when full.
+        """
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self):
+        """
+        Returns a snapshot of the entries, oldest first.
+        """
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,159 @@
+"""
+Module for querying the caption (top section) of a scheduling order.
+The words of the page are pulled out of PyMuPDF once and kept in arrays so that
+keyword searches and rectangle text queries don't rescan the page.
+"""
+import numpy as np
+import fitz
+
+
+class CaptionIndex:
+    """
+    Array-backed spatial index over the words of a PDF page.
+
+    Attributes:
+        rect: The page rectangle.
+        words: The text of each word, in extraction order.
+        boxes: (n, 4) array with the x0, y0, x1, y1 of each word.
+        lines: (n, 2) array with the block and line number of each word.
+
+    Methods:
+        search: case-insensitive search for a term, like page.search_for.
+        text: text of the words inside a rectangle, like page.get_text(clip=...).
+        line_texts: the text lines inside a rectangle.
+        line_boxes: the text lines inside a rectangle with their bounding boxes.
+    """
+
+    def __init__(self, page):
+        words = page.get_text("words")
+        self.rect = page.rect
+        self.words = [word[4] for word in words]
+        self._lower = [word.lower() for word in self.words]
+        self.boxes = np.array([word[:4] for word in words],
+                              dtype=np.float64).reshape(-1, 4)
+        self.lines = np.array([word[5:7] for word in words],
+                              dtype=np.int64).reshape(-1, 2)
+        # Index of the first word of each text line, words are already in line order
+        if len(words):
+            new_line = np.any(self.lines[1:] != self.lines[:-1], axis=1)
+            self._line_starts = np.concatenate(
+                ([0], np.flatnonzero(new_line) + 1, [len(words)]))
+        else:
+            self._line_starts = np.array([0])
+
+    def _mask(self, clip):
+        """
+        Boolean mask of the words overlapping the clip.
+        """
+        if clip is None:
+            return np.ones(len(self.words), dtype=bool)
+        x0, y0, x1, y1 = self.boxes.T
+        return (x0 < clip.x1) & (x1 > clip.x0) & (y0 < clip.y1) & (y1 > clip.y0)
+
+    def _clipped_lines(self, clip):
+        """
+        Yields the word indices of each text line, keeping only words inside the clip.
+        """
+        mask = self._mask(clip)
+        for start, end in zip(self._line_starts[:-1], self._line_starts[1:]):
+            indices = np.flatnonzero(mask[start:end]) + start
+            if len(indices):
+                yield indices
+
+    def search(self, term, clip=None):
+        """
+        Case-insensitive search for a term, matches can start or end inside a word.
+
+        Args:
+            term (str): The text to search for, may span several words of a line.
+            clip (fitz.Rect): Only search the words inside this rectangle.
+
+        Returns:
+            list: A list of fitz.Rect, one per hit, in reading order.
+        """
+        term = " ".join(term.lower().split())
+        hits = []
+        for indices in self._clipped_lines(clip):
+            line = " ".join(self._lower[i] for i in indices)
+            # Character offset of each word inside the joined line
+            offsets = np.cumsum([0] + [len(self._lower[i]) + 1 for i in indices])
+            start = line.find(term)
+            while start != -1:
+                end = start + len(term)
+                first = np.searchsorted(offsets, start, side="right") - 1
+                last = np.searchsorted(offsets, end - 1, side="right") - 1
+                hits.append(self._hit_rect(
+                    indices[first:last + 1],
+                    start - offsets[first],
+                    end - offsets[last]))
+                start = line.find(term, start + 1)
+        return hits
+
+    def _hit_rect(self, indices, start, end):
+        """
+        Bounding box of a hit, the x coordinates are interpolated for partial words.
+        """
+        boxes = self.boxes[indices]
+        first, last = self.words[indices[0]], self.words[indices[-1]]
+        x0 = boxes[0, 0] + (boxes[0, 2] - boxes[0, 0]) * start / len(first)
+        x1 = boxes[-1, 0] + (boxes[-1, 2] - boxes[-1, 0]) * \
+            min(end, len(last)) / len(last)
+        return fitz.Rect(x0, boxes[:, 1].min(), x1, boxes[:, 3].max())
+
+    def text(self, clip=None):
+        """
+        Text of the words inside a rectangle.
+
+        Args:
+            clip (fitz.Rect): The rectangle to read, the full page if None.
+
+        Returns:
+            str: One line of text per text line, each ending with a newline.
+        """
+        return "".join(
+            " ".join(self._clipped_word(i, clip) for i in indices) + " \n"
+            for indices in self._clipped_lines(clip))
+
+    def _clipped_word(self, index, clip):
+        """
+        Text of a word, dropping the characters that fall outside the clip.
+        Character positions are interpolated evenly across the word box.
+        """
+        word = self.words[index]
+        x0, _, x1, _ = self.boxes[index]
+        if clip is None or (x0 >= clip.x0 and x1 <= clip.x1):
+            return word
+        edges = np.linspace(x0, x1, len(word) + 1)
+        keep = (edges[:-1] < clip.x1) & (edges[1:] > clip.x0)
+        return "".join(char for char, kept in zip(word, keep) if kept)
+
+    def line_texts(self, clip=None):
+        """
+        Text lines inside a rectangle.
+
+        Args:
+            clip (fitz.Rect): The rectangle to read, the full page if None.
+
+        Returns:
+            list: One string per text line, in reading order.
+        """
+        return [" ".join(self.words[i] for i in indices)
+                for indices in self._clipped_lines(clip)]
+
+    def line_boxes(self, clip=None):
+        """
+        Text lines inside a rectangle with their bounding boxes.
+
+        Args:
+            clip (fitz.Rect): The rectangle to read, the full page if None.
+
+        Returns:
+            list: One (text, numpy.ndarray) pair per text line, in reading order,
+                the array holds the x0, y0, x1, y1 of the line.
+        """
+        lines = []
+        for indices in self._clipped_lines(clip):
+            boxes = self.boxes[indices]
+            lines.append((" ".join(self.words[i] for i in indices), np.concatenate(
+                (boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)))))
+        return lines
@@ -0,0 +1,210 @@
+"""
+Module for the persistent index of parsed orders.
+Every parsed document is stored in a local SQLite database with its case
+details and events, indexed by case number, document hash, court and event
+date, so the results can be looked up again without reparsing the PDF.
+The database runs in WAL mode and each thread opens its own connection, so
+several threads and worker processes can read while one of them writes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from app import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_hash TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    case_num TEXT,
+    court TEXT,
+    case_json TEXT NOT NULL,
+    parsed_at REAL NOT NULL,
+    latest INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (doc_hash, profile)
+);
+CREATE INDEX IF NOT EXISTS documents_case ON documents (case_num, latest);
+CREATE INDEX IF NOT EXISTS documents_court ON documents (court);
+CREATE TABLE IF NOT EXISTS events (
+    doc_hash TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    event_id TEXT,
+    subject TEXT,
+    date TEXT,
+    description TEXT,
+    PRIMARY KEY (doc_hash, profile, position)
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date);
+"""
+
+
+class CaseIndex:
+    """
+    SQLite store of parsed documents.
+
+    Attributes:
+        path: The database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=config.CASE_INDEX_TIMEOUT)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def add(self, doc_hash, profile, details):
+        """
+        Stores the parse result of a document, it becomes the latest document of its case.
+
+        Args:
+            doc_hash (str): SHA-256 digest of the parsed file.
+            profile (str): The parser profile used.
+            details (dict): The result of PdfService.parse_pdf.
+        """
+        try:
+            case = details["case"]
+            case_num = case.get("caseNum") or None
+            connection = self._connection()
+            with connection:
+                if case_num:
+                    connection.execute(
+                        "UPDATE documents SET latest = 0 WHERE case_num = ?", (case_num,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO documents "
+                    "(doc_hash, profile, case_num, court, case_json, parsed_at, latest) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 1)",
+                    (doc_hash, profile, case_num, case.get("court"),
+                     json.dumps(case), time.time()))
+                connection.execute(
+                    "DELETE FROM events WHERE doc_hash = ? AND profile = ?",
+                    (doc_hash, profile))
+                connection.executemany(
+                    "INSERT INTO events "
+                    "(doc_hash, profile, position, event_id, subject, date, description) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(doc_hash, profile, position, event.id, event.subject,
+                      event.date, event.description)
+                     for position, event in enumerate(details["events"])])
+        except Exception as error:
+            raise Exception("Error indexing document:", str(error)) from error
+
+    def get_case(self, case_num):
+        """
+        Returns the latest parsed document of a case, or None.
+
+        Returns:
+            dict: The case details and events, in the shape of the parse response.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM documents WHERE case_num = ? AND latest = 1 "
+            "ORDER BY parsed_at DESC LIMIT 1", (case_num,)).fetchone()
+        return self._document(row) if row else None
+
+    def get_document(self, doc_hash):
+        """
+        Returns the most recent parse of a document, or None.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM documents WHERE doc_hash = ? "
+            "ORDER BY parsed_at DESC LIMIT 1", (doc_hash,)).fetchone()
+        return self._document(row) if row else None
+
+    def case_documents(self, case_num):
+        """
+        Lists every document parsed for a case, newest first.
+        """
+        rows = self._connection().execute(
+            "SELECT d.doc_hash, d.profile, d.court, d.parsed_at, d.latest, "
+            "COUNT(e.position) AS length FROM documents d "
+            "LEFT JOIN events e ON e.doc_hash = d.doc_hash AND e.profile = d.profile "
+            "WHERE d.case_num = ? GROUP BY d.doc_hash, d.profile "
+            "ORDER BY d.parsed_at DESC", (case_num,)).fetchall()
+        return [{
+            "documentHash": row["doc_hash"],
+            "profile": row["profile"],
+            "court": row["court"],
+            "parsedAt": _timestamp(row["parsed_at"]),
+            "latest": bool(row["latest"]),
+            "length": row["length"],
+        } for row in rows]
+
+    def events_between(self, start, end, court=None):
+        """
+        Returns the events dated between start and end (inclusive) of the latest
+        document of every case.
+
+        Args:
+            start (str): First date, YYYY-MM-DD.
+            end (str): Last date, YYYY-MM-DD.
+            court (str): Only return events of this court.
+
+        Returns:
+            list: Event dicts with the case number and court they belong to.
+        """
+        query = (
+            "SELECT e.event_id, e.subject, e.date, e.description, d.case_num, d.court "
+            "FROM events e JOIN documents d "
+            "ON e.doc_hash = d.doc_hash AND e.profile = d.profile "
+            "WHERE d.latest = 1 AND e.date BETWEEN ? AND ?")
+        params = [start, end]
+        if court:
+            query += " AND d.court = ?"
+            params.append(court)
+        query += " ORDER BY e.date, d.case_num, e.position"
+        return [{
+            "id": row["event_id"],
+            "subject": row["subject"],
+            "date": row["date"],
+            "description": row["description"],
+            "caseNum": row["case_num"],
+            "court": row["court"],
+        } for row in self._connection().execute(query, params)]
+
+    def _document(self, row):
+        events = [{
+            "id": event["event_id"],
+            "subject": event["subject"],
+            "date": event["date"],
+            "description": event["description"],
+        } for event in self._connection().execute(
+            "SELECT * FROM events WHERE doc_hash = ? AND profile = ? ORDER BY position",
+            (row["doc_hash"], row["profile"]))]
+        return {
+            "case": json.loads(row["case_json"]),
+            "events": events,
+            "length": len(events),
+            "documentHash": row["doc_hash"],
+            "profile": row["profile"],
+            "parsedAt": _timestamp(row["parsed_at"]),
+        }
+
+    def close(self):
+        """
+        Closes the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+case_index = CaseIndex(config.CASE_INDEX_PATH)
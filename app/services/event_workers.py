@@ -0,0 +1,108 @@
+"""
+Module for running get_events over the sections of a long order on a pool
+of worker processes. Each worker loads the spaCy pipeline once and is kept
+warm between requests.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from app import config
+
+_pools = {}
+_pools_lock = threading.Lock()
+# PdfParser of the current worker process, set by _init_worker
+_worker_parser = None
+
+
+def split_sections(paragraphs, workers):
+    """
+    Groups prepared paragraphs into chunks of whole sections of similar size.
+    A chunk always starts at a section heading (or at the start of the
+    document), so it can be processed without knowing the chunks before it.
+
+    Args:
+        paragraphs (list): (paragraph, heading) tuples from PdfParser._prepare_paragraph.
+        workers (int): The number of worker processes.
+
+    Returns:
+        list: A list of chunks, each a list of (paragraph, heading) tuples.
+    """
+    sections = []
+    for paragraph in paragraphs:
+        if not sections or paragraph[1]:
+            sections.append([])
+        sections[-1].append(paragraph)
+
+    # A few chunks per worker keeps the pool busy when section sizes vary
+    target = sum(len(para) for para, _ in paragraphs) / (workers * 4) or 1
+    chunks, size = [], target
+    for section in sections:
+        if size >= target:
+            chunks.append([])
+            size = 0
+        chunks[-1].extend(section)
+        size += sum(len(para) for para, _ in section)
+    return chunks
+
+
+def map_sections(chunks, workers, profile, segmenter, record=None, stats=None):
+    """
+    Runs PdfParser.section_operations on each chunk in the worker pool.
+
+    Args:
+        record (dict): Filled with the sentence analysis of the workers, see PdfParser.get_events.
+        stats (dict): Filled with the prescreen counts of the workers.
+
+    Returns:
+        list: The operations of each chunk, in the order of the chunks.
+    """
+    pool = get_pool(workers, profile, segmenter)
+    operations = []
+    for chunk_operations, lines, chunk_stats in pool.map(_section_operations, chunks):
+        operations.append(chunk_operations)
+        if record is not None:
+            record.update(lines)
+        if stats is not None:
+            for name, count in chunk_stats.items():
+                stats[name] = stats.get(name, 0) + count
+    return operations
+
+
+def get_pool(workers, profile, segmenter):
+    """
+    Returns the warm pool for the settings, starting it on first use.
+    """
+    key = (workers, profile, segmenter)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(
+                    config.EVENT_WORKER_START_METHOD),
+                initializer=_init_worker,
+                initargs=(profile, segmenter),
+            )
+        return _pools[key]
+
+
+def shutdown_pools():
+    """
+    Stops every worker pool.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+def _init_worker(profile, segmenter):
+    global _worker_parser
+    # Imported here, pdfparser imports this module
+    from app.services.pdfparser import PdfParser
+    _worker_parser = PdfParser(None, segmenter=segmenter, profile=profile)
+
+
+def _section_operations(chunk):
+    lines, stats = {}, {}
+    return _worker_parser.section_operations(chunk, record=lines, stats=stats), lines, stats
@@ -0,0 +1,50 @@
+# app/services/events.py
+"""
+Module with the compact record used for events from parsing to the response
+"""
+import uuid
+
+FIELDS = ("id", "subject", "date", "description")
+
+
+class EventRecord:
+    """
+    A single event of a scheduling order.
+    Uses __slots__ so large batches don't carry a dict per event.
+
+    Attributes:
+        id: Unique id of the event.
+        subject: Title of the procedure.
+        date: Date of the event as YYYY-MM-DD.
+        description: The task to be carried out.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, subject, date, description, event_id=None):
+        self.id = event_id or str(uuid.uuid4())
+        self.subject = subject
+        self.date = date
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a record from a dict with the subject, date, description and optional id keys.
+        """
+        return cls(data.get("subject", ""), data.get("date", ""),
+                   data.get("description", ""), data.get("id"))
+
+    def to_dict(self):
+        """
+        Returns the record as a dict, in the shape of the API response.
+        """
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __eq__(self, other):
+        if not isinstance(other, EventRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+
+    def __repr__(self):
+        return f"EventRecord({self.to_dict()!r})"
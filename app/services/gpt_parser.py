@@ -14,7 +14,31 @@ def get_completion(content, model="gpt-3.5-turbo"):
         response (string): A string
     """
     openai.api_key = config.OPENAI_API_KEY
+    response = openai.ChatCompletion.create(
+        model=model,
+        messages=build_messages(content),
+        temperature=0,  # this is the degree of randomness of the model's output
+    )
+    return parse_completion(response)
+
+
+async def get_completion_async(content, model="gpt-3.5-turbo"):
+    """
+    Same as get_completion, but awaits the OpenAI request instead of blocking the thread.
+    """
+    openai.api_key = config.OPENAI_API_KEY
+    response = await openai.ChatCompletion.acreate(
+        model=model,
+        messages=build_messages(content),
+        temperature=0,  # this is the degree of randomness of the model's output
+    )
+    return parse_completion(response)
+
 
+def build_messages(content):
+    """
+    Builds the chat messages asking for the events of the scheduling order content.
+    """
     prompt = rf"""
     Extract the following details from the scheduling order for each procedure:
     - Procedure title (we will call this the subject)
@@ -42,16 +66,16 @@ def get_completion(content, model="gpt-3.5-turbo"):
     Scheduling order text: ```{content}```
     """
 
-    messages = [
+    return [
         {"role": "system", "content": "You are a legal assistant."},
         {"role": "user", "content": prompt},
     ]
 
-    response = openai.ChatCompletion.create(
-        model=model,
-        messages=messages,
-        temperature=0,  # this is the degree of randomness of the model's output
-    )
+
+def parse_completion(response):
+    """
+    Reads the list of JSON events from the chat completion.
+    """
     # TODO: Add error handling. Make sure it is in json format else retry.
     output = response.choices[0].message["content"]
 
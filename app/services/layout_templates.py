@@ -0,0 +1,114 @@
+"""
+Module for remembering where the caption sections sit on a court's orders.
+Orders from the same court share the same caption layout, so the crop
+rectangles found for one document are reused for the next document whose
+page 0 has the same court header.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import fitz
+import numpy as np
+
+from app import config
+from app.services.cache import LruCache
+
+# Block coordinates are snapped to this grid (in points) before hashing
+GRID = 5
+SECTIONS = ("court", "case", "plaintiff", "defendant")
+# The court lines PdfParser looks for, e.g. "IN THE SUPERIOR COURT OF ..."
+COURT_TERMS = ("superior court", "district court")
+
+
+def layout_fingerprint(caption):
+    """
+    Builds the layout fingerprint of a page from its size and court lines.
+    Only the court header is used: the party names and case number change with
+    every case, so blocks holding them would give each order its own fingerprint.
+
+    Args:
+        caption (CaptionIndex): The word index of page 0.
+
+    Returns:
+        str: A hex digest identifying the layout.
+    """
+    rect = caption.rect
+    top_half = fitz.Rect(0, 0, rect.width, rect.height / 2)
+    digest = hashlib.sha1()
+    digest.update(f"{round(rect.width)}x{round(rect.height)}".encode())
+    for text, box in caption.line_boxes(top_half):
+        text = text.lower()
+        if any(term in text for term in COURT_TERMS):
+            digest.update(np.rint(box / GRID).astype(np.int64).tobytes())
+            digest.update(f"{text}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LayoutTemplateStore:
+    """
+    Bounded store of caption rectangles keyed by layout fingerprint,
+    optionally persisted to a JSON file so templates survive restarts.
+
+    Attributes:
+        path: JSON file the templates are saved to, None keeps them in memory only.
+    """
+
+    def __init__(self, maxsize=256, path=None):
+        self.path = path
+        self._cache = LruCache(maxsize)
+        if path and os.path.exists(path):
+            self._load()
+
+    def get(self, fingerprint):
+        """
+        Returns the rectangles recorded for the fingerprint, or None.
+
+        Returns:
+            dict: A fitz.Rect for each of the court, case, plaintiff and defendant sections.
+        """
+        template = self._cache.get(fingerprint)
+        if template is None:
+            return None
+        return {section: fitz.Rect(template[section]) for section in SECTIONS}
+
+    def put(self, fingerprint, rects):
+        """
+        Records the rectangles found for the fingerprint.
+
+        Args:
+            fingerprint (str): The layout fingerprint of the page.
+            rects (dict): A fitz.Rect for each caption section.
+        """
+        self._cache.put(fingerprint, {section: list(rects[section])
+                                      for section in SECTIONS})
+        if self.path:
+            self._save()
+
+    def clear(self):
+        """
+        Forgets every template.
+        """
+        self._cache.clear()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                for fingerprint, template in json.load(file).items():
+                    self._cache.put(fingerprint, template)
+        except (OSError, ValueError):
+            # A damaged template file only costs us the geometry search
+            pass
+
+    def _save(self):
+        # Write to a temporary file first so readers never see a partial file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp",
+                                         delete=False, encoding="utf-8") as file:
+            json.dump(dict(self._cache.items()), file)
+        os.replace(file.name, self.path)
+
+
+template_store = LayoutTemplateStore(
+    config.LAYOUT_TEMPLATE_CACHE_SIZE, config.LAYOUT_TEMPLATE_PATH)
@@ -0,0 +1,153 @@
+"""
+Module for finding the crop box of every page of an order.
+The text blocks of all pages are loaded into arrays once and the line-number
+gutter, the running header and the footer of each page are found in bulk:
+
+    gutter: the text blocks in the left margin (x1 < 100) hold the pleading
+            line numbers, the body starts at the right edge of the rightmost one.
+    header: short blocks in the top band of the page, separated from the body
+            by a gap, e.g. page headers and filing stamps.
+    footer: short blocks in the bottom band, below the body, e.g. page numbers
+            and document ids.
+
+The crop boxes of a document are cached by a hash of its page contents.
+"""
+import hashlib
+
+import fitz
+import numpy as np
+
+from app import config
+from app.services.cache import LruCache
+from app.services.page_text_cache import page_contents
+
+# Blocks ending left of this x are line-number gutter candidates
+GUTTER_X1 = 100
+# Pages are always cropped by at least this much at the top and bottom
+MIN_MARGIN = 30
+# Height of the header and footer bands, as a fraction of the page height
+BAND = 0.1
+# Header and footer blocks have at most this many words...
+MAX_MARGIN_WORDS = 8
+# ...and are at least this far (in points) from the body
+MIN_GAP = 6
+
+crop_box_cache = LruCache(config.CROP_BOX_CACHE_SIZE)
+
+
+def layout_key(document):
+    """
+    Returns a digest of the contents and sizes of every page of the document,
+    see page_text_cache.page_contents.
+    """
+    digest = hashlib.sha256()
+    for page in document:
+        digest.update(f"{tuple(page.rect)}|{page.rotation}".encode("utf-8"))
+        digest.update(page_contents(page))
+    return digest.hexdigest()
+
+
+def load_blocks(document):
+    """
+    Loads the text blocks of every page into arrays.
+
+    Returns:
+        tuple: The (n, 4) array of block boxes, and arrays with the page
+            number, word count and blank flag of each block.
+    """
+    boxes, pages, words, blank = [], [], [], []
+    for number, page in enumerate(document):
+        for block in page.get_text("blocks"):
+            if block[6] != 0:
+                continue
+            boxes.append(block[:4])
+            pages.append(number)
+            words.append(len(block[4].split()))
+            blank.append(not block[4].strip())
+    return (np.array(boxes, dtype=np.float64).reshape(-1, 4),
+            np.array(pages, dtype=np.int64), np.array(words, dtype=np.int64),
+            np.array(blank, dtype=bool))
+
+
+def find_gutters(boxes, pages, page_count):
+    """
+    Finds the right edge of the line-number gutter of each page.
+    The gutter ends at the x1 of the left-margin block with the largest x0.
+    Pages without left-margin blocks get the median gutter of the other
+    pages, or no gutter at all.
+
+    Returns:
+        numpy.ndarray: The gutter x of each page.
+    """
+    x0, y0, x1, _ = boxes.T
+    candidates = np.flatnonzero((y0 > 10) & (x1 < GUTTER_X1))
+    gutters = np.full(page_count, np.nan)
+    if len(candidates):
+        # Sorted by page, then x0, the topmost block wins ties
+        order = candidates[np.lexsort(
+            (-y0[candidates], x0[candidates], pages[candidates]))]
+        last = np.flatnonzero(np.diff(pages[order], append=page_count))
+        gutters[pages[order[last]]] = x1[order[last]]
+    found = ~np.isnan(gutters)
+    fallback = np.median(gutters[found]) if found.any() else 0
+    return np.where(found, gutters, fallback)
+
+
+def find_bands(boxes, pages, words, blank, gutters, heights):
+    """
+    Finds the bottom of the header band and the top of the footer band of each page.
+
+    Returns:
+        tuple: Arrays with the header y1 and the footer y0 of each page.
+    """
+    page_count = len(heights)
+    headers = np.full(page_count, float(MIN_MARGIN))
+    footers = heights - MIN_MARGIN
+    if not len(boxes):
+        return headers, footers
+
+    x0, y0, x1, y1 = boxes.T
+    height = heights[pages]
+    text = ~blank & (x1 > gutters[pages])
+    short = words <= MAX_MARGIN_WORDS
+    top = text & short & (y1 <= height * BAND)
+    bottom = text & short & (y0 >= height * (1 - BAND))
+    body = text & ~top & ~bottom
+
+    body_top = np.full(page_count, np.inf)
+    body_bottom = np.full(page_count, -np.inf)
+    np.minimum.at(body_top, pages[body], y0[body])
+    np.maximum.at(body_bottom, pages[body], y1[body])
+
+    header = top & (y1 + MIN_GAP <= body_top[pages])
+    footer = bottom & (y0 - MIN_GAP >= body_bottom[pages])
+    np.maximum.at(headers, pages[header], y1[header])
+    np.minimum.at(footers, pages[footer], y0[footer])
+    return headers, footers
+
+
+def find_crop_boxes(document):
+    """
+    Finds the crop box of every page of the document.
+
+    Args:
+        document (fitz.Document): The open PDF.
+
+    Returns:
+        list: A fitz.Rect for each page.
+    """
+    key = layout_key(document)
+    cached = crop_box_cache.get(key)
+    if cached is not None:
+        return [fitz.Rect(rect) for rect in cached]
+
+    boxes, pages, words, blank = load_blocks(document)
+    widths = np.array([page.rect.width for page in document], dtype=np.float64)
+    heights = np.array([page.rect.height for page in document], dtype=np.float64)
+    gutters = find_gutters(boxes, pages, document.page_count)
+    headers, footers = find_bands(boxes, pages, words, blank, gutters, heights)
+
+    rects = [(float(gutter), float(header), float(width), float(footer))
+             for gutter, header, width, footer in zip(gutters, headers, widths, footers)]
+    crop_box_cache.put(key, rects)
+    return [fitz.Rect(rect) for rect in rects]
@@ -0,0 +1,136 @@
+"""
+Module for the memory accounting of a parse request.
+Each stage of a parse (reading the PDF, the case details, the events) records
+the resident set size of the process before and after it, and with
+MEMORY_TRACEMALLOC the peak of the Python allocations during the stage.
+The figures are those of the whole process, so requests parsed at the same
+time in other threads of the worker are included.
+tracemalloc keeps a single peak for the process, so only one stage at a time
+measures it: a stage which starts while another one is traced gets no
+tracedPeak. The tracer is never restarted, which would drop the traces of
+the other requests.
+
+With a memory budget, the parser switches to low-memory processing when the
+projected size of a document would exceed it, see PdfParser.low_memory.
+"""
+import contextlib
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+
+from app import config
+
+MB = 1024 * 1024
+
+# Held by the stage which measures the traced peak
+_trace_lock = threading.Lock()
+
+
+def current_rss():
+    """
+    Returns the resident set size of this process in bytes.
+    Falls back to the peak RSS where /proc isn't available.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(size):
+    return round(size / MB, 1)
+
+
+class MemoryMeter:
+    """
+    Records the memory used by the stages of one parse request.
+
+    Attributes:
+        budget: Memory budget of the process in bytes, 0 disables it.
+        trace: Whether the Python allocations are traced with tracemalloc.
+        stages: The figures recorded for each stage, by stage name.
+        low_memory: Whether the request was switched to low-memory processing.
+    """
+
+    def __init__(self, budget_mb=None, trace=None):
+        budget_mb = config.MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+        self.budget = budget_mb * MB
+        self.trace = config.MEMORY_TRACEMALLOC if trace is None else trace
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.stages = {}
+        self.low_memory = False
+        self._start = current_rss()
+        self._peak = self._start
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Records the memory used while the block runs under the stage name.
+        """
+        # Not blocking: async parses enter stages on the event loop thread
+        tracing = (self.trace and tracemalloc.is_tracing()
+                   and _trace_lock.acquire(blocking=False))
+        if tracing:
+            traced_start, peak_start = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+                peak_start = traced_start
+        before = current_rss()
+        try:
+            yield
+        finally:
+            after = current_rss()
+            self._peak = max(self._peak, before, after)
+            figures = {
+                "rssBefore": _mb(before),
+                "rssAfter": _mb(after),
+                "rssDelta": _mb(after - before),
+            }
+            if tracing:
+                traced, peak = tracemalloc.get_traced_memory()
+                _trace_lock.release()
+                if peak <= peak_start:
+                    # Python 3.8 has no reset_peak: below an earlier peak only
+                    # the growth of the stage is known
+                    peak = max(traced, traced_start)
+                figures["tracedPeak"] = _mb(peak - traced_start)
+            self.stages[name] = figures
+
+    def over_budget(self, projected=0):
+        """
+        Checks if the process would exceed the budget.
+
+        Parameter:
+            projected (int): Bytes the next stage is expected to allocate.
+
+        Returns:
+            bool: True when a budget is set and the RSS plus projected exceeds it.
+        """
+        if not self.budget:
+            return False
+        return current_rss() + projected > self.budget
+
+    def report(self):
+        """
+        Returns the recorded figures in MB, for the response metadata.
+        """
+        return {
+            "rssStart": _mb(self._start),
+            "rssPeak": _mb(self._peak),
+            "budget": _mb(self.budget) if self.budget else None,
+            "lowMemory": self.low_memory,
+            "stages": self.stages,
+        }
@@ -0,0 +1,133 @@
+"""
+Module for caching the cropped text of PDF pages.
+Sorted, clipped text extraction is one of the slowest steps of reading an
+order, and it gives the same text for pages with the same content stream and
+form XObjects, fonts and crop box. Exhibits and boilerplate pages shared across filings are
+read once and then answered from memory, or from a directory of text files
+when PAGE_TEXT_CACHE_DIR is set.
+"""
+import hashlib
+import os
+import tempfile
+
+from app import config
+from app.services.cache import LruCache
+
+# The disk directory is pruned once every this many writes
+PRUNE_EVERY = 100
+
+
+def page_contents(page):
+    """
+    Returns what the page draws: its content stream, plus the stream, name,
+    bounding box and matrix of every form XObject it invokes, at any depth.
+    The content stream alone is the same for all pages which only draw a
+    form, e.g. "q /fzFrm0 Do Q" for pages made with show_pdf_page.
+    """
+    document = page.parent
+    parts = [page.read_contents()]
+    for xref, name, _, bbox in page.get_xobjects():
+        matrix = document.xref_get_key(xref, "Matrix")[1]
+        parts.append(f"|{name}|{tuple(bbox)}|{matrix}|".encode("utf-8"))
+        parts.append(document.xref_stream(xref) or b"")
+    return b"".join(parts)
+
+
+def page_text_key(page, clip):
+    """
+    Builds the cache key of the text of a page inside a clip.
+
+    Args:
+        page (fitz.Page): The page to read.
+        clip (fitz.Rect): The crop box the text is extracted from.
+
+    Returns:
+        str: A hex digest of the page contents, fonts, geometry and clip.
+    """
+    digest = hashlib.sha256()
+    digest.update(page_contents(page))
+    # Font xrefs differ between files, the font names and encodings don't
+    for font in sorted(page.get_fonts(), key=lambda font: font[4]):
+        digest.update("|".join(str(value) for value in font[1:]).encode("utf-8"))
+    digest.update(f"{tuple(page.rect)}|{page.rotation}|{tuple(clip)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """
+    Bounded cache of cropped page text, in memory and optionally on disk.
+
+    Attributes:
+        directory: Directory the texts are written to, None keeps them in memory only.
+        disk_size: Maximum number of files kept in the directory.
+    """
+
+    def __init__(self, maxsize=2048, directory=None, disk_size=10000):
+        self.directory = directory
+        self.disk_size = disk_size
+        self._cache = LruCache(maxsize)
+        self._writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """
+        Returns the text stored for key, or None.
+        """
+        text = self._cache.get(key)
+        if text is None and self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as file:
+                    text = file.read()
+            except OSError:
+                return None
+            self._cache.put(key, text)
+        return text
+
+    def put(self, key, text):
+        """
+        Stores the text of a page.
+        """
+        self._cache.put(key, text)
+        if self.directory:
+            self._save(key, text)
+
+    def clear(self):
+        """
+        Removes every text kept in memory, the directory is left as is.
+        """
+        self._cache.clear()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def _save(self, key, text):
+        try:
+            # Write to a temporary file first so readers never see a partial file
+            with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp",
+                                             delete=False, encoding="utf-8") as file:
+                file.write(text)
+            os.replace(file.name, self._path(key))
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                self._prune()
+        except OSError:
+            # A full or read-only disk only costs us the extraction
+            pass
+
+    def _prune(self):
+        entries = [entry for entry in os.scandir(self.directory)
+                   if entry.name.endswith(".txt")]
+        if len(entries) <= self.disk_size:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.disk_size]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+page_text_cache = PageTextCache(
+    config.PAGE_TEXT_CACHE_SIZE, config.PAGE_TEXT_CACHE_DIR,
+    config.PAGE_TEXT_CACHE_DISK_SIZE)
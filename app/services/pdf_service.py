@@ -1,8 +1,58 @@
 # app/services/pdf_service.py
-import tempfile
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
 import uuid
 
+from app import config
+from app.services import gpt_parser, profiles
+from app.services.cache import LruCache
+from app.services.case_index import case_index
+from app.services.events import EventRecord
+from app.services.memory import MemoryMeter
 from app.services.pdfparser import PdfParser
+from app.services.revisions import Revision, diff_events, revision_store
+
+logger = logging.getLogger(__name__)
+
+# Threads waiting on ChatGPT while the rule-based events are extracted
+gpt_executor = concurrent.futures.ThreadPoolExecutor(config.GPT_HEDGE_WORKERS,
+                                                     thread_name_prefix="gpt")
+# ChatGPT events of hedged requests by document hash, including the late ones
+gpt_result_cache = LruCache(config.GPT_RESULT_CACHE_SIZE)
+
+
+def document_hash(source):
+    """
+    Returns the SHA-256 hex digest of a document.
+
+    Parameter:
+        source: A file path or a seekable binary stream, which is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    source.seek(0)
+    for block in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def temp_path(filename):
+    """
+    Returns a unique path in ./temp_files for a file with the name, so
+    concurrent requests for files with the same name never share a path.
+    """
+    return os.path.join("./temp_files", f"{uuid.uuid4().hex}-{os.path.basename(filename)}")
 
 
 class PdfService:
@@ -10,56 +60,380 @@ class PdfService:
     Service class for PdfParser
     """
 
-    def __init__(self, file=None, filepath=None):
+    def __init__(self, file=None, filepath=None, profile=None, doc_hash=None, amends=None,
+                 hash_saved_file=False):
         self.file = file
         self.filepath = filepath
+        self.profile = profile
+        # Results are added to the case index when the document hash is known
+        self.doc_hash = doc_hash
+        # The hash the result is recorded under: doc_hash, or with hash_saved_file
+        # the hash of the (masked) file as saved after parsing, for callers
+        # which keep that file, e.g. in place of the S3 object
+        self.hash_saved_file = hash_saved_file
+        self.index_hash = doc_hash
+        # Revision of the events, recorded once the index hash is known
+        self._revision = None
+        # Hash of the previous version when the client says the order is an amendment
+        self.amends = amends
+        # Sentences seen and skipped by the date prescreen of get_events
+        self.prescreen_stats = {}
+        # The upload saved by _open_parser, removed after parsing
+        self._saved_upload = None
+        # ChatGPT events of a hedged parse and whether they came late, see
+        # _store_gpt_events. They are stored again under the index hash once
+        # it is known, the lock orders that with a late ChatGPT response.
+        self._gpt_result = None
+        self._recorded = False
+        self._gpt_lock = threading.Lock()
+
+    def _parse_revision(self, parser, case_num):
+        """
+        Extracts the events, reusing the revision of the document it amends if
+        the client named one which was parsed before.
+
+        Returns:
+            tuple: The EventRecord objects and the changes since the previous
+                version, None when the order isn't a known amendment.
+        """
+        profile = profiles.get_profile(self.profile)["name"]
+        previous = revision_store.get(self.amends, profile) if self.amends else None
+        if previous and previous.case_num != case_num:
+            # Only versions of the same case are compared
+            previous = None
+        pages = parser.page_fingerprints()
+
+        if previous and previous.pages == pages:
+            event_details = [EventRecord(event.subject, event.date, event.description, event.id)
+                             for event in previous.events]
+            lines = previous.lines
+        else:
+            lines = {}
+            events = parser.get_events(
+                reuse=previous.lines if previous else None, record=lines,
+                stats=self.prescreen_stats)
+            event_details = []
+            for event, subevent in events.items():
+                if event == "no event":
+                    continue
+                event = event.title()
+                for task, date in subevent.items():
+                    # task = task.capitalize()
+                    event_details.append(EventRecord(
+                        event, str(date.date()), task))
+
+        changes = None
+        if previous:
+            changes = diff_events(previous.events, event_details)
+            changes["pages"] = previous.changed_pages(pages)
+        self._revision = (profile, Revision(pages, lines, list(event_details), case_num))
+        return event_details, changes
+
+    def _open_parser(self):
+        """
+        Saves the uploaded file if needed and opens it with PdfParser.
+        """
+        if not self.filepath:
+            filepath = temp_path(self.file.filename)
+            self.file.save(filepath)
+            self.filepath = self._saved_upload = filepath
+
+        return PdfParser(self.filepath, profile=self.profile)
+
+    def _close(self, parser):
+        """
+        Closes the parser and removes the upload saved by _open_parser.
+        """
+        try:
+            if parser is not None:
+                parser.close_pdf()
+        finally:
+            if self._saved_upload and os.path.exists(self._saved_upload):
+                os.remove(self._saved_upload)
+
+    def _check_budget(self, parser, meter):
+        """
+        Switches the parser to low-memory processing when parsing the text of
+        the document is expected to exceed the memory budget.
+        """
+        if not meter.budget:
+            return
+        projected = len(parser.content) * config.MEMORY_BYTES_PER_CHAR
+        if meter.over_budget(projected):
+            parser.low_memory = meter.low_memory = True
+
+    def _cached_gpt_events(self):
+        """
+        Returns the ChatGPT events stored for the document, or None.
+        """
+        if not self.doc_hash:
+            return None
+        cached = gpt_result_cache.get(self.doc_hash)
+        if cached is None:
+            return None
+        return [EventRecord.from_dict(event) for event in cached]
+
+    def _store_gpt_events(self, case_details, gpt_events, late=False):
+        """
+        Keeps the ChatGPT events of the document for the next hedged request,
+        under the hash of the document as downloaded and as recorded, see _record.
+        Late events are also added to the case index, they replace the
+        rule-based events that were returned.
+        """
+        if not self.doc_hash:
+            return
+        with self._gpt_lock:
+            self._gpt_result = (case_details, gpt_events, late)
+            recorded = self._recorded
+            hashes = {self.doc_hash, self.index_hash}
+        for doc_hash in hashes:
+            gpt_result_cache.put(doc_hash, gpt_events)
+        if late and recorded:
+            self._index_gpt_events(case_details, gpt_events)
+
+    def _index_gpt_events(self, case_details, gpt_events):
+        event_details = [EventRecord.from_dict(event) for event in gpt_events]
+        case_index.add(self.index_hash, "gpt", {
+            "case": case_details,
+            "events": event_details,
+            "length": len(event_details),
+        })
+
+    def _late_gpt_result(self, case_details, future):
+        """
+        Done callback of a ChatGPT request which missed the deadline.
+        """
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            self._store_gpt_events(case_details, future.result(), late=True)
+        except Exception:
+            # Nobody waits for it anymore, the next request asks ChatGPT again
+            logger.exception("Storing the late ChatGPT events of %s failed", self.doc_hash)
+
+    def _parse_hedged(self, parser, case_details, meter):
+        """
+        Sends the order to ChatGPT and extracts the rule-based events while
+        waiting for it. The ChatGPT events are used if they arrive within
+        GPT_DEADLINE_SECONDS, else the rule-based ones and the ChatGPT events
+        are stored for later when they arrive.
+
+        Returns:
+            tuple: The EventRecord objects, the changes since the previous
+                version (rule-based events only) and the events metadata.
+        """
+        cached = self._cached_gpt_events()
+        if cached is not None:
+            return cached, None, {"source": "gpt", "cached": True}
+
+        with meter.stage("gpt"):
+            content = parser.get_gpt_content()
+        deadline = time.monotonic() + config.GPT_DEADLINE_SECONDS
+        future = gpt_executor.submit(gpt_parser.get_completion, content)
+        with meter.stage("events"):
+            event_details, changes = self._parse_revision(
+                parser, case_details["caseNum"])
+
+        try:
+            gpt_events = future.result(timeout=max(0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            future.add_done_callback(functools.partial(self._late_gpt_result, case_details))
+            return event_details, changes, {"source": "rules", "gptPending": True}
+        except Exception as error:
+            return event_details, changes, {"source": "rules", "gptError": str(error)}
+
+        self._store_gpt_events(case_details, gpt_events)
+        return [EventRecord.from_dict(event) for event in gpt_events], None, {"source": "gpt"}
+
+    async def _parse_hedged_async(self, parser, case_details, meter, executor):
+        """
+        Same as _parse_hedged for parse_pdf_async, the ChatGPT request is awaited.
+        """
+        cached = self._cached_gpt_events()
+        if cached is not None:
+            return cached, None, {"source": "gpt", "cached": True}
+
+        loop = asyncio.get_running_loop()
+        with meter.stage("gpt"):
+            content = await loop.run_in_executor(executor, parser.get_gpt_content)
+        deadline = loop.time() + config.GPT_DEADLINE_SECONDS
+        task = asyncio.ensure_future(gpt_parser.get_completion_async(content))
+        with meter.stage("events"):
+            event_details, changes = await loop.run_in_executor(
+                executor, self._parse_revision, parser, case_details["caseNum"])
+
+        try:
+            gpt_events = await asyncio.wait_for(asyncio.shield(task),
+                                                max(0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            # The case index is written off the event loop
+            task.add_done_callback(lambda done: loop.run_in_executor(
+                None, self._late_gpt_result, case_details, done))
+            return event_details, changes, {"source": "rules", "gptPending": True}
+        except Exception as error:
+            return event_details, changes, {"source": "rules", "gptError": str(error)}
+
+        self._store_gpt_events(case_details, gpt_events)
+        return [EventRecord.from_dict(event) for event in gpt_events], None, {"source": "gpt"}
+
+    def _build_details(self, case_details, event_details, changes, is_authorized, meter=None,
+                       events_meta=None):
+        """
+        Builds the parse result.
+        """
+        details = {
+            "case": case_details,
+            "events": event_details,
+            "length": len(event_details),
+        }
+        if changes is not None:
+            details["changes"] = changes
+        meta = {}
+        if meter is not None and config.MEMORY_REPORT:
+            meta["memory"] = meter.report()
+        if events_meta is not None:
+            meta["events"] = events_meta
+        if self.prescreen_stats.get("sentences"):
+            meta["prescreen"] = {
+                **self.prescreen_stats,
+                "skippedFraction": round(self.prescreen_stats["skipped"]
+                                         / self.prescreen_stats["sentences"], 3),
+            }
+        if meta:
+            details["meta"] = meta
+        return details
+
+    def _record(self, details, is_authorized):
+        """
+        Records the parse result once the file is closed: the revision for
+        later amendments and the case index entry, under the hash of the
+        document the client holds, which is added to the details.
+        Indexing is best effort, a failure is logged and the result returned.
+        """
+        index_hash = document_hash(self.filepath) if self.hash_saved_file else self.index_hash
+        with self._gpt_lock:
+            self.index_hash = index_hash
+            self._recorded = True
+            gpt_result = self._gpt_result
+        if not self.index_hash:
+            return
+        details["documentHash"] = self.index_hash
+        if self._revision is not None:
+            revision_store.put(self.index_hash, *self._revision)
+
+        # GPT events are indexed apart from the parser's
+        index_profile = "gpt" if is_authorized else profiles.get_profile(
+            self.profile)["name"]
+        try:
+            case_index.add(self.index_hash, index_profile, {
+                key: details[key] for key in ("case", "events", "length")})
+        except Exception:
+            logger.exception("Indexing document %s failed", self.index_hash)
+
+        if gpt_result is not None:
+            # ChatGPT events which came before the index hash was known
+            case_details, gpt_events, late = gpt_result
+            gpt_result_cache.put(self.index_hash, gpt_events)
+            if late:
+                try:
+                    self._index_gpt_events(case_details, gpt_events)
+                except Exception:
+                    logger.exception("Indexing the ChatGPT events of %s failed",
+                                     self.index_hash)
 
     def parse_pdf(self, is_authorized):
         """
         Creates a temporary file for the passed file and calls PdfParser on this file
         Extracts the case details, events and gpt_events if authorized
+        The events are returned as EventRecord objects.
+        When the order amends a document parsed before, only its changed
+        paragraphs and sentences are analysed again and the details include the changes.
+        With MEMORY_REPORT the memory used by each stage is reported in the "meta" of the details.
+        With GPT_MODE "hedged", authorized requests don't wait for ChatGPT past
+        the deadline, see _parse_hedged, and the "meta" tells where the events come from.
         TODO: Gpt authorization is hardcoded to False, will create a separate endpoint for it.
         """
+        parser = None
+        meter = MemoryMeter()
         try:
-            if not self.filepath:
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-                    filepath = f"./temp_files/{self.file.filename}"
-                    self.file.save(filepath)
-                    self.filepath = filepath
-
-            parser = PdfParser(self.filepath)
-            case_details = parser.get_case_details()
+            with meter.stage("read"):
+                parser = self._open_parser()
+            self._check_budget(parser, meter)
+            with meter.stage("case"):
+                case_details = parser.get_case_details()
 
             event_details = []
-            if is_authorized:
-                event_details = parser.get_gpt_events(is_authorized)
+            changes = None
+            events_meta = None
+            if is_authorized and config.GPT_MODE == "hedged":
+                event_details, changes, events_meta = self._parse_hedged(
+                    parser, case_details, meter)
+                is_authorized = events_meta["source"] == "gpt"
+
+            elif is_authorized:
+                with meter.stage("gpt"):
+                    event_details = [EventRecord.from_dict(event)
+                                     for event in parser.get_gpt_events(is_authorized)]
 
             else:
-                events = parser.get_events()
-                for event, subevent in events.items():
-                    if event == "no event":
-                        continue
-                    event = event.title()
-                    for task, date in subevent.items():
-                        # task = task.capitalize()
-                        data = {
-                            "id": str(uuid.uuid4()),
-                            "subject": event,
-                            "date": str(date.date()),
-                            "description": task,
-                        }
-                        event_details.append(data)
-
-            details = {
-                "case": case_details,
-                "events": event_details,
-                "length": len(event_details),
-            }
+                with meter.stage("events"):
+                    event_details, changes = self._parse_revision(
+                        parser, case_details["caseNum"])
 
-            return details
+            details = self._build_details(case_details, event_details, changes, is_authorized,
+                                          meter, events_meta)
 
         except Exception as error:
             raise Exception("Error parsing PDF: ", str(error)) from error
 
         finally:
-            parser.close_pdf()
\ No newline at end of file
+            self._close(parser)
+
+        # Recorded once the file is closed, it is masked by then
+        self._record(details, is_authorized)
+        return details
+
+    async def parse_pdf_async(self, is_authorized, executor=None):
+        """
+        Same as parse_pdf for the async endpoints.
+        Parsing runs on the executor, the ChatGPT request is awaited so no
+        thread waits on OpenAI.
+
+        Parameter:
+            is_authorized (bool): Use ChatGPT for the events.
+            executor (concurrent.futures.Executor): Runs the CPU bound steps,
+                None uses the event loop's default executor.
+        """
+        loop = asyncio.get_running_loop()
+        if not is_authorized:
+            return await loop.run_in_executor(executor, self.parse_pdf, False)
+
+        parser = None
+        meter = MemoryMeter()
+        try:
+            with meter.stage("read"):
+                parser = await loop.run_in_executor(executor, self._open_parser)
+            self._check_budget(parser, meter)
+            with meter.stage("case"):
+                case_details = await loop.run_in_executor(executor, parser.get_case_details)
+            if config.GPT_MODE == "hedged":
+                event_details, changes, events_meta = await self._parse_hedged_async(
+                    parser, case_details, meter, executor)
+                is_authorized = events_meta["source"] == "gpt"
+                details = self._build_details(case_details, event_details, changes,
+                                              is_authorized, meter, events_meta)
+            else:
+                with meter.stage("gpt"):
+                    content = await loop.run_in_executor(executor, parser.get_gpt_content)
+                    event_details = [EventRecord.from_dict(event) for event
+                                     in await gpt_parser.get_completion_async(content)]
+                details = self._build_details(case_details, event_details, None, True, meter)
+
+        except Exception as error:
+            raise Exception("Error parsing PDF: ", str(error)) from error
+
+        finally:
+            await loop.run_in_executor(executor, self._close, parser)
+
+        await loop.run_in_executor(executor, self._record, details, is_authorized)
+        return details
@@ -4,10 +4,22 @@ Module for parsing the pdf and returning the events and their associated sub-eve
 import re
 
 import fitz
-import spacy
 from dateparser.search import search_dates
 
+from app import config
 import app.services.gpt_parser as gpt_parser
+from app.services import event_workers, prescreen, profiles, segmenter
+from app.services.caption import CaptionIndex
+from app.services.layout_templates import GRID, layout_fingerprint, template_store
+from app.services.margins import find_crop_boxes
+from app.services.page_text_cache import page_text_cache, page_text_key
+from app.services.revisions import page_fingerprint
+
+SEGMENTERS = ("spacy", "rules")
+
+# Components extract_meaningful_words doesn't need, POS tags come from
+# the tagger and attribute_ruler
+POS_ONLY_DISABLED = ["parser", "lemmatizer", "ner", "entity_ruler"]
 
 
 class PdfParser:
@@ -16,8 +28,14 @@ class PdfParser:
 
     Attributes:
         nlp: A spacy model used for splitting paragraphs.
+        profile: The pipeline profile settings, see app.services.profiles.
+        segmenter: How sentences are split, "spacy" or the rule-based "rules".
         file: PDF file to be parsed.
         content: Full content of the pdf file.
+        page_texts: The cropped text of each page, content is their concatenation.
+        low_memory: Gives spaCy a page or a chunk of a section at a time instead of
+            whole sections and the whole document, set when a memory budget is exceeded.
+        prescreen: Skips sentences which can't contain a date, see app.services.prescreen.
 
     Methods:
         __parse: method which reads and
@@ -26,17 +44,33 @@ class PdfParser:
         close_pdf: function to close the pdf
         extract_task: function to extract the title/subject from a sentence
         extract_dates: extract the dates from a sentence
+        split_sentences: splits a paragraph into sentences with the selected segmenter
         get_events: function to get the events and their associated subevents and dates.
+        section_operations: extracts the tasks and dates of a run of sections.
+        page_fingerprints: fingerprints of the cropped text of each page.
+        get_gpt_content: the sentences with dates which are sent to ChatGPT
         get_gpt_events: function to get the list of procedures and dates in JSON using ChatGPT
     """
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, segmenter=None, profile=None):
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            self.profile = profiles.get_profile(profile)
+            self.segmenter = (segmenter or config.SENTENCE_SEGMENTER
+                              or self.profile["segmenter"])
+            if self.segmenter not in SEGMENTERS:
+                raise ValueError(f"Unknown sentence segmenter: {self.segmenter}")
+            self.nlp = profiles.load_pipeline(self.profile["name"])
             # creating a pdf file object
             self.filepath = filepath
-            self.file = fitz.open(filepath, filetype="pdf")
-            self.content = self.__read_pdf()  # .lower()
+            self.file = None
+            self.content = ""
+            self.page_texts = []
+            self.low_memory = False
+            self.prescreen = config.DATE_PRESCREEN
+            # Event workers only need the pipeline, they get no file
+            if filepath:
+                self.file = fitz.open(filepath, filetype="pdf")
+                self.content = self.__read_pdf()  # .lower()
         except Exception as error:
             raise Exception("Error initializing PdfParser:",
                             str(error)) from error
@@ -44,28 +78,28 @@ class PdfParser:
     def __read_pdf(self):
         """
         Parses the pdf file and returns the full content as string.
+        Each page is cropped to its own box, without the line-number gutter,
+        header and footer, see app.services.margins.
         """
         # Using PyMuPDF - fitz library to crop
         try:
-            page_0 = self.file[0]
-            blocks = page_0.get_text("blocks")
-            block_list = sorted(
-                (block for block in blocks if block[1] >
-                 10 and block[2] < 100 and block[6] == 0),
-                key=lambda x: (x[0], -x[1]))
-            # TODO: Check content for new line or number.
-            x0_crop = block_list[-1][2]
-            cropbox = fitz.Rect(x0_crop, 30, page_0.rect.width,
-                                page_0.rect.height-30)
-            content = ""
+            # Found before draw_rect changes the content streams
+            cropboxes = find_crop_boxes(self.file)
+            self.page_texts = []
             for page_num in range(self.file.page_count):
                 page = self.file.load_page(page_num)
-                text = page.get_text(clip=cropbox, sort=True)
+                cropbox = cropboxes[page_num]
+                # Keyed before draw_rect changes the content stream
+                key = page_text_key(page, cropbox)
+                text = page_text_cache.get(key)
+                if text is None:
+                    text = page.get_text(clip=cropbox, sort=True)
+                    page_text_cache.put(key, text)
                 page.draw_rect(cropbox, color=(1, 0, 0),
                                fill=(1, 1, 0), fill_opacity=0.2)
                 text = re.sub(r'\s*\n+\s*$', ' ', text)
-                content += text
-            return content
+                self.page_texts.append(text)
+            return "".join(self.page_texts)
         except Exception as error:
             raise Exception("Error reading PDF content:",
                             str(error)) from error
@@ -101,17 +135,40 @@ class PdfParser:
         return content
 
     def extract_meaningful_words(self, text):
-        # Process the text with SpaCy
-        doc = self.nlp(text)
+        """
+        Keeps only the nouns, adjectives, verbs and proper nouns of the text.
+        """
+        return self.extract_meaningful_words_batch([text])[0]
+
+    def extract_meaningful_words_batch(self, texts):
+        """
+        Keeps only the nouns, adjectives, verbs and proper nouns of each text.
+        The texts go through nlp.pipe together and only the components needed
+        for POS tags are run.
 
-        meaningful_words = [token.text for token in doc if token.pos_ in {
-            "NOUN", "ADJ", "VERB", "PROPN"}]
+        Parameter:
+            texts (list): A list of strings
 
-        return " ".join(meaningful_words)
+        Returns:
+            list: The filtered strings, in the same order as texts.
+        """
+        disable = [name for name in POS_ONLY_DISABLED
+                   if name in self.nlp.pipe_names]
+        results = []
+        for doc in self.nlp.pipe(texts, disable=disable):
+            meaningful_words = [token.text for token in doc if token.pos_ in {
+                "NOUN", "ADJ", "VERB", "PROPN"}]
+            results.append(" ".join(meaningful_words))
+        return results
 
     def extract_parties_details(self, page):
         """
         Extract plaintiff and defendant details and case number.
+        The words of the page are read once into a CaptionIndex and every
+        keyword lookup and clip below is answered from it.
+        If a page with the same layout was parsed before, the recorded
+        caption rectangles are used and the geometry search is skipped,
+        unless the party labels of this page are elsewhere, see _template_fits.
 
         Args:
             page (fitz.Page): The PDF page to extract information from.
@@ -120,50 +177,116 @@ class PdfParser:
             tuple: A tuple containing case number, court details, plaintiff, and defendant.
         """
         try:
-            top_half = fitz.Rect(0, 0, page.rect.width, page.rect.height / 2)
-            top_half = page.get_textpage(clip=top_half)
-            court_bbox = self._find_court_bbox(page, top_half)
-            parties_y0 = self._find_parties_y0(page, court_bbox, top_half)
-
-            court_bbox = fitz.Rect(
-                50, court_bbox.y0, page.rect.width, parties_y0)
-            court_details = self.clean_pdf(
-                page.get_text(clip=court_bbox)).title()
-            case_num, plaintiff, defendant = self._extract_case_and_parties(
-                page, parties_y0
-            )
-
-            return case_num, court_details, plaintiff, defendant
+            caption = CaptionIndex(page)
+            fingerprint = layout_fingerprint(caption)
+            rects = template_store.get(fingerprint)
+            if rects and self._template_fits(caption, rects):
+                details = self._read_caption(caption, rects)
+                if all(details):
+                    return details
+
+            rects = self._find_caption_rects(caption)
+            details = self._read_caption(caption, rects)
+            if all(details):
+                template_store.put(fingerprint, rects)
+            return details
         except Exception as error:
             raise Exception("Error extracting parties details:", str(error))
 
-    def _find_court_bbox(self, page, top_half):
+    def _find_caption_rects(self, caption):
+        """
+        Find the rectangles of the caption sections.
+
+        Args:
+            caption (CaptionIndex): The word index of the page to search on.
+
+        Returns:
+            dict: A fitz.Rect for each of the court, case, plaintiff and defendant sections.
+        """
+        page_rect = caption.rect
+        top_half = fitz.Rect(0, 0, page_rect.width, page_rect.height / 2)
+        court_bbox = self._find_court_bbox(caption, top_half)
+        parties_y0 = self._find_parties_y0(caption, court_bbox, top_half)
+
+        case_clip, plaintiff_bbox, defendant_bbox = self._find_case_and_parties_rects(
+            caption, parties_y0
+        )
+        return {
+            "court": fitz.Rect(50, court_bbox.y0, page_rect.width, parties_y0),
+            "case": case_clip,
+            "plaintiff": plaintiff_bbox,
+            "defendant": defendant_bbox,
+        }
+
+    def _template_fits(self, caption, rects):
+        """
+        Check that the Plaintiff and Defendant labels of the page sit where the
+        recorded rectangles end. The fingerprint only covers the court header,
+        the party names take more or fewer lines on each order.
+
+        Args:
+            caption (CaptionIndex): The word index of the page.
+            rects (dict): A fitz.Rect for each caption section.
+
+        Returns:
+            bool: True when the rectangles can be read on this page.
+        """
+        plaintiff, defendant = rects["plaintiff"], rects["defendant"]
+        column = fitz.Rect(plaintiff.x0, plaintiff.y0, plaintiff.x1, caption.rect.height)
+        for term, rect in (("plaintiff", plaintiff), ("defendant", defendant)):
+            labels = caption.search(term, clip=column)
+            if not labels or abs(labels[0].y0 - rect.y1) > GRID:
+                return False
+        return True
+
+    def _read_caption(self, caption, rects):
+        """
+        Read the caption sections from their rectangles.
+
+        Args:
+            caption (CaptionIndex): The word index of the page to read.
+            rects (dict): A fitz.Rect for each caption section.
+
+        Returns:
+            tuple: A tuple containing case number, court details, plaintiff, and defendant.
+        """
+        court_details = self.clean_pdf(
+            caption.text(rects["court"])).title()
+        case_num = self._extract_case_number(
+            caption.text(rects["case"]).lower())
+        plaintiff = self.clean_pdf(
+            caption.text(rects["plaintiff"])).title()
+        defendant = self.clean_pdf(
+            caption.text(rects["defendant"])).title()
+        return case_num, court_details, plaintiff, defendant
+
+    def _find_court_bbox(self, caption, top_half):
         """
         Find the bounding box of the court section.
 
         Args:
-            page (fitz.Page): The PDF page to search on.
-            top_half (fitz.TextPage): The top half of the page as a TextPage object.
+            caption (CaptionIndex): The word index of the page to search on.
+            top_half (fitz.Rect): The top half of the page.
 
         Returns:
             fitz.Rect: The bounding box of the court section.
         """
         try:
-            court_bbox = page.search_for("superior court", textpage=top_half)
-            court_bbox += page.search_for("district court", textpage=top_half)
+            court_bbox = caption.search("superior court", clip=top_half)
+            court_bbox += caption.search("district court", clip=top_half)
             court_bbox = sorted(court_bbox, key=lambda x: x.y1)
             return court_bbox[-1]
         except Exception as error:
             raise Exception("Error finding court bounding box:", str(error))
 
-    def _find_parties_y0(self, page, court_bbox, top_half):
+    def _find_parties_y0(self, caption, court_bbox, top_half):
         """
         Find the Y0 coordinate for the parties' section.
 
         Args:
-            page (fitz.Page): The PDF page to search on.
+            caption (CaptionIndex): The word index of the page to search on.
             court_bbox (fitz.Rect): The bounding box of the court section.
-            top_half (fitz.TextPage): The top half of the page as a TextPage object.
+            top_half (fitz.Rect): The top half of the page.
 
         Returns:
             float: The Y0 coordinate for the parties' section.
@@ -171,27 +294,27 @@ class PdfParser:
         try:
             parties_y0 = court_bbox.y1 + 30
             for term in ["COUNTY", "DISTRICT"]:
-                term_bbox = page.search_for(term, textpage=top_half)
+                term_bbox = caption.search(term, clip=top_half)
                 if term_bbox:
                     parties_y0 = min(parties_y0, term_bbox[-1].y1)
             return parties_y0
         except Exception as error:
             raise Exception("Error finding parties Y0 coordinate:", str(error))
 
-    def _find_case_x0_values(self, page, case_page):
+    def _find_case_x0_values(self, caption, case_clip):
         """
         Find the x0 value of the case detail box.
 
         Args:
-            page (fitz.Page): The PDF page to search on.
-            case_page (fitz.TextPage): The TextPage containing case details.
+            caption (CaptionIndex): The word index of the page to search on.
+            case_clip (fitz.Rect): The area containing case details.
 
         Returns:
             list: A list of x0 values.
         """
         try:
-            case_1 = page.search_for("case", textpage=case_page)
-            case_2 = page.search_for("No.", textpage=case_page)
+            case_1 = caption.search("case", clip=case_clip)
+            case_2 = caption.search("No.", clip=case_clip)
 
             x0_values = [bbox[0].x0 for bbox in (case_1, case_2) if bbox]
 
@@ -223,40 +346,37 @@ class PdfParser:
         except Exception as error:
             raise Exception("Error extracting case number:", str(error))
 
-    def _extract_case_and_parties(self, page, parties_y0):
+    def _find_case_and_parties_rects(self, caption, parties_y0):
         """
-        Extract case number, plaintiff, and defendant.
+        Find the rectangles of the case number, plaintiff, and defendant.
 
         Args:
-            page (fitz.Page): The PDF page to extract information from.
+            caption (CaptionIndex): The word index of the page to search on.
             parties_y0 (float): The Y0 coordinate for the parties' section.
 
         Returns:
-            tuple: A tuple containing case number, plaintiff, and defendant.
+            tuple: A tuple containing the case, plaintiff, and defendant fitz.Rect.
         """
         try:
-            defendant_bbox = page.search_for("defendant")[-1]
+            page_rect = caption.rect
+            defendant_bbox = caption.search("defendant")[-1]
 
             case_clip = fitz.Rect(
-                page.rect.width / 2, parties_y0 + 20, page.rect.width, defendant_bbox.y0
+                page_rect.width / 2, parties_y0 + 20, page_rect.width, defendant_bbox.y0
             )  # mid right
-            case_detail = page.get_text(clip=case_clip).lower()
-            case_num = self._extract_case_number(case_detail)
 
-            case_page = page.get_textpage(clip=case_clip)
-            x0_values = self._find_case_x0_values(page, case_page)
-            case_clip.x1 = min(
-                x0_values) if x0_values else page.rect.width / 1.75
+            x0_values = self._find_case_x0_values(caption, case_clip)
+            parties_x1 = min(
+                x0_values) if x0_values else page_rect.width / 1.75
 
             parties_clip = fitz.Rect(
-                50, parties_y0 + 20, case_clip.x1, defendant_bbox.y1
+                50, parties_y0 + 20, parties_x1, defendant_bbox.y1
             )
-            parties_page = page.get_textpage(clip=parties_clip)
 
-            plaintiff_bbox = page.search_for(
-                "plaintiff", textpage=parties_page)[0]
-            defendant_bbox = page.search_for(
-                "defendant", textpage=parties_page)[0]
+            plaintiff_bbox = caption.search(
+                "plaintiff", clip=parties_clip)[0]
+            defendant_bbox = caption.search(
+                "defendant", clip=parties_clip)[0]
             parties_clip.y1 = defendant_bbox.y1
 
             plaintiff_bbox = fitz.Rect(
@@ -268,12 +388,8 @@ class PdfParser:
                 parties_clip.x1,
                 defendant_bbox.y0,
             )
-            plaintiff = self.clean_pdf(
-                page.get_text(clip=plaintiff_bbox)).title()
-            defendant = self.clean_pdf(
-                page.get_text(clip=defendant_bbox)).title()
 
-            return case_num, plaintiff, defendant
+            return case_clip, plaintiff_bbox, defendant_bbox
         except Exception as error:
             raise Exception(
                 "Error extracting case and parties details:", str(error))
@@ -290,13 +406,15 @@ class PdfParser:
 
             case_num, court, plaintiff, defendant = self.extract_parties_details(
                 page)
+            court, plaintiff, defendant = self.extract_meaningful_words_batch(
+                [court, plaintiff, defendant])
 
             case_info = {
                 "caseNum": case_num,
-                "court": self.extract_meaningful_words(court),
+                "court": court,
                 "client": "",
-                "plaintiff": self.extract_meaningful_words(plaintiff),
-                "defendant": self.extract_meaningful_words(defendant),
+                "plaintiff": plaintiff,
+                "defendant": defendant,
             }
             return case_info
         except Exception as error:
@@ -323,7 +441,7 @@ class PdfParser:
             task (string): A string
         """
         try:
-            doc = self.nlp(sentence)
+            doc = self.nlp(sentence, disable=self._disabled("task_disable"))
             task = ""
             for token in doc:
                 if token.pos_ == "VERB":
@@ -353,7 +471,7 @@ class PdfParser:
         # process the text with spaCy
         text = text.title()
         try:
-            doc = self.nlp(text)
+            doc = self.nlp(text, disable=self._disabled("date_disable"))
             dates = []
             # iterate over each entity in the document
             for ent in doc.ents:
@@ -375,77 +493,267 @@ class PdfParser:
         except Exception as error:
             raise Exception("Error extracting dates:", str(error)) from error
 
-    def get_events(self):
+    def _disabled(self, step):
+        """
+        Names of the loaded components the profile skips for a step.
+        """
+        return [name for name in self.profile[step] if name in self.nlp.pipe_names]
+
+    def split_sentences(self, text):
+        """
+        Splits the text into sentences using the selected segmenter.
+        The rule-based segmenter doesn't need the dependency parser.
+
+        Parameter:
+            text (string): A string
+
+        Returns:
+            list: A list of sentence strings
+        """
+        if self.segmenter == "rules":
+            return segmenter.split_sentences(text)
+        return [sentence.text for sentence in self.nlp(text).sents]
+
+    def _sentences(self, text):
+        """
+        Splits a paragraph into sentences.
+        In low-memory processing a long paragraph is first cut at rule-based
+        sentence boundaries into chunks of at most LOW_MEMORY_CHUNK_CHARS, so
+        spaCy never holds the Doc of a whole section.
+        """
+        if (not self.low_memory or self.segmenter == "rules"
+                or len(text) <= config.LOW_MEMORY_CHUNK_CHARS):
+            return self.split_sentences(text)
+
+        sentences, chunk = [], ""
+        for sentence in segmenter.split_sentences(text):
+            if chunk and len(chunk) + len(sentence) >= config.LOW_MEMORY_CHUNK_CHARS:
+                sentences.extend(self.split_sentences(chunk))
+                chunk = ""
+            chunk = f"{chunk} {sentence}" if chunk else sentence
+        if chunk:
+            sentences.extend(self.split_sentences(chunk))
+        return sentences
+
+    def _page_sentences(self):
+        """
+        Yields the sentences of the order one page at a time, for low-memory processing.
+        The last sentence of a page may continue on the next one, so it is
+        split again together with the next page.
+        """
+        carry = ""
+        for text in self.page_texts:
+            sentences = self._sentences(self.clean_pdf(f"{carry} {text}" if carry else text))
+            carry = sentences.pop() if sentences else ""
+            yield from sentences
+        if carry:
+            yield carry
+
+    def page_fingerprints(self):
+        """
+        Returns the fingerprint of the cropped text of each page, in page order.
+        """
+        return [page_fingerprint(text) for text in self.page_texts]
+
+    def get_events(self, workers=None, reuse=None, record=None, stats=None):
         """
         Returns the events and their corresponding dates
+        Numbered sections are independent, so long orders can be split into
+        sections and processed on a pool of worker processes.
+        The sentence split of each paragraph and the analysis of each sentence
+        can be recorded and reused for the next version of the order, unchanged
+        paragraphs and sentences are then not run through spaCy again.
+            Parameter:
+                workers (int): Worker processes to use, defaults to config.EVENT_WORKERS.
+                    0 or 1 processes the sections in this process.
+                reuse (dict): Paragraph splits and sentence analysis recorded for a
+                    previous version. The sections are processed in this process when given.
+                record (dict): Filled with the paragraph splits and sentence analysis
+                    of this document.
+                stats (dict): Filled with the number of sentences and the number the
+                    prescreen skipped, see section_operations.
             Returns:
                 events: A dictionary of events and its subevents and corresponding dates.
         """
         try:
-            events = {}
-            event = ""
             content = self.clean_pdf(self.content)  # .lower())
-            events["no event"] = {}
-            paragraphs = content.splitlines()
-            for para in paragraphs:
-                para = self.clean_pdf(para)
-
-                head = para.split(".")
-                head = head[0]+"."+head[1]+"." if len(head) > 2 else para
-                head = para if len(head) < 10 else head
-
-                new_events = re.findall(
-                    r"(\d{1,2}\.[A-Za-z0-9()\-\, ]+)(?:\.|\:)", head)
-
-                if new_events:
-                    para = re.sub(
-                        r"(\d{1,2}\.[A-Za-z0-9()\-\, ]+)(?:\.|\:)", r"\1.", para, 1)
-
-                new_event = re.search(
-                    r"\d{1,2}\. *([A-Za-z0-9()\-\, ]{10,})(?:\:|\.)", head
-                )
-
-                if new_event:
-                    event = new_event.group(1)
-                    events[event] = {}
-
-                sentences = self.nlp(para.strip())
-                for line in sentences.sents:
-                    line = line.text.strip()
-                    line = re.sub(r'\s*[^0-9a-zA-Z\s\(\)\-:]+\s*', ' ', line)
-                    re_dates = search_dates(
-                        line,
-                        settings={"STRICT_PARSING": True,
-                                  "PARSERS": ["absolute-time"]},
-                    )
-                    nlp_dates = self.extract_date(line)
-
-                    if not re_dates:
-                        re_dates = []
-                    dates = nlp_dates if (
-                        len(nlp_dates) > len(re_dates)) else re_dates
-                    if not event:
-                        event = "no event"
-
-                    if event and len(dates) > 0:
-                        for date in dates:
-                            lines = [line]
-                            if len(dates) > 1:
-                                lines = line.split(date[0])
-                            new_line = lines[0]  # .replace(date[0], "")
-                            task = self.extract_task(new_line)
-                            task = task.strip()+"."
-                            task = task[0].upper() + task[1:]
-                            if task in events[event]:
-                                task = line
-                            events[event][task] = date[1]
-                            if len(lines) > 1:
-                                line = lines[1]
-
-            return events
+            paragraphs = [self._prepare_paragraph(para)
+                          for para in content.splitlines()]
+            workers = config.EVENT_WORKERS if workers is None else workers
+
+            if (workers > 1 and not reuse
+                    and len(content) >= config.EVENT_PARALLEL_MIN_CHARS):
+                chunks = event_workers.split_sections(paragraphs, workers)
+                operations = event_workers.map_sections(
+                    chunks, workers, self.profile["name"], self.segmenter, record, stats)
+            else:
+                operations = [self.section_operations(
+                    paragraphs, reuse, record, stats)]
+
+            return self._merge_operations(operations)
         except Exception as error:
             raise Exception("Error extracting events:", str(error)) from error
 
+    def _prepare_paragraph(self, para):
+        """
+        Cleans a paragraph and finds the section heading it starts with.
+            Returns:
+                tuple: The paragraph and the heading, None if it doesn't start a section.
+        """
+        para = self.clean_pdf(para)
+
+        head = para.split(".")
+        head = head[0]+"."+head[1]+"." if len(head) > 2 else para
+        head = para if len(head) < 10 else head
+
+        new_events = re.findall(
+            r"(\d{1,2}\.[A-Za-z0-9()\-\, ]+)(?:\.|\:)", head)
+
+        if new_events:
+            para = re.sub(
+                r"(\d{1,2}\.[A-Za-z0-9()\-\, ]+)(?:\.|\:)", r"\1.", para, 1)
+
+        new_event = re.search(
+            r"\d{1,2}\. *([A-Za-z0-9()\-\, ]{10,})(?:\:|\.)", head
+        )
+        return para, new_event.group(1) if new_event else None
+
+    def section_operations(self, paragraphs, reuse=None, record=None, stats=None):
+        """
+        Extracts the tasks and dates of consecutive prepared paragraphs.
+        The result is a list of operations so that the output of several
+        sections can be merged in order by _merge_operations:
+            ("section", event): a new section starts.
+            ("task", event, task, line, date): a task with its date.
+        With the prescreen, paragraphs without a digit aren't split into
+        sentences and sentences which can't contain a date aren't analysed.
+            Parameter:
+                paragraphs (list): (paragraph, heading) tuples from _prepare_paragraph.
+                reuse (dict): Paragraph splits and sentence analysis recorded for a
+                    previous version.
+                record (dict): Filled with the sentences of each paragraph, under
+                    ("paragraph", text) keys, and the analysis of each sentence.
+                stats (dict): The "sentences" and "skipped" counts are added to it.
+            Returns:
+                operations: A list of operation tuples.
+        """
+        operations = []
+        event = ""
+        sentences = skipped = 0
+        for para, heading in paragraphs:
+            if heading:
+                event = heading
+                operations.append(("section", event))
+
+            para = para.strip()
+            if self.prescreen and not prescreen.has_digit(para):
+                # Counted with the cheap rule-based segmenter
+                count = len(segmenter.split_sentences(para))
+                sentences += count
+                skipped += count
+                continue
+
+            key = ("paragraph", para)
+            if reuse and key in reuse:
+                # An unchanged paragraph isn't split by spaCy again
+                para_sentences = reuse[key]
+            else:
+                para_sentences = self._sentences(para)
+            if record is not None:
+                record[key] = para_sentences
+
+            for line in para_sentences:
+                line = line.strip()
+                line = re.sub(r'\s*[^0-9a-zA-Z\s\(\)\-:]+\s*', ' ', line)
+                if not event:
+                    event = "no event"
+                sentences += 1
+                if self.prescreen and not prescreen.may_contain_date(line):
+                    skipped += 1
+                    continue
+
+                if reuse and line in reuse:
+                    tasks = reuse[line]
+                else:
+                    tasks = self._line_tasks(line)
+                if record is not None:
+                    record[line] = tasks
+                for task, task_line, date in tasks:
+                    operations.append(("task", event, task, task_line, date))
+        if stats is not None:
+            stats["sentences"] = stats.get("sentences", 0) + sentences
+            stats["skipped"] = stats.get("skipped", 0) + skipped
+        return operations
+
+    def _line_tasks(self, line):
+        """
+        Finds the dates of a sentence and the task due on each date.
+            Returns:
+                list: (task, line, date) tuples, line is the part of the sentence the task was taken from.
+        """
+        tasks = []
+        re_dates = None
+        if self.profile["line_dates"]:
+            re_dates = search_dates(
+                line,
+                settings={"STRICT_PARSING": True,
+                          "PARSERS": ["absolute-time"]},
+            )
+        nlp_dates = self.extract_date(line)
+
+        if not re_dates:
+            re_dates = []
+        dates = nlp_dates if (
+            len(nlp_dates) > len(re_dates)) else re_dates
+
+        for date in dates:
+            lines = [line]
+            if len(dates) > 1:
+                lines = line.split(date[0])
+            new_line = lines[0]  # .replace(date[0], "")
+            task = self.extract_task(new_line)
+            task = task.strip()+"."
+            task = task[0].upper() + task[1:]
+            tasks.append((task, line, date[1]))
+            if len(lines) > 1:
+                line = lines[1]
+        return tasks
+
+    def _merge_operations(self, operations):
+        """
+        Replays the operations of each section, in order, into the events dictionary.
+        """
+        events = {"no event": {}}
+        for section in operations:
+            for operation in section:
+                if operation[0] == "section":
+                    events[operation[1]] = {}
+                    continue
+                _, event, task, line, date = operation
+                if task in events[event]:
+                    task = line
+                events[event][task] = date
+        return events
+
+    def get_gpt_content(self):
+        """
+        Returns the sentences of the order which contain a date, the content sent to ChatGPT.
+        In low-memory processing the order is split page by page instead of as one Doc.
+        """
+        if self.low_memory:
+            sentences = self._page_sentences()
+        else:
+            sentences = self.split_sentences(self.clean_pdf(self.content))
+        content = ""
+        for line in sentences:
+            line = line.strip()
+            if self.prescreen and not prescreen.may_contain_date(line):
+                continue
+            nlp_dates = self.extract_date(line)
+            if nlp_dates:
+                content += line
+        return content
+
     def get_gpt_events(self, is_authorized):
 
         """
@@ -456,16 +764,7 @@ class PdfParser:
         if not is_authorized:
             return "Not Authorized to use GPT"
         try:
-            content = self.clean_pdf(self.content)
-            sentences = self.nlp(content)
-            content = ""
-            for line in sentences.sents:
-                line = line.text.strip()
-                nlp_dates = self.extract_date(line)
-                if nlp_dates:
-                    content += line
-
-            gpt_events = gpt_parser.get_completion(content)
+            gpt_events = gpt_parser.get_completion(self.get_gpt_content())
             return gpt_events
         except Exception as error:
             raise Exception("Error extracting GPT events:",
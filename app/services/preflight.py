@@ -0,0 +1,139 @@
+"""
+Module for the cheap checks run on a file before it is handed to PdfParser.
+Rejects non-PDF, encrypted, oversized or overly long documents up front
+so that they don't tie up a parse worker.
+"""
+import os
+
+import fitz
+
+from app import config
+
+PDF_MAGIC = b"%PDF-"
+# The PDF spec allows some leading garbage before the header
+HEADER_WINDOW = 1024
+
+
+class PreflightError(Exception):
+    """
+    Raised when a file fails one of the pre-flight checks.
+
+    Attributes:
+        message: Human readable reason for the rejection.
+        status_code: HTTP status code the controller should respond with.
+    """
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def check_size(size, max_bytes=None):
+    """
+    Checks the size of a file against the configured byte limit.
+
+    Args:
+        size (int): Size of the file in bytes.
+        max_bytes (int): Byte limit, defaults to config.MAX_UPLOAD_BYTES.
+    """
+    max_bytes = config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if size == 0:
+        raise PreflightError("The file is empty")
+    if max_bytes and size > max_bytes:
+        raise PreflightError(
+            f"File too large: {size} bytes, the limit is {max_bytes} bytes", 413)
+
+
+def check_header(header):
+    """
+    Checks that the leading bytes of a file carry the PDF signature.
+
+    Args:
+        header (bytes): The first bytes of the file.
+    """
+    if PDF_MAGIC not in header[:HEADER_WINDOW]:
+        raise PreflightError(
+            "Invalid file content, the file is not a PDF document")
+
+
+def check_document(document, max_pages=None):
+    """
+    Checks an opened document for encryption and the page limit.
+
+    Args:
+        document (fitz.Document): The opened PDF.
+        max_pages (int): Page limit, defaults to config.MAX_PDF_PAGES.
+
+    Returns:
+        int: The number of pages in the document.
+    """
+    max_pages = config.MAX_PDF_PAGES if max_pages is None else max_pages
+    if document.needs_pass or document.is_encrypted:
+        raise PreflightError(
+            "The PDF is password protected, please upload an unlocked copy")
+    page_count = document.page_count
+    if page_count == 0:
+        raise PreflightError("The PDF has no pages")
+    if max_pages and page_count > max_pages:
+        raise PreflightError(
+            f"PDF has too many pages: {page_count}, the limit is {max_pages}", 413)
+    return page_count
+
+
+def check_pdf_stream(stream, max_bytes=None, max_pages=None):
+    """
+    Runs the pre-flight checks on an uploaded file stream.
+    The stream is rewound afterwards so it can still be saved.
+
+    Args:
+        stream (file-like): Seekable binary stream of the upload.
+        max_bytes (int): Byte limit, defaults to config.MAX_UPLOAD_BYTES.
+        max_pages (int): Page limit, defaults to config.MAX_PDF_PAGES.
+
+    Returns:
+        int: The number of pages in the document.
+    """
+    try:
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        check_size(size, max_bytes)
+        check_header(stream.read(HEADER_WINDOW))
+        stream.seek(0)
+        data = stream.read()
+    finally:
+        stream.seek(0)
+    return _check_opened(lambda: fitz.open(stream=data, filetype="pdf"), max_pages)
+
+
+def check_pdf_file(filepath, max_bytes=None, max_pages=None):
+    """
+    Runs the pre-flight checks on a file stored on disk.
+
+    Args:
+        filepath (str): Path to the file.
+        max_bytes (int): Byte limit, defaults to config.MAX_UPLOAD_BYTES.
+        max_pages (int): Page limit, defaults to config.MAX_PDF_PAGES.
+
+    Returns:
+        int: The number of pages in the document.
+    """
+    check_size(os.path.getsize(filepath), max_bytes)
+    with open(filepath, "rb") as file:
+        check_header(file.read(HEADER_WINDOW))
+    return _check_opened(lambda: fitz.open(filepath, filetype="pdf"), max_pages)
+
+
+def _check_opened(open_document, max_pages):
+    """
+    Opens the document (only the xref is read) and checks it.
+    """
+    try:
+        document = open_document()
+    except Exception as error:
+        raise PreflightError(
+            "The PDF is damaged and could not be opened") from error
+    try:
+        return check_document(document, max_pages)
+    finally:
+        document.close()
@@ -0,0 +1,41 @@
+"""
+Cheap lexical prescreen for sentences which can't contain a full date.
+get_events only keeps dates with a day, a month and a year, so a sentence
+needs at least a digit (the year) and either a month name or enough numbers
+for a numeric date. Sentences failing the check skip spaCy and dateparser.
+"""
+import re
+
+_DIGIT = re.compile(r"\d")
+_MONTH = re.compile(
+    r"\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b",
+    re.IGNORECASE)
+_NUMBER = re.compile(r"\d+")
+
+
+def has_digit(text):
+    """
+    Checks if the text has a digit, paragraphs without one have no dates.
+    """
+    return _DIGIT.search(text) is not None
+
+
+def may_contain_date(text):
+    """
+    Checks if the text may contain a date with a day, month and year.
+    False means it certainly doesn't, True only that it's worth parsing.
+
+    Parameter:
+        text (string): A sentence, separators may have been replaced by spaces.
+
+    Returns:
+        bool: True for a digit with a month name, three numbers (7/1/2022,
+            2022-07-01, 7 1 2022) or a run of 6 or more digits (20220701).
+    """
+    if not _DIGIT.search(text):
+        return False
+    if _MONTH.search(text):
+        return True
+    numbers = _NUMBER.findall(text)
+    return len(numbers) >= 3 or any(len(number) >= 6 for number in numbers)
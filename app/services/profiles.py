@@ -0,0 +1,129 @@
+"""
+Module with the named pipeline profiles of PdfParser.
+A profile decides which spaCy components run for each step, how sentences
+are split and how dates are detected:
+
+    accurate: today's behaviour, full pipeline everywhere, spaCy sentence
+              splitting, NER plus dateparser for dates.
+    balanced: rule-based sentence splitting, each step only runs the
+              components it reads, NER plus dateparser for dates.
+    fast:     balanced, with the statistical NER replaced by an EntityRuler
+              with DATE patterns and no dateparser pass over whole sentences.
+
+scripts/benchmark_profiles.py measures the throughput and event-level
+accuracy of each profile on the sample orders.
+"""
+import functools
+
+import spacy
+
+from app import config
+
+MODEL = "en_core_web_sm"
+# The reference profile the others are measured against
+REFERENCE_PROFILE = "accurate"
+
+# Components that only feed POS tags, dependencies and lemmas
+SYNTAX_COMPONENTS = ["tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+PROFILES = {
+    "accurate": {
+        "segmenter": "spacy",
+        "exclude": [],
+        "date_entities": "ner",
+        "line_dates": True,
+        "date_disable": [],
+        "task_disable": [],
+    },
+    "balanced": {
+        "segmenter": "rules",
+        "exclude": [],
+        "date_entities": "ner",
+        "line_dates": True,
+        "date_disable": SYNTAX_COMPONENTS,
+        "task_disable": ["ner"],
+    },
+    "fast": {
+        "segmenter": "rules",
+        "exclude": ["ner"],
+        "date_entities": "ruler",
+        "line_dates": False,
+        "date_disable": ["tok2vec"] + SYNTAX_COMPONENTS,
+        "task_disable": ["entity_ruler"],
+    },
+}
+
+MONTHS = [
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept",
+    "oct", "nov", "dec",
+]
+MONTHS += [month + "." for month in MONTHS if len(month) <= 4]
+WEEKDAYS = [
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+]
+
+_WEEKDAY = {"LOWER": {"IN": WEEKDAYS}, "OP": "?"}
+_COMMA = {"TEXT": ",", "OP": "?"}
+_MONTH = {"LOWER": {"IN": MONTHS}}
+_DAY = {"TEXT": {"REGEX": r"^\d{1,2}(st|nd|rd|th)?$"}}
+_YEAR = {"TEXT": {"REGEX": r"^\d{4}$"}}
+
+DATE_PATTERNS = [
+    # Monday, July 1, 2022
+    {"label": "DATE", "pattern": [_WEEKDAY, _COMMA, _MONTH, _DAY, _COMMA, _YEAR]},
+    # 1st of July 2022
+    {"label": "DATE", "pattern": [
+        _WEEKDAY, _COMMA, _DAY, {"LOWER": "of", "OP": "?"}, _MONTH, _COMMA, _YEAR]},
+    # 07/01/2022
+    {"label": "DATE", "pattern": [
+        {"TEXT": {"REGEX": r"^\d{1,2}/\d{1,2}/(\d{4}|\d{2})$"}}]},
+    # 2022-07-01 and 7-1-2022, the tokenizer splits on the hyphens
+    {"label": "DATE", "pattern": [
+        {"TEXT": {"REGEX": r"^\d{4}$"}}, {"TEXT": "-"}, {"TEXT": {"REGEX": r"^\d{1,2}$"}},
+        {"TEXT": "-"}, {"TEXT": {"REGEX": r"^\d{1,2}$"}}]},
+    {"label": "DATE", "pattern": [
+        {"TEXT": {"REGEX": r"^\d{1,2}$"}}, {"TEXT": "-"}, {"TEXT": {"REGEX": r"^\d{1,2}$"}},
+        {"TEXT": "-"}, {"TEXT": {"REGEX": r"^(\d{4}|\d{2})$"}}]},
+]
+
+
+def get_profile(name=None):
+    """
+    Returns the settings of a profile.
+
+    Parameter:
+        name (string): Profile name, defaults to config.PARSER_PROFILE.
+
+    Returns:
+        dict: The profile settings, including its name.
+    """
+    name = name or config.PARSER_PROFILE
+    if name not in PROFILES:
+        raise ValueError(
+            f"Unknown parser profile: {name}, choose one of {', '.join(PROFILES)}")
+    return dict(PROFILES[name], name=name)
+
+
+def load_pipeline(name=None):
+    """
+    Loads the spaCy pipeline of a profile once per process.
+
+    Parameter:
+        name (string): Profile name, defaults to config.PARSER_PROFILE.
+
+    Returns:
+        spacy.Language: The loaded pipeline.
+    """
+    return _load_pipeline(get_profile(name)["name"])
+
+
+@functools.lru_cache(maxsize=None)
+def _load_pipeline(name):
+    profile = get_profile(name)
+    nlp = spacy.load(MODEL, exclude=profile["exclude"])
+    if profile["date_entities"] == "ruler":
+        ruler = nlp.add_pipe("entity_ruler")
+        ruler.add_patterns(DATE_PATTERNS)
+    return nlp
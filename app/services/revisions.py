@@ -0,0 +1,130 @@
+"""
+Module for re-parsing amended scheduling orders incrementally.
+Amended orders of a case usually differ from the previous version on one or
+two pages. The revision of each parsed document is kept by document hash
+with a fingerprint of every page's cropped text, the sentence split of every
+paragraph and the analysis (tasks and dates) of every sentence. When a client
+says an order amends a document it parsed before, only the paragraphs and
+sentences which changed go through spaCy again and the events are compared
+with that version. Revisions are only found by the hash of the document, so
+a client is never compared with a document it doesn't hold.
+"""
+import hashlib
+from collections import defaultdict
+
+from app import config
+from app.services.cache import LruCache
+
+
+def page_fingerprint(text):
+    """
+    Returns the fingerprint of a page's cropped text.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Revision:
+    """
+    A parsed version of an order.
+
+    Attributes:
+        pages: Fingerprint of each page, in page order.
+        lines: Sentence split of each paragraph and analysis of each sentence,
+            see PdfParser.section_operations.
+        events: The EventRecord objects returned for the version.
+        case_num: The case number of the order, amendments must have the same.
+    """
+
+    __slots__ = ("pages", "lines", "events", "case_num")
+
+    def __init__(self, pages, lines, events, case_num=None):
+        self.pages = pages
+        self.lines = lines
+        self.events = events
+        self.case_num = case_num
+
+    def changed_pages(self, pages):
+        """
+        Returns the 1-based numbers of the pages which differ from this revision.
+
+        Parameter:
+            pages (list): Page fingerprints of the new version.
+        """
+        changed = [number for number, fingerprint in enumerate(pages, 1)
+                   if number > len(self.pages) or self.pages[number - 1] != fingerprint]
+        # Pages removed from the end of the order
+        changed += range(len(pages) + 1, len(self.pages) + 1)
+        return changed
+
+
+class RevisionStore:
+    """
+    Bounded store of the revisions of parsed documents, keyed by document hash and profile.
+    """
+
+    def __init__(self, maxsize=128):
+        self._cache = LruCache(maxsize)
+
+    def get(self, doc_hash, profile):
+        """
+        Returns the revision of the document parsed with the profile, or None.
+        """
+        return self._cache.get((doc_hash, profile))
+
+    def put(self, doc_hash, profile, revision):
+        """
+        Records the revision of the document.
+        """
+        self._cache.put((doc_hash, profile), revision)
+
+    def clear(self):
+        """
+        Removes every revision.
+        """
+        self._cache.clear()
+
+
+def diff_events(previous, events):
+    """
+    Compares the events of two versions of an order.
+    Events are matched on their subject and description, a matched event
+    keeps the id it had in the previous version.
+
+    Args:
+        previous (list): EventRecord objects of the previous version.
+        events (list): EventRecord objects of the new version, ids are updated in place.
+
+    Returns:
+        dict: The "added" and "removed" EventRecord objects, and the "changed"
+            events with their date in both versions.
+    """
+    unmatched = defaultdict(list)
+    for event in previous:
+        unmatched[(event.subject, event.description)].append(event)
+
+    added, changed = [], []
+    for event in events:
+        candidates = unmatched.get((event.subject, event.description))
+        if not candidates:
+            added.append(event)
+            continue
+        # Prefer an event with the same date, duplicates are matched in order
+        match = next((old for old in candidates if old.date == event.date),
+                     candidates[0])
+        candidates.remove(match)
+        event.id = match.id
+        if match.date != event.date:
+            changed.append({
+                "id": event.id,
+                "subject": event.subject,
+                "description": event.description,
+                "date": event.date,
+                "previousDate": match.date,
+            })
+
+    removed = [event for candidates in unmatched.values() for event in candidates]
+    removed.sort(key=previous.index)
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+revision_store = RevisionStore(config.REVISION_CACHE_SIZE)
@@ -0,0 +1,81 @@
+"""
+Rule-based sentence segmenter for scheduling orders.
+A fast alternative to splitting sentences with spaCy's dependency parser, it
+knows about numbered paragraphs ("12."), legal abbreviations (No., v.,
+Fed. R. Civ. P.), times (a.m./p.m.) and citations.
+"""
+import re
+
+# Lower-cased tokens which are followed by a period without ending the sentence
+ABBREVIATIONS = {
+    # Case captions and citations
+    "no", "nos", "vs", "civ", "crim", "evid", "fed", "app", "supp", "stat",
+    "ariz", "cal", "ct", "sup", "cir", "dist", "div", "rev", "ann", "ed",
+    "sec", "secs", "art", "para", "pp", "ch", "id", "cf", "al", "seq", "ex",
+    "lrciv", "cv", "dkt", "doc",
+    # Parties and addresses
+    "inc", "llc", "llp", "pllc", "co", "corp", "ltd", "assn", "dept",
+    "mr", "mrs", "ms", "dr", "jr", "sr", "esq", "hon", "st", "ave", "ste",
+    "blvd", "rd",
+    # Dates and times
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct",
+    "nov", "dec", "mon", "tue", "tues", "wed", "thu", "thur", "thurs", "fri",
+    "approx", "etc",
+}
+
+# Candidate boundary: end punctuation, optional closing quote/bracket, whitespace
+_BOUNDARY = re.compile(r"[.!?][\"'’”)\]]*\s+")
+# Dotted abbreviations like a.m, p.m, e.g, i.e, u.s
+_DOTTED = re.compile(r"(?:[a-z]\.)+[a-z]")
+# Paragraph numbers like 12 or (12 at the very start of a sentence
+_PARAGRAPH_NUMBER = re.compile(r"\(?\d{1,3}")
+
+
+def _is_boundary(text, start, match):
+    """
+    Decides if the candidate boundary match ends the sentence started at start.
+    """
+    following = text[match.end():match.end() + 1]
+    if following.islower():
+        return False
+    if text[match.start()] != ".":
+        return True
+
+    preceding = text[start:match.start()].split()
+    if not preceding:
+        return False
+    token = preceding[-1].lstrip("(\"'[“‘").lower()
+
+    if token in ABBREVIATIONS or _DOTTED.fullmatch(token):
+        return False
+    # Initials and single letters: "v.", "R.", "P.", "J."
+    if len(token) == 1 and token.isalpha():
+        return False
+    # A numbered paragraph marker stays with the sentence that follows it
+    if len(preceding) == 1 and _PARAGRAPH_NUMBER.fullmatch(token):
+        return False
+    return True
+
+
+def split_sentences(text):
+    """
+    Splits the text into sentences.
+
+    Parameter:
+        text (string): A paragraph of the scheduling order.
+
+    Returns:
+        list: The sentences, stripped of surrounding whitespace.
+    """
+    sentences = []
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        if _is_boundary(text, start, match):
+            sentence = text[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
@@ -0,0 +1,102 @@
+"""
+Module for coalescing identical requests in flight.
+When several requests for the same document arrive together, only the first
+one downloads and parses it, the others wait for it and get the same result
+(or exception). Calls are only shared while they run, nothing is cached, and
+only within one process: requests on other workers parse the document too.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time and shares its result with the
+    callers which ask for the same key meanwhile.
+    Threads use do, coroutines of the event loop use do_async.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Calls func, or waits for the call already running for the key.
+
+        Args:
+            key: Hashable description of the call, e.g. the document hash and options.
+            func (callable): Called with args and kwargs by the first caller.
+
+        Returns:
+            tuple: The result and whether it came from another caller's call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """
+        Same as do for coroutine functions, func is awaited by the first caller.
+        If the first caller is cancelled, e.g. its client went away, the
+        callers waiting for it make the call again.
+        """
+        future = self._async_calls.get(key)
+        while future is not None:
+            try:
+                # Shielded so a cancelled waiter doesn't cancel the shared call
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            future = self._async_calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Retrieved so failures nobody waited for aren't logged
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._async_calls[key]
+        return result, False
+
+
+flights = SingleFlight()
@@ -0,0 +1,307 @@
+"""
+Differential accuracy check of the optimized parser modes against the reference path.
+Every mode parses the sample orders and a set of synthetic orders. Its case
+details and events are diffed against the reference path (accurate profile,
+cold caches, no prescreen, no low-memory or parallel processing), and for
+the synthetic orders against their known events too. The report has the
+speedup of each mode next to its precision and recall, and the exit status
+is 1 when a mode falls below the threshold, so a mode can be gated on it.
+
+Usage:
+    python -m scripts.accuracy_diff --synthetic 5 --output accuracy_report.md
+    python -m scripts.accuracy_diff --modes prescreen fast --loose --threshold 0.9
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from app import config
+from app.services import event_workers
+from app.services.layout_templates import template_store
+from app.services.margins import crop_box_cache
+from app.services.page_text_cache import page_text_cache
+from app.services.pdfparser import PdfParser
+from app.services.profiles import REFERENCE_PROFILE, load_pipeline
+from scripts.benchmark_profiles import event_set, precision_recall, sample_files
+from scripts.synthetic_orders import make_order
+
+# Each mode turns on one optimization of the reference path
+MODES = {
+    "reference": {},
+    "prescreen": {"parser": {"prescreen": True}},
+    "low-memory": {"parser": {"low_memory": True}},
+    "parallel": {"workers": 2, "config": {"EVENT_PARALLEL_MIN_CHARS": 0}},
+    "cached": {"warm": True},
+    "rules": {"segmenter": "rules"},
+    "balanced": {"profile": "balanced"},
+    "fast": {"profile": "fast"},
+}
+# Modes expected to give exactly the reference output
+DEFAULT_MODES = ["prescreen", "low-memory", "parallel", "cached"]
+CASE_FIELDS = ("caseNum", "court", "plaintiff", "defendant")
+
+
+@contextlib.contextmanager
+def overrides(values):
+    """
+    Sets config values for the duration of the block.
+    They are also set in the environment, for section workers started meanwhile.
+    """
+    saved = {name: getattr(config, name) for name in values}
+    environ = {name: os.environ.get(name) for name in values}
+    try:
+        for name, value in values.items():
+            setattr(config, name, value)
+            _set_env(name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+        for name, value in environ.items():
+            _set_env(name, value)
+
+
+def _set_env(name, value):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = str(value)
+
+
+@contextlib.contextmanager
+def cold_caches():
+    """
+    Empties the page text, crop box and caption template caches and keeps
+    the page text cache off the disk for the duration of the block.
+    """
+    directory = page_text_cache.directory
+    page_text_cache.directory = None
+    for cache in (page_text_cache, crop_box_cache, template_store):
+        cache.clear()
+    try:
+        yield
+    finally:
+        page_text_cache.directory = directory
+
+
+def parse(filepath, mode):
+    """
+    Extracts the case details and events of a file in a mode.
+    The file is closed without saving so it isn't modified.
+
+    Returns:
+        tuple: The case details, the events and the elapsed seconds.
+    """
+    settings = MODES[mode]
+    values = {"SENTENCE_SEGMENTER": None, "DATE_PRESCREEN": False,
+              **settings.get("config", {})}
+    caches = contextlib.nullcontext() if settings.get("warm") else cold_caches()
+    with overrides(values), caches:
+        if settings.get("warm"):
+            _run(filepath, settings)
+        start = time.perf_counter()
+        case_details, events = _run(filepath, settings)
+        return case_details, events, time.perf_counter() - start
+
+
+def _run(filepath, settings):
+    parser = PdfParser(filepath, segmenter=settings.get("segmenter"),
+                       profile=settings.get("profile", REFERENCE_PROFILE))
+    for name, value in {"prescreen": False, "low_memory": False,
+                        **settings.get("parser", {})}.items():
+        setattr(parser, name, value)
+    try:
+        return parser.get_case_details(), parser.get_events(workers=settings.get("workers", 0))
+    finally:
+        parser.file.close()
+
+
+def diff_case(reference, result):
+    """
+    Returns the case fields which differ, as {field: [reference, result]}.
+    """
+    return {field: [reference.get(field), result.get(field)]
+            for field in CASE_FIELDS if reference.get(field) != result.get(field)}
+
+
+def compare(reference, result, strict=True):
+    """
+    Compares the events of a mode with the reference events.
+
+    Returns:
+        dict: The precision, recall and the missing and extra (event, task, date) items.
+    """
+    expected, found = event_set(reference, strict), event_set(result, strict)
+    precision, recall = precision_recall(expected, found)
+    return {
+        "precision": precision,
+        "recall": recall,
+        "missing": sorted(expected - found),
+        "extra": sorted(found - expected),
+    }
+
+
+def truth_set(expected):
+    """
+    The (event, "", date) items of a synthetic order, comparable to event_set(strict=False).
+    """
+    return {(title.lower(), "", date) for title, date in expected["events"]}
+
+
+def build_corpus(synthetic, sections, seed, directory):
+    """
+    Returns the (path, expected) pairs of the sample and synthetic orders,
+    expected is None for the samples.
+    """
+    corpus = [(path, None) for path in sample_files()]
+    for number in range(seed, seed + synthetic):
+        data, expected = make_order(number, sections)
+        path = os.path.join(directory, f"synthetic-{number:04d}.pdf")
+        with open(path, "wb") as file:
+            file.write(data)
+        corpus.append((path, expected))
+    return corpus
+
+
+def evaluate(corpus, modes, strict=True):
+    """
+    Parses the corpus in the reference path and every mode and compares the results.
+
+    Returns:
+        list: One dict of measurements per mode, the reference first.
+    """
+    reference, rows = {}, []
+    try:
+        for mode in ["reference"] + [mode for mode in modes if mode != "reference"]:
+            load_pipeline(MODES[mode].get("profile", REFERENCE_PROFILE))
+            timings, precisions, recalls, truth = [], [], [], [[], []]
+            case_matches, differences = 0, []
+            for path, expected in corpus:
+                case_details, events, elapsed = parse(path, mode)
+                timings.append(elapsed)
+                if mode == "reference":
+                    reference[path] = (case_details, events)
+                ref_case, ref_events = reference[path]
+                case_diff = diff_case(ref_case, case_details)
+                case_matches += not case_diff
+                comparison = compare(ref_events, events, strict)
+                precisions.append(comparison["precision"])
+                recalls.append(comparison["recall"])
+                if expected:
+                    precision, recall = precision_recall(
+                        truth_set(expected), event_set(events, strict=False))
+                    truth[0].append(precision)
+                    truth[1].append(recall)
+                if case_diff or comparison["missing"] or comparison["extra"]:
+                    differences.append({
+                        "file": os.path.basename(path),
+                        "case": case_diff,
+                        "missing": comparison["missing"],
+                        "extra": comparison["extra"],
+                    })
+            rows.append({
+                "mode": mode,
+                "seconds": sum(timings),
+                "case_match": case_matches / len(corpus),
+                "precision": statistics.mean(precisions),
+                "recall": statistics.mean(recalls),
+                "truth_precision": statistics.mean(truth[0]) if truth[0] else None,
+                "truth_recall": statistics.mean(truth[1]) if truth[1] else None,
+                "differences": differences,
+            })
+    finally:
+        event_workers.shutdown_pools()
+
+    for row in rows:
+        row["speedup"] = rows[0]["seconds"] / row["seconds"] if row["seconds"] else None
+    return rows
+
+
+def passed(row, threshold):
+    """
+    Checks if a mode matches the reference at least as well as the threshold.
+    """
+    return min(row["case_match"], row["precision"], row["recall"]) >= threshold
+
+
+def _score(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def to_markdown(rows, corpus, strict, threshold):
+    """
+    Formats the measurements as a markdown report.
+    """
+    synthetic = sum(1 for _, expected in corpus if expected)
+    items = "(event, task, date)" if strict else "(event, date)"
+    lines = [
+        "# Parser mode accuracy",
+        "",
+        f"{len(corpus) - synthetic} sample and {synthetic} synthetic orders. Precision and "
+        f"recall are measured on {items} items against the reference path, the truth "
+        "columns on (event, date) items against the known events of the synthetic orders. "
+        f"Modes pass with case details, precision and recall of at least {threshold}.",
+        "",
+        "| Mode | Seconds | Speedup | Case match | Precision | Recall "
+        "| Truth precision | Truth recall | Pass |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['mode']} | {row['seconds']:.2f} | {_score(row['speedup'])}x "
+            f"| {row['case_match']:.3f} | {row['precision']:.3f} | {row['recall']:.3f} "
+            f"| {_score(row['truth_precision'])} | {_score(row['truth_recall'])} "
+            f"| {'yes' if passed(row, threshold) else 'no'} |")
+
+    for row in rows:
+        if not row["differences"]:
+            continue
+        lines += ["", f"## Differences of {row['mode']}", ""]
+        for difference in row["differences"]:
+            lines.append(f"- {difference['file']}")
+            for field, (expected, found) in difference["case"].items():
+                lines.append(f"  - {field}: {expected!r} -> {found!r}")
+            for label in ("missing", "extra"):
+                for event, task, date in difference[label]:
+                    lines.append(f"  - {label}: {event} | {task} | {date}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--modes", nargs="+", default=DEFAULT_MODES, choices=list(MODES),
+                            help="modes compared with the reference path")
+    arg_parser.add_argument("--synthetic", type=int, default=5, help="synthetic orders")
+    arg_parser.add_argument("--sections", type=int, default=8,
+                            help="sections per synthetic order")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed of the first synthetic order")
+    arg_parser.add_argument("--loose", action="store_true",
+                            help="compare (event, date) items, ignoring the task wording")
+    arg_parser.add_argument("--threshold", type=float, default=1.0,
+                            help="lowest case match, precision and recall a mode passes with")
+    arg_parser.add_argument("--output", help="write the markdown report to this file")
+    arg_parser.add_argument("--json", help="write the measurements as JSON to this file")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="accuracy-") as directory:
+        corpus = build_corpus(args.synthetic, args.sections, args.seed, directory)
+        rows = evaluate(corpus, args.modes, strict=not args.loose)
+
+    report = to_markdown(rows, corpus, not args.loose, args.threshold)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=2, default=str)
+    sys.exit(0 if all(passed(row, args.threshold) for row in rows) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmarks the PdfParser profiles on the sample scheduling orders.
+Reports the throughput of each profile and its event-level precision and
+recall against the reference (accurate) profile.
+
+Usage:
+    python -m scripts.benchmark_profiles --repeat 3 --output docs/profile_benchmarks.md
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from app.services.pdfparser import PdfParser
+from app.services.profiles import PROFILES, REFERENCE_PROFILE, load_pipeline
+
+SAMPLE_FILES = os.path.join(os.path.dirname(__file__), "..", "Sample Files")
+
+
+def sample_files():
+    """
+    Returns the sample PDFs sorted by name.
+    """
+    return sorted(path for path in glob.glob(os.path.join(SAMPLE_FILES, "*"))
+                  if path.lower().endswith(".pdf"))
+
+
+def parse(filepath, profile):
+    """
+    Runs case details and event extraction with a profile.
+    The file is closed without saving so the samples aren't modified.
+
+    Returns:
+        tuple: The case details, the events and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    parser = PdfParser(filepath, profile=profile)
+    try:
+        case_details = parser.get_case_details()
+        events = parser.get_events()
+    finally:
+        parser.file.close()
+    return case_details, events, time.perf_counter() - start
+
+
+def event_set(events, strict=True):
+    """
+    Flattens get_events output into a set of (event, task, date) items.
+    With strict=False tasks are ignored and only (event, date) pairs are compared.
+    """
+    items = set()
+    for event, tasks in events.items():
+        for task, date in tasks.items():
+            items.add((event.lower(), task if strict else "", str(date.date())))
+    return items
+
+
+def precision_recall(reference, result):
+    """
+    Precision and recall of the result set against the reference set.
+    """
+    matched = len(reference & result)
+    precision = matched / len(result) if result else float(not reference)
+    recall = matched / len(reference) if reference else 1.0
+    return precision, recall
+
+
+def benchmark(files, repeat):
+    """
+    Benchmarks every profile over the files.
+
+    Returns:
+        list: One dict of measurements per profile.
+    """
+    reference = {}
+    rows = []
+    for profile in [REFERENCE_PROFILE] + [name for name in PROFILES if name != REFERENCE_PROFILE]:
+        load_pipeline(profile)  # model loading is not part of the timing
+        timings, strict, loose, events_found = [], [[], []], [[], []], 0
+        for filepath in files:
+            for _ in range(repeat):
+                _, events, elapsed = parse(filepath, profile)
+                timings.append(elapsed)
+            if profile == REFERENCE_PROFILE:
+                reference[filepath] = events
+            events_found += len(event_set(events))
+            for scores, is_strict in ((strict, True), (loose, False)):
+                precision, recall = precision_recall(
+                    event_set(reference[filepath], is_strict), event_set(events, is_strict))
+                scores[0].append(precision)
+                scores[1].append(recall)
+        rows.append({
+            "profile": profile,
+            "docs_per_second": len(timings) / sum(timings),
+            "mean_seconds": statistics.mean(timings),
+            "events": events_found,
+            "precision": statistics.mean(strict[0]),
+            "recall": statistics.mean(strict[1]),
+            "event_date_precision": statistics.mean(loose[0]),
+            "event_date_recall": statistics.mean(loose[1]),
+        })
+    return rows
+
+
+def to_markdown(rows, files, repeat):
+    """
+    Formats the measurements as a markdown report.
+    """
+    lines = [
+        "# Parser profile benchmarks",
+        "",
+        f"{len(files)} sample orders, {repeat} run(s) each. Precision and recall are "
+        f"measured on (event, task, date) items against the `{REFERENCE_PROFILE}` "
+        "profile; the event/date columns ignore the task wording.",
+        "",
+        "| Profile | Docs/s | Mean s/doc | Events | Precision | Recall "
+        "| Event/date precision | Event/date recall |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['profile']} | {row['docs_per_second']:.2f} | {row['mean_seconds']:.2f} "
+            f"| {row['events']} | {row['precision']:.3f} | {row['recall']:.3f} "
+            f"| {row['event_date_precision']:.3f} | {row['event_date_recall']:.3f} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs per file and profile")
+    arg_parser.add_argument("--output", help="write the markdown report to this file")
+    args = arg_parser.parse_args()
+
+    files = sample_files()
+    report = to_markdown(benchmark(files, args.repeat), files, args.repeat)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report)
+
+
+if __name__ == "__main__":
+    main()
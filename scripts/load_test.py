@@ -0,0 +1,448 @@
+"""
+Load tests /upload and /order-details on a local instance of the service.
+Starts the app in a subprocess together with an in-memory S3 stand-in and
+a fake OpenAI server with configurable latency, drives a mixed workload of
+sample and synthetic orders at a fixed concurrency and reports latency
+percentiles, throughput, error rate and the peak RSS of every server
+process. RSS is read from /proc, so the memory figures need Linux.
+
+Usage:
+    python -m scripts.load_test --requests 200 --concurrency 8 --output load_report.md
+    python -m scripts.load_test --server asgi --workers 2 --gpt-ratio 0.2 --gpt-latency 1.5
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from scripts.benchmark_profiles import sample_files
+from scripts.synthetic_orders import make_order
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BUCKET = "loadtest"
+# Object keys are "<request number>__<file id>", the fake S3 serves the file of the id
+KEY_SEPARATOR = "__"
+GPT_EVENTS = [
+    {"subject": "Initial disclosures", "date": "2022-07-01",
+     "description": "The parties shall exchange initial disclosures."},
+    {"subject": "Private mediation", "date": "2022-12-30",
+     "description": "The parties shall complete mediation."},
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeS3:
+    """
+    Path-style S3 stand-in serving HeadObject, GetObject and PutObject from memory.
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.uploads = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", free_port()), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def _handler(self):
+        s3 = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _body(self):
+                key = self.path.split("?")[0].split("/", 2)[-1]
+                return s3.files.get(key.split(KEY_SEPARATOR, 1)[-1])
+
+            def _send_object(self, with_body):
+                body = self._body()
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", f'"{hash(body) & 0xffffffff:08x}"')
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self._send_object(False)
+
+            def do_GET(self):
+                self._send_object(True)
+
+            def do_PUT(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                s3.uploads += 1
+                self.send_response(200)
+                self.send_header("ETag", '"uploaded"')
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class FakeOpenAI:
+    """
+    Chat completions endpoint answering every request with the same events after a delay.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", free_port()), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fake.calls += 1
+                time.sleep(fake.latency)
+                body = json.dumps({
+                    "id": "chatcmpl-load", "object": "chat.completion",
+                    "created": int(time.time()), "model": "gpt-3.5-turbo",
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                        "role": "assistant", "content": json.dumps(GPT_EVENTS)}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class RssSampler:
+    """
+    Samples the RSS of a process and its descendants, keeping the peak of each.
+    """
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in process_tree(self.pid):
+                rss = rss_bytes(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(self.peaks.get(pid, 0), rss)
+            self._stop.wait(self.interval)
+
+
+def process_tree(pid):
+    """
+    Returns the pid and the pids of all its descendants.
+    """
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", encoding="ascii") as file:
+                    pending.extend(int(child) for child in file.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def load_files(synthetic, sections, seed):
+    """
+    Returns the workload documents by file id: the sample orders and synthetic ones.
+    """
+    files = {}
+    for path in sample_files():
+        with open(path, "rb") as file:
+            files[f"sample-{len(files)}.pdf"] = file.read()
+    for number in range(synthetic):
+        files[f"synthetic-{number}.pdf"] = make_order(seed + number, sections)[0]
+    return files
+
+
+def build_workload(file_ids, count, upload_ratio, gpt_ratio, seed):
+    """
+    Builds the list of (endpoint, file id, uses GPT) requests, reproducible for a seed.
+    """
+    rng = random.Random(seed)
+    return [("upload" if rng.random() < upload_ratio else "order-details",
+             rng.choice(file_ids), rng.random() < gpt_ratio)
+            for _ in range(count)]
+
+
+def start_server(args, workdir, env):
+    port = free_port()
+    if args.server == "asgi":
+        command = [sys.executable, "-m", "hypercorn", "app.asgi:app",
+                   "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers)]
+    else:
+        command = [sys.executable, "-c",
+                   "from app.run import app; "
+                   f"app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited: {process.stderr.read().decode()[-2000:]}")
+        try:
+            requests.get(url, timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start in time")
+
+
+def send(url, files, number, request):
+    """
+    Sends one workload request.
+
+    Returns:
+        tuple: The endpoint, the status code (0 on connection errors) and the latency in seconds.
+    """
+    endpoint, file_id, gpt = request
+    start = time.perf_counter()
+    try:
+        if endpoint == "upload":
+            response = requests.post(
+                f"{url}/upload",
+                files={"file": (f"{number}-{file_id}", files[file_id], "application/pdf")},
+                data={"data": json.dumps({"is_authorized": gpt})},
+                timeout=300)
+        else:
+            response = requests.get(
+                f"{url}/order-details",
+                params={"filename": f"{number}{KEY_SEPARATOR}{file_id}"},
+                headers={"Is-Authorized": str(gpt).lower()},
+                timeout=300)
+        status = response.status_code
+    except requests.RequestException:
+        status = 0
+    return endpoint, status, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of the values.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)] if ordered else 0.0
+
+
+def summarize(results, elapsed):
+    """
+    Aggregates the request results, overall and per endpoint.
+    """
+    rows = []
+    for name in ("all", "upload", "order-details"):
+        selected = [result for result in results if name in ("all", result[0])]
+        if not selected:
+            continue
+        latencies = [latency for _, _, latency in selected]
+        statuses = {}
+        for _, status, _ in selected:
+            statuses[status] = statuses.get(status, 0) + 1
+        errors = sum(count for status, count in statuses.items() if status != 200)
+        rows.append({
+            "endpoint": name,
+            "requests": len(selected),
+            "throughput": len(selected) / elapsed,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "mean": statistics.mean(latencies),
+            "error_rate": errors / len(selected),
+            "statuses": statuses,
+        })
+    return rows
+
+
+def to_markdown(report):
+    """
+    Formats the load test report as markdown.
+    """
+    settings = report["settings"]
+    lines = [
+        "# Load test report",
+        "",
+        f"{settings['requests']} requests at concurrency {settings['concurrency']} on the "
+        f"`{settings['server']}` server ({settings['workers']} worker(s)), "
+        f"{settings['upload_ratio']:.0%} uploads, {settings['gpt_ratio']:.0%} GPT requests "
+        f"with {settings['gpt_latency']}s OpenAI latency, seed {settings['seed']}.",
+        f"{report['files']} documents, {report['elapsed']:.1f}s wall time, "
+        f"Python {report['python']}.",
+        "",
+        "| Endpoint | Requests | Req/s | p50 s | p95 s | p99 s | Mean s | Error rate | Statuses |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for row in report["latency"]:
+        statuses = ", ".join(f"{status}: {count}"
+                             for status, count in sorted(row["statuses"].items()))
+        lines.append(
+            f"| {row['endpoint']} | {row['requests']} | {row['throughput']:.2f} "
+            f"| {row['p50']:.3f} | {row['p95']:.3f} | {row['p99']:.3f} | {row['mean']:.3f} "
+            f"| {row['error_rate']:.1%} | {statuses} |")
+    lines += ["", "| Process | Peak RSS MiB |", "|---|---|"]
+    for pid, rss in sorted(report["rss"].items()):
+        lines.append(f"| {pid} | {rss / 2 ** 20:.1f} |")
+    return "\n".join(lines) + "\n"
+
+
+def run(args):
+    """
+    Runs the load test and returns the report dict.
+    """
+    files = load_files(args.synthetic, args.sections, args.seed)
+    workload = build_workload(sorted(files), args.requests, args.upload_ratio,
+                              args.gpt_ratio, args.seed)
+    s3, openai_server = FakeS3(files), FakeOpenAI(args.gpt_latency)
+    s3.start()
+    openai_server.start()
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    os.makedirs(os.path.join(workdir, "temp_files"))
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+               S3_BUCKET=BUCKET, AWS_ENDPOINT_URL=s3.url, AWS_ACCESS_KEY_ID="load-test",
+               AWS_SECRET_ACCESS_KEY="load-test", AWS_DEFAULT_REGION="us-east-1",
+               OPENAI_API_BASE=openai_server.url, OPENAI_API_KEY="load-test",
+               CASE_INDEX_PATH=os.path.join(workdir, "case_index.db"))
+    env.update(variable.split("=", 1) for variable in args.env)
+
+    process, url = start_server(args, workdir, env)
+    sampler = RssSampler(process.pid)
+    sampler.start()
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(lambda item: send(url, files, *item),
+                                    enumerate(workload)))
+        elapsed = time.perf_counter() - start
+    finally:
+        sampler.stop()
+        process.terminate()
+        process.wait(timeout=30)
+        s3.stop()
+        openai_server.stop()
+
+    return {
+        "settings": {
+            "requests": args.requests, "concurrency": args.concurrency,
+            "server": args.server, "workers": args.workers if args.server == "asgi" else 1,
+            "upload_ratio": args.upload_ratio, "gpt_ratio": args.gpt_ratio,
+            "gpt_latency": args.gpt_latency, "seed": args.seed, "env": args.env,
+        },
+        "files": len(files),
+        "elapsed": elapsed,
+        "python": platform.python_version(),
+        "latency": summarize(results, elapsed),
+        "rss": sampler.peaks,
+        "openai_calls": openai_server.calls,
+        "s3_uploads": s3.uploads,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--requests", type=int, default=100, help="requests to send")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="requests in flight")
+    arg_parser.add_argument("--server", choices=("flask", "asgi"), default="flask",
+                            help="the Flask app (app.run) or the async app (app.asgi)")
+    arg_parser.add_argument("--workers", type=int, default=1,
+                            help="hypercorn worker processes for --server asgi")
+    arg_parser.add_argument("--upload-ratio", type=float, default=0.5,
+                            help="share of /upload requests, the rest are /order-details")
+    arg_parser.add_argument("--gpt-ratio", type=float, default=0.0,
+                            help="share of requests using GPT")
+    arg_parser.add_argument("--gpt-latency", type=float, default=1.0,
+                            help="seconds the fake OpenAI server takes to answer")
+    arg_parser.add_argument("--synthetic", type=int, default=4,
+                            help="synthetic orders added to the sample files")
+    arg_parser.add_argument("--sections", type=int, default=12,
+                            help="sections per synthetic order")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed of the workload")
+    arg_parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                            help="extra environment variable for the server, repeatable")
+    arg_parser.add_argument("--startup-timeout", type=float, default=120,
+                            help="seconds to wait for the server to start")
+    arg_parser.add_argument("--output", help="write the markdown report to this file")
+    arg_parser.add_argument("--json", help="write the raw report to this JSON file")
+    args = arg_parser.parse_args()
+
+    report = run(args)
+    markdown = to_markdown(report)
+    print(markdown)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(markdown)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Generates synthetic scheduling orders for load and accuracy testing.
+The orders follow the layout of the sample files: a line-numbered pleading
+page, a caption with the court, the parties and the case number, and
+numbered sections with one or more deadlines each. The expected events of
+every order are known, so parser output can be checked against them.
+
+Usage:
+    python -m scripts.synthetic_orders --count 10 --output /tmp/orders
+"""
+import argparse
+import datetime
+import os
+import random
+
+import fitz
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+LINE_HEIGHT = 24
+FONT_SIZE = 11
+BODY_X, BODY_RIGHT = 108, 540
+FIRST_LINE_Y, LAST_LINE_Y = 84, 720
+
+SECTIONS = [
+    ("Initial disclosures", "The parties shall exchange initial disclosures by {date}."),
+    ("Amendment of pleadings", "Any motion to amend the pleadings shall be filed by {date}."),
+    ("Expert witness disclosures",
+     "Plaintiff shall disclose areas of expert testimony by {date}. "
+     "Defendant shall disclose areas of expert testimony by {date}."),
+    ("Fact discovery", "The parties shall complete all fact discovery by {date}."),
+    ("Private mediation",
+     "The parties shall participate in mediation using a private mediator agreed to by "
+     "the parties. The parties shall complete mediation by {date}."),
+    ("Dispositive motions", "All dispositive motions shall be filed by {date}."),
+    ("Pretrial statement", "The parties shall file a joint pretrial statement by {date}."),
+    ("Trial setting conference",
+     "A trial setting conference will be held on {date} at 9:00 a.m."),
+]
+FILLER = (
+    "Counsel shall confer in good faith before bringing any discovery dispute to the "
+    "attention of the court, and the deadlines in this order will only be extended for "
+    "good cause shown."
+)
+FIRST_NAMES = ["Harvey", "Louis", "Jessica", "Rachel", "Donna", "Michael", "Katrina"]
+LAST_NAMES = ["Specter", "Litt", "Pearson", "Zane", "Paulsen", "Ross", "Bennett"]
+COUNTIES = ["Maricopa", "Pima", "Yavapai", "Coconino"]
+
+
+def format_date(date):
+    return f"{date:%B} {date.day}, {date.year}"
+
+
+def make_order(seed, sections=6, filler=1, plaintiff_lines=1):
+    """
+    Builds a synthetic scheduling order.
+
+    Args:
+        seed (int): Seed of the random choices, the same seed gives the same order.
+        sections (int): Number of numbered sections, repeated if larger than the templates.
+        filler (int): Filler sentences without dates after each section, to grow the order.
+        plaintiff_lines (int): Lines of the plaintiff's name in the caption, more
+            lines move the labels and the defendant down.
+
+    Returns:
+        tuple: The PDF bytes and the expected details: the case number, the parties
+            and the (section, date) pairs of the events.
+    """
+    rng = random.Random(seed)
+    case_num = f"CV{2020 + seed % 4}-{rng.randint(1000, 99999):06d}"
+    plaintiff = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    defendant = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    county = rng.choice(COUNTIES)
+
+    date = datetime.date(2022, 1, 3) + datetime.timedelta(days=rng.randint(0, 300))
+    paragraphs, events = [], []
+    for number in range(1, sections + 1):
+        title, template = SECTIONS[(number - 1) % len(SECTIONS)]
+        cycle = (number - 1) // len(SECTIONS)
+        if cycle:
+            # Section headings are the event keys, so they must stay unique
+            title = f"{title} ({cycle + 1})"
+        dates = []
+        for _ in range(template.count("{date}")):
+            date += datetime.timedelta(days=rng.randint(14, 60))
+            dates.append(date)
+            events.append((title, date.isoformat()))
+        text = template.replace("{date}", "{}").format(*map(format_date, dates))
+        paragraphs.append(f"{number}. {title}: {text}")
+        paragraphs.extend([FILLER] * filler)
+
+    document = fitz.open()
+    page = _new_page(document)
+    if plaintiff_lines > 1:
+        plaintiff = "\n".join([f"{plaintiff}, individually and on behalf of"]
+                               + ["the statutory beneficiaries"] * (plaintiff_lines - 1))
+    y = _write_caption(page, county, plaintiff, defendant, case_num)
+    for paragraph in paragraphs:
+        for line in _wrap(paragraph):
+            if y > LAST_LINE_Y:
+                page = _new_page(document)
+                y = FIRST_LINE_Y
+            page.insert_text((BODY_X, y), line, fontsize=FONT_SIZE)
+            y += LINE_HEIGHT
+    for number, page in enumerate(document, 1):
+        page.insert_text((PAGE_WIDTH / 2, 760), str(number), fontsize=FONT_SIZE)
+
+    data = document.tobytes()
+    document.close()
+    expected = {
+        "caseNum": case_num,
+        "plaintiff": plaintiff,
+        "defendant": defendant,
+        "events": events,
+    }
+    return data, expected
+
+
+def _new_page(document):
+    page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    # Right-aligned line numbers in the gutter, like pleading paper
+    for number in range(1, (LAST_LINE_Y - FIRST_LINE_Y) // LINE_HEIGHT + 2):
+        text = str(number)
+        x = 78 - fitz.get_text_length(text, fontsize=FONT_SIZE)
+        page.insert_text((x, FIRST_LINE_Y + (number - 1) * LINE_HEIGHT), text,
+                         fontsize=FONT_SIZE)
+    return page
+
+
+def _write_caption(page, county, plaintiff, defendant, case_num):
+    """
+    Writes the court, parties and case number, returns the y of the next body line.
+    """
+    y = FIRST_LINE_Y + 4 * LINE_HEIGHT
+    for line in ("IN THE SUPERIOR COURT OF THE STATE OF ARIZONA",
+                 f"IN AND FOR THE COUNTY OF {county.upper()}"):
+        x = (PAGE_WIDTH - fitz.get_text_length(line, fontsize=FONT_SIZE)) / 2
+        page.insert_text((x, y), line, fontsize=FONT_SIZE)
+        y += LINE_HEIGHT
+    y += LINE_HEIGHT
+    top = y
+    for line in (*f"{plaintiff},".splitlines(), "", "Plaintiff,", "v.", f"{defendant},", "",
+                 "Defendant."):
+        page.insert_text((BODY_X, y), line, fontsize=FONT_SIZE)
+        y += LINE_HEIGHT
+    page.insert_text((340, top + LINE_HEIGHT), f"Case No. {case_num}", fontsize=FONT_SIZE)
+    page.insert_text((340, top + 3 * LINE_HEIGHT), "SCHEDULING ORDER", fontsize=FONT_SIZE)
+    return y + LINE_HEIGHT
+
+
+def _wrap(text):
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if fitz.get_text_length(candidate, fontsize=FONT_SIZE) > BODY_RIGHT - BODY_X:
+            lines.append(line)
+            candidate = word
+        line = candidate
+    return lines + [line]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--count", type=int, default=10, help="number of orders")
+    arg_parser.add_argument("--sections", type=int, default=6, help="sections per order")
+    arg_parser.add_argument("--filler", type=int, default=1,
+                            help="sentences without dates after each section")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed of the first order")
+    arg_parser.add_argument("--output", required=True, help="directory for the PDFs")
+    args = arg_parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for seed in range(args.seed, args.seed + args.count):
+        data, expected = make_order(seed, args.sections, args.filler)
+        path = os.path.join(args.output, f"synthetic-{seed:04d}.pdf")
+        with open(path, "wb") as file:
+            file.write(data)
+        print(path, expected["caseNum"], len(expected["events"]), "events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+from datetime import datetime
+
+from app import config
+from scripts.accuracy_diff import (compare, diff_case, evaluate, overrides, passed,
+                                   to_markdown, truth_set)
+from scripts.synthetic_orders import make_order
+
+REFERENCE = {
+    "no event": {},
+    "Initial disclosures": {"Exchange disclosures.": datetime(2022, 7, 1)},
+    "Private mediation": {"Complete mediation.": datetime(2022, 12, 30)},
+}
+
+
+def test_compare_identical():
+    assert compare(REFERENCE, REFERENCE) == {
+        "precision": 1.0, "recall": 1.0, "missing": [], "extra": []}
+
+
+def test_compare_reworded_task():
+    result = {**REFERENCE, "Private mediation": {"Mediation.": datetime(2022, 12, 30)}}
+    strict = compare(REFERENCE, result)
+    assert strict["precision"] == strict["recall"] == 0.5
+    assert strict["missing"] == [("private mediation", "Complete mediation.", "2022-12-30")]
+    assert compare(REFERENCE, result, strict=False)["recall"] == 1.0
+
+
+def test_diff_case():
+    reference = {"caseNum": "CV2022-001", "court": "Superior Court", "client": ""}
+    assert diff_case(reference, dict(reference)) == {}
+    assert diff_case(reference, {**reference, "caseNum": None}) == {
+        "caseNum": ["CV2022-001", None]}
+
+
+def test_truth_set():
+    _, expected = make_order(3, sections=2)
+    assert truth_set(expected) == {
+        (title.lower(), "", date) for title, date in expected["events"]}
+
+
+def test_overrides_restores_config(monkeypatch):
+    monkeypatch.delenv("DATE_PRESCREEN", raising=False)
+    before = config.DATE_PRESCREEN
+    with overrides({"DATE_PRESCREEN": not before}):
+        assert config.DATE_PRESCREEN is not before
+        assert os.environ["DATE_PRESCREEN"] == str(not before)
+    assert config.DATE_PRESCREEN is before
+    assert "DATE_PRESCREEN" not in os.environ
+
+
+def test_evaluate_prescreen_matches_reference(tmp_path):
+    data, expected = make_order(1, sections=2)
+    path = str(tmp_path / "order.pdf")
+    with open(path, "wb") as file:
+        file.write(data)
+
+    rows = evaluate([(path, expected)], ["prescreen"])
+
+    assert [row["mode"] for row in rows] == ["reference", "prescreen"]
+    assert all(passed(row, 1.0) for row in rows)
+    assert rows[1]["differences"] == []
+    assert rows[0]["truth_recall"] == rows[1]["truth_recall"]
+    assert "| prescreen |" in to_markdown(rows, [(path, expected)], True, 1.0)
@@ -0,0 +1,166 @@
+import asyncio
+import io
+import sqlite3
+from unittest.mock import AsyncMock, patch
+
+import fitz
+import pytest
+from quart.datastructures import FileStorage
+from app.asgi import app as App
+from app.controllers import async_controller
+from app.services.events import EventRecord
+from app.services.pdf_service import PdfService
+
+
+def make_pdf():
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), "Scheduling Order")
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+PDF_BYTES = make_pdf()
+RESULT = {
+    "case": {"caseNum": "12345", "court": "Court"},
+    "events": [EventRecord("Event", "2023-07-19", "Description", "uuid")],
+    "length": 1,
+}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def upload(data=None, filename="sample.pdf", headers=None):
+    client = App.test_client()
+    files = {"file": FileStorage(io.BytesIO(PDF_BYTES), filename=filename)}
+    return await client.post("/upload", files=files, form=data or {},
+                             headers=headers or {})
+
+
+def test_index():
+    async def call():
+        response = await App.test_client().get("/")
+        return response.status_code, await response.get_data()
+
+    status, body = run(call())
+    assert status == 200
+    assert b"Homepage" in body
+
+
+def test_upload_file_invalid_format():
+    response = run(upload(filename="sample.txt"))
+    assert response.status_code == 400
+
+
+@patch.object(PdfService, "parse_pdf", return_value=RESULT)
+def test_upload_file_success(mock_parse_pdf, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_files").mkdir()
+
+    async def call():
+        response = await upload(headers={"Accept-Encoding": "identity"})
+        return response, await response.get_json()
+
+    response, body = run(call())
+    assert response.status_code == 200
+    assert body["events"] == [{"id": "uuid", "subject": "Event",
+                               "date": "2023-07-19", "description": "Description"}]
+    assert response.headers["ETag"].strip('"')
+    mock_parse_pdf.assert_called_once_with(False)
+
+
+@patch("app.services.pdf_service.gpt_parser.get_completion_async", new_callable=AsyncMock)
+@patch("app.services.pdf_service.PdfParser", autospec=True)
+def test_upload_file_gpt_is_awaited(mock_parser, mock_completion, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_files").mkdir()
+    mock_parser.return_value.get_case_details.return_value = {"caseNum": "12345"}
+    mock_parser.return_value.get_gpt_content.return_value = "Trial on July 1, 2022."
+    mock_completion.return_value = [
+        {"id": "1", "subject": "Trial", "date": "2022-07-01", "description": "Trial starts"}]
+
+    async def call():
+        response = await upload(data={"data": '{"is_authorized": true}'})
+        return response, await response.get_json()
+
+    with patch("app.services.pdf_service.case_index"):
+        response, body = run(call())
+    assert response.status_code == 200
+    assert body["events"][0]["subject"] == "Trial"
+    mock_completion.assert_awaited_once_with("Trial on July 1, 2022.")
+    mock_parser.return_value.get_gpt_events.assert_not_called()
+    mock_parser.return_value.close_pdf.assert_called_once()
+    # Saved under a unique name and removed after parsing
+    assert mock_parser.call_args.args[0].endswith("-sample.pdf")
+    assert not list((tmp_path / "temp_files").iterdir())
+
+
+@patch("app.controllers.common.boto3")
+@patch.object(PdfService, "parse_pdf", return_value=RESULT)
+def test_order_details(mock_parse_pdf, mock_boto3, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_files").mkdir()
+    s3_client = mock_boto3.client.return_value
+    s3_client.head_object.return_value = {"ContentLength": len(PDF_BYTES)}
+
+    def write_pdf(bucket, key, path):
+        with open(path, "wb") as file:
+            file.write(PDF_BYTES)
+
+    s3_client.download_file.side_effect = write_pdf
+
+    async def call():
+        client = App.test_client()
+        headers = {"Is-Authorized": "false"}
+        response = await client.get("/order-details?filename=order.pdf", headers=headers)
+        etag = response.headers["ETag"]
+        again = await client.get("/order-details?filename=order.pdf",
+                                 headers=dict(headers, **{"If-None-Match": etag}))
+        return response, again
+
+    response, again = run(call())
+    assert response.status_code == 200
+    assert again.status_code == 304
+    mock_parse_pdf.assert_called_once_with(False)
+    s3_client.upload_file.assert_called_once()
+    assert not list((tmp_path / "temp_files").iterdir())
+
+
+def test_order_details_saturated():
+    limiter = async_controller.get_details.limiter
+    if not limiter.limit:
+        pytest.skip("order details concurrency limit is disabled")
+    taken = 0
+    while limiter.acquire():
+        taken += 1
+    try:
+        response = run(App.test_client().get("/order-details?filename=order.pdf"))
+    finally:
+        for _ in range(taken):
+            limiter.release()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"]
+
+
+@patch("app.controllers.common.case_index")
+def test_lookups_index_error(mock_index):
+    error = sqlite3.OperationalError("database is locked")
+    mock_index.get_case.side_effect = error
+    mock_index.case_documents.side_effect = error
+    mock_index.get_document.side_effect = error
+    mock_index.events_between.side_effect = error
+
+    async def call():
+        client = App.test_client()
+        responses = []
+        for path in ("/cases/12345", "/cases/12345/documents", "/documents/abc",
+                     "/events?from=2023-07-01&to=2023-07-31"):
+            response = await client.get(path)
+            responses.append((response.status_code, await response.get_json()))
+        return responses
+
+    for status, body in run(call()):
+        assert status == 500
+        assert body == {"error": "database is locked"}
@@ -0,0 +1,82 @@
+import hashlib
+import json
+
+from app import bulk
+from scripts.synthetic_orders import make_order
+
+
+def write_orders(directory, count):
+    paths = []
+    for seed in range(count):
+        data, _ = make_order(seed, sections=2)
+        path = directory / f"order-{seed}.pdf"
+        path.write_bytes(data)
+        paths.append(path)
+    return paths
+
+
+def read_records(output):
+    return [json.loads(line) for line in output.read_text().splitlines()]
+
+
+def test_find_documents(tmp_path):
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "b.PDF").write_bytes(b"")
+    (tmp_path / "a.pdf").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("")
+    assert bulk.find_documents(str(tmp_path)) == [
+        str(tmp_path / "a.pdf"), str(tmp_path / "nested" / "b.PDF")]
+
+    manifest = tmp_path / "keys.txt"
+    manifest.write_text("# archived orders\norders/1.pdf\n\ns3://other/2.pdf\n")
+    assert bulk.find_documents(str(manifest)) == ["orders/1.pdf", "s3://other/2.pdf"]
+
+
+def test_load_checkpoint_ignores_cut_records(tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"source": "a.pdf", "status": "ok"}) + "\n"
+        + json.dumps({"source": "b.pdf", "status": "error"}) + "\n"
+        # Valid JSON without a source, e.g. edited by hand
+        + json.dumps({"status": "ok"}) + "\n" + "[]\n"
+        + '{"source": "c.pdf", "sta')
+    assert bulk.load_checkpoint(str(output)) == {"a.pdf", "b.pdf"}
+    assert bulk.load_checkpoint(str(output), retry_errors=True) == {"a.pdf"}
+
+
+def test_run_and_resume(tmp_path):
+    paths = write_orders(tmp_path, 2)
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.7 not really")
+    hashes = [hashlib.sha256(path.read_bytes()).hexdigest() for path in paths]
+    sources = [str(path) for path in paths + [broken]]
+    output = tmp_path / "results.jsonl"
+
+    summary = bulk.run(sources, str(output), workers=2, index=False)
+
+    assert summary["parsed"] == 2 and summary["failed"] == 1
+    records = {record["source"]: record for record in read_records(output)}
+    assert records[str(broken)]["status"] == "error"
+    for path, doc_hash in zip(paths, hashes):
+        record = records[str(path)]
+        assert record["status"] == "ok"
+        assert record["documentHash"] == doc_hash
+        assert set(record["timings"]) == {"fetch", "parse"}
+        # The originals are parsed from a copy
+        assert hashlib.sha256(path.read_bytes()).hexdigest() == doc_hash
+
+    # Nothing is parsed twice, failures only on request
+    assert bulk.run(sources, str(output), workers=2, index=False) == {
+        "parsed": 0, "failed": 0, "skipped": 3, "seconds": 0.0}
+    summary = bulk.run(sources, str(output), workers=2, index=False, retry_errors=True)
+    assert summary["failed"] == 1 and summary["skipped"] == 2
+    assert len(read_records(output)) == 4
+
+    # An interrupted run leaves a cut record, the next one parses it again
+    lines = output.read_text().splitlines(keepends=True)
+    output.write_text("".join(lines[:2]) + lines[2][:20])
+    summary = bulk.run(sources, str(output), workers=2, index=False)
+    assert summary["skipped"] == 2 and summary["parsed"] + summary["failed"] == 1
+    records = read_records(output)
+    assert len(records) == 3
+    assert {record["source"] for record in records} == set(sources)
@@ -0,0 +1,52 @@
+import fitz
+import pytest
+from app.services.caption import CaptionIndex
+
+
+@pytest.fixture
+def pdf_page():
+    document = fitz.open("./Sample Files/Posner -  Scheduling Order.pdf")
+    yield document.load_page(0)
+    document.close()
+
+
+@pytest.fixture
+def caption(pdf_page):
+    return CaptionIndex(pdf_page)
+
+
+def test_search_matches_page_search(caption, pdf_page):
+    """
+    Keyword hits should land on the same lines as page.search_for.
+    """
+    for term in ["superior court", "COUNTY", "plaintiff", "defendant", "No."]:
+        expected = pdf_page.search_for(term)
+        result = caption.search(term)
+        assert len(result) == len(expected)
+        for hit, rect in zip(result, expected):
+            assert abs(hit.y1 - rect.y1) < 3
+            assert abs(hit.x0 - rect.x0) < 10
+
+
+def test_search_with_clip(caption, pdf_page):
+    top_half = fitz.Rect(0, 0, pdf_page.rect.width, pdf_page.rect.height / 2)
+    result = caption.search("defendant", clip=top_half)
+    assert all(hit.intersects(top_half) for hit in result)
+    assert len(result) <= len(caption.search("defendant"))
+
+
+def test_search_no_match(caption):
+    assert caption.search("no such phrase here") == []
+
+
+def test_text_matches_page_text(caption, pdf_page):
+    expected = pdf_page.get_text(clip=pdf_page.rect).split()
+    assert caption.text(pdf_page.rect).split() == expected
+
+
+def test_text_with_clip(caption, pdf_page):
+    court_bbox = caption.search("superior court")[-1]
+    clip = fitz.Rect(0, court_bbox.y0, pdf_page.rect.width, court_bbox.y1)
+    text = caption.text(clip)
+    assert "SUPERIOR COURT" in text.upper()
+    assert "defendant" not in text.lower()
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from app.services.case_index import CaseIndex
+from app.services.events import EventRecord
+
+
+def details(case_num, court, *events):
+    return {
+        "case": {"caseNum": case_num, "court": court, "client": "",
+                 "plaintiff": "Harvey Specter", "defendant": "Saul Goodman"},
+        "events": [EventRecord(*event) for event in events],
+        "length": len(events),
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CaseIndex(str(tmp_path / "cases.db"))
+    yield index
+    index.close()
+
+
+def test_get_case(index):
+    index.add("hash-1", "accurate", details(
+        "CV2022-1", "Superior Court", ("Mediation", "2022-12-30", "Complete mediation.", "e1")))
+    case = index.get_case("CV2022-1")
+    assert case["case"]["court"] == "Superior Court"
+    assert case["events"] == [{"id": "e1", "subject": "Mediation",
+                               "date": "2022-12-30", "description": "Complete mediation."}]
+    assert case["length"] == 1
+    assert case["documentHash"] == "hash-1"
+    assert index.get_case("CV2022-2") is None
+
+
+def test_latest_document_wins(index):
+    index.add("hash-1", "accurate", details(
+        "CV2022-1", "Superior Court", ("Trial", "2023-03-01", "Trial starts.")))
+    index.add("hash-2", "accurate", details(
+        "CV2022-1", "Superior Court", ("Trial", "2023-04-01", "Trial starts.")))
+
+    assert index.get_case("CV2022-1")["documentHash"] == "hash-2"
+    assert [document["documentHash"] for document in index.case_documents("CV2022-1")] == [
+        "hash-2", "hash-1"]
+    assert index.get_document("hash-1")["events"][0]["date"] == "2023-03-01"
+    # Only the events of the latest order are returned
+    assert [event["date"] for event in index.events_between("2023-01-01", "2023-12-31")] == [
+        "2023-04-01"]
+
+
+def test_events_between(index):
+    index.add("hash-1", "accurate", details(
+        "CV2022-1", "Superior Court",
+        ("Disclosures", "2022-07-01", "Complete disclosures."),
+        ("Mediation", "2022-12-30", "Complete mediation.")))
+    index.add("hash-2", "accurate", details(
+        "CV2022-2", "District Court", ("Motions", "2022-09-15", "File motions.")))
+
+    events = index.events_between("2022-07-01", "2022-12-01")
+    assert [(event["caseNum"], event["date"]) for event in events] == [
+        ("CV2022-1", "2022-07-01"), ("CV2022-2", "2022-09-15")]
+    events = index.events_between("2022-01-01", "2022-12-31", court="District Court")
+    assert [event["caseNum"] for event in events] == ["CV2022-2"]
+
+
+def test_reindexing_replaces_events(index):
+    index.add("hash-1", "accurate", details(
+        "CV2022-1", "Superior Court", ("Trial", "2023-03-01", "Trial starts.")))
+    index.add("hash-1", "accurate", details("CV2022-1", "Superior Court"))
+    assert index.get_case("CV2022-1")["events"] == []
+
+
+def test_concurrent_readers(index):
+    index.add("hash-1", "accurate", details(
+        "CV2022-1", "Superior Court", ("Trial", "2023-03-01", "Trial starts.")))
+    results = []
+
+    def read():
+        results.append(index.get_case("CV2022-1")["length"])
+        index.close()
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * 8
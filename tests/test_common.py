@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.controllers import common
+
+
+def steps(log):
+    try:
+        value = yield common.IO, lambda number: number + 1, (1,)
+        log.append(value)
+        yield common.CPU, int, ("not a number",)
+    except ValueError:
+        log.append("handled")
+        return "done"
+    finally:
+        log.append("closed")
+
+
+async def run_io(func, *args):
+    return func(*args)
+
+
+def test_run_steps():
+    log = []
+    assert common.run_steps(steps(log)) == "done"
+    assert log == [2, "handled", "closed"]
+
+
+def test_run_steps_async():
+    log = []
+    result = asyncio.run(common.run_steps_async(steps(log), run_io, run_io, None))
+    assert result == "done"
+    assert log == [2, "handled", "closed"]
+
+
+def test_run_steps_closes_steps_on_cancel():
+    log = []
+
+    async def run_cancelled(func, *args):
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(common.run_steps_async(steps(log), run_cancelled, run_io, None))
+    assert log == ["closed"]
@@ -1,10 +1,31 @@
+import gzip
+import hashlib
 import io
+import json
+import threading
+import time
 from unittest.mock import patch
+import fitz
 import pytest
 from app.run import app as App
+from app.controllers import common, controller
+from app.services.case_index import CaseIndex
+from app.services.events import EventRecord
 from app.services.pdf_service import PdfService
 
 
+def make_pdf(pages=1, **save_options):
+    """
+    Builds an in-memory PDF with the given number of pages.
+    """
+    document = fitz.open()
+    for _ in range(pages):
+        document.new_page().insert_text((72, 72), "Scheduling Order")
+    data = document.tobytes(**save_options)
+    document.close()
+    return data
+
+
 @pytest.fixture
 def app():
     app = App
@@ -59,9 +80,294 @@ def test_upload_file_success(mock_parse_pdf, client):
     response = client.post(
         "/upload",
         content_type="multipart/form-data",
-        data={"file": (io.BytesIO(b"sample content"), "sample.pdf")},
+        data={"file": (io.BytesIO(make_pdf()), "sample.pdf")},
     )
 
     assert response.status_code == 200
     assert b"caseNum" in response.data
     assert b"court" in response.data
+
+
+def test_upload_file_not_a_pdf(client):
+    response = client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={"file": (io.BytesIO(b"sample content"), "sample.pdf")},
+    )
+    assert response.status_code == 400
+    assert b"not a PDF" in response.data
+
+
+@patch("app.services.preflight.config.MAX_UPLOAD_BYTES", 100)
+def test_upload_file_too_large(client):
+    response = client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={"file": (io.BytesIO(make_pdf()), "sample.pdf")},
+    )
+    assert response.status_code == 413
+    assert b"File too large" in response.data
+
+
+@patch("app.services.preflight.config.MAX_PDF_PAGES", 2)
+def test_upload_file_too_many_pages(client):
+    response = client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={"file": (io.BytesIO(make_pdf(pages=3)), "sample.pdf")},
+    )
+    assert response.status_code == 413
+    assert b"too many pages" in response.data
+
+
+def test_upload_file_encrypted(client):
+    encrypted = make_pdf(encryption=fitz.PDF_ENCRYPT_AES_256,
+                         owner_pw="owner", user_pw="user")
+    response = client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={"file": (io.BytesIO(encrypted), "sample.pdf")},
+    )
+    assert response.status_code == 400
+    assert b"password protected" in response.data
+
+
+def test_upload_file_saturated(client):
+    limiter = controller.upload_file.limiter
+    if not limiter.limit:
+        pytest.skip("upload concurrency limit is disabled")
+    taken = 0
+    while limiter.acquire():
+        taken += 1
+    try:
+        response = client.post(
+            "/upload",
+            content_type="multipart/form-data",
+            data={"file": (io.BytesIO(make_pdf()), "sample.pdf")},
+        )
+        assert response.status_code == 429
+        assert response.headers["Retry-After"]
+    finally:
+        for _ in range(taken):
+            limiter.release()
+
+
+def test_upload_file_unknown_profile(client):
+    response = client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={
+            "file": (io.BytesIO(make_pdf()), "sample.pdf"),
+            "data": '{"is_authorized": false, "profile": "turbo"}',
+        },
+    )
+    assert response.status_code == 400
+    assert b"Unknown parser profile" in response.data
+
+
+@patch.object(PdfService, "__init__", return_value=None)
+@patch.object(PdfService, "parse_pdf", return_value={"case": {}, "events": [], "length": 0})
+def test_upload_file_with_profile(mock_parse_pdf, mock_init, client):
+    response = client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={
+            "file": (io.BytesIO(make_pdf()), "sample.pdf"),
+            "data": '{"is_authorized": false, "profile": "fast"}',
+        },
+    )
+    assert response.status_code == 200
+    assert mock_init.call_args.kwargs["profile"] == "fast"
+
+
+PDF_BYTES = make_pdf()
+UPLOAD_RESULT = {
+    "case": {"caseNum": "12345", "court": "Court"},
+    "events": [
+        EventRecord("Event", "2023-07-19", "Description " * 200, "uuid"),
+    ],
+    "length": 1,
+}
+
+
+def write_pdf(bucket, key, path):
+    with open(path, "wb") as file:
+        file.write(PDF_BYTES)
+
+
+def upload(client, headers=None):
+    return client.post(
+        "/upload",
+        content_type="multipart/form-data",
+        data={"file": (io.BytesIO(PDF_BYTES), "sample.pdf")},
+        headers=headers or {},
+    )
+
+
+@patch.object(PdfService, "parse_pdf", return_value=UPLOAD_RESULT)
+def test_upload_file_etag(mock_parse_pdf, client):
+    first = upload(client)
+    second = upload(client)
+    assert first.headers["ETag"].startswith('W/"')
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.json["events"][0]["id"] == "uuid"
+
+
+
+@patch.object(PdfService, "parse_pdf", return_value={
+    **UPLOAD_RESULT, "meta": {"events": {"source": "rules", "gptPending": True}}})
+def test_upload_file_provisional_has_no_etag(mock_parse_pdf, client):
+    response = upload(client)
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+@patch.object(PdfService, "parse_pdf", return_value=UPLOAD_RESULT)
+def test_upload_file_gzip(mock_parse_pdf, client):
+    response = upload(client, {"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.data))["length"] == 1
+
+
+@patch.object(PdfService, "parse_pdf", return_value=UPLOAD_RESULT)
+def test_upload_file_msgpack(mock_parse_pdf, client):
+    msgpack = pytest.importorskip("msgpack")
+    response = upload(client, {"Accept": "application/msgpack"})
+    assert response.mimetype == "application/msgpack"
+    assert msgpack.unpackb(response.data)["events"][0]["subject"] == "Event"
+
+
+@patch("app.controllers.common.boto3")
+@patch.object(PdfService, "parse_pdf", return_value=UPLOAD_RESULT)
+def test_order_details_not_modified(mock_parse_pdf, mock_boto3, client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_files").mkdir()
+    s3_client = mock_boto3.client.return_value
+    s3_client.head_object.return_value = {"ContentLength": len(PDF_BYTES)}
+    s3_client.download_file.side_effect = write_pdf
+    headers = {"Is-Authorized": "false"}
+
+    first = client.get("/order-details?filename=order.pdf", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get("/order-details?filename=order.pdf",
+                        headers={**headers, "If-None-Match": etag})
+    assert second.status_code == 304
+    assert mock_parse_pdf.call_count == 1
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = CaseIndex(str(tmp_path / "cases.db"))
+    monkeypatch.setattr(common, "case_index", index)
+    yield index
+    index.close()
+
+
+def test_get_case(client, index):
+    index.add("abc123", "accurate", UPLOAD_RESULT)
+    response = client.get("/cases/12345")
+    assert response.status_code == 200
+    assert response.json["case"] == UPLOAD_RESULT["case"]
+    assert response.json["events"][0]["id"] == "uuid"
+
+    assert client.get("/cases/99999").status_code == 404
+
+
+def test_get_case_documents(client, index):
+    index.add("abc123", "accurate", UPLOAD_RESULT)
+    response = client.get("/cases/12345/documents")
+    assert response.status_code == 200
+    assert response.json["documents"][0]["documentHash"] == "abc123"
+    assert response.json["documents"][0]["length"] == 1
+
+
+def test_get_document(client, index):
+    index.add("abc123", "accurate", UPLOAD_RESULT)
+    assert client.get("/documents/ABC123").json["case"]["caseNum"] == "12345"
+    assert client.get("/documents/unknown").status_code == 404
+
+
+def test_get_events_between(client, index):
+    index.add("abc123", "accurate", UPLOAD_RESULT)
+    response = client.get("/events?from=2023-07-01&to=2023-07-31")
+    assert response.status_code == 200
+    assert response.json["length"] == 1
+    assert response.json["events"][0]["caseNum"] == "12345"
+
+    assert client.get("/events?from=2023-08-01&to=2023-08-31").json["length"] == 0
+    assert client.get("/events?from=July&to=2023-08-31").status_code == 400
+    assert client.get("/events?from=2023-08-01").status_code == 400
+
+
+@patch("app.services.pdf_service.case_index")
+@patch("app.services.pdf_service.PdfParser", autospec=True)
+def test_upload_file_is_indexed(mock_parser, mock_index, client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_files").mkdir()
+    mock_parser.return_value.get_case_details.return_value = {"caseNum": ""}
+    mock_parser.return_value.get_events.return_value = {}
+    response = upload(client)
+    assert response.status_code == 200
+    doc_hash, profile, details = mock_index.add.call_args.args
+    assert doc_hash == hashlib.sha256(PDF_BYTES).hexdigest()
+    assert profile == "accurate"
+    assert details["length"] == 0
+
+
+@patch("app.controllers.common.boto3")
+def test_order_details_concurrent_requests_parse_once(mock_boto3, app, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "temp_files").mkdir()
+    s3_client = mock_boto3.client.return_value
+    s3_client.head_object.return_value = {"ContentLength": len(PDF_BYTES), "ETag": '"v1"'}
+    s3_client.download_file.side_effect = write_pdf
+
+    def parse_pdf(self, is_authorized):
+        time.sleep(0.3)
+        return UPLOAD_RESULT
+
+    responses = []
+
+    def request():
+        with app.test_client() as client:
+            responses.append(client.get("/order-details?filename=order.pdf",
+                                        headers={"Is-Authorized": "false"}))
+
+    with patch.object(PdfService, "parse_pdf", autospec=True,
+                      side_effect=parse_pdf) as mock_parse_pdf:
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.headers["ETag"] for response in responses}) == 1
+    assert mock_parse_pdf.call_count == 1
+    s3_client.download_file.assert_called_once()
+    assert not list((tmp_path / "temp_files").iterdir())
+
+
+@patch("app.controllers.common.flights")
+@patch("app.controllers.common.boto3")
+def test_order_details_waiter_of_not_modified_calls(mock_boto3, mock_flights, client):
+    """
+    A request which joined calls that only answered a 304 waits for a parse.
+    """
+    s3_client = mock_boto3.client.return_value
+    s3_client.head_object.return_value = {"ContentLength": len(PDF_BYTES), "ETag": '"v1"'}
+    doc_hash = hashlib.sha256(PDF_BYTES).hexdigest()
+    mock_flights.do.side_effect = [
+        ((doc_hash, None, None), True),
+        ((doc_hash, None, None), True),
+        ((doc_hash, UPLOAD_RESULT, doc_hash), False),
+    ]
+
+    response = client.get("/order-details?filename=order.pdf",
+                          headers={"Is-Authorized": "false"})
+
+    assert response.status_code == 200
+    assert response.json["events"][0]["id"] == "uuid"
+    assert mock_flights.do.call_count == 3
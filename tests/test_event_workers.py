@@ -0,0 +1,24 @@
+from app.services.event_workers import split_sections
+
+
+def test_split_sections_keeps_sections_whole():
+    paragraphs = [
+        ("Preamble text.", None),
+        ("1. Disclosures: due soon.", "Disclosures"),
+        ("More disclosure text.", None),
+        ("2. Mediation. Mediate by then.", "Mediation"),
+        ("3. Trial. Trial starts later.", "Trial"),
+    ]
+    chunks = split_sections(paragraphs, workers=2)
+    assert [para for chunk in chunks for para in chunk] == paragraphs
+    for chunk in chunks[1:]:
+        assert chunk[0][1] is not None
+
+
+def test_split_sections_single_section():
+    paragraphs = [("No headings here.", None), ("Still none.", None)]
+    assert split_sections(paragraphs, workers=4) == [paragraphs]
+
+
+def test_split_sections_empty():
+    assert split_sections([], workers=2) == []
@@ -0,0 +1,72 @@
+import fitz
+import pytest
+from app.services.caption import CaptionIndex
+from app.services.layout_templates import LayoutTemplateStore, layout_fingerprint
+from scripts.synthetic_orders import make_order
+
+SAMPLES = [
+    "./Sample Files/Posner -  Scheduling Order.pdf",
+    "./Sample Files/Sainz - Scheduling Order (Court Filed).pdf",
+]
+
+
+def caption_of(filepath):
+    document = fitz.open(filepath)
+    caption = CaptionIndex(document.load_page(0))
+    document.close()
+    return caption
+
+
+@pytest.fixture
+def rects():
+    return {
+        "court": fitz.Rect(50, 280, 612, 320),
+        "case": fitz.Rect(306, 340, 612, 420),
+        "plaintiff": fitz.Rect(50, 340, 300, 380),
+        "defendant": fitz.Rect(50, 400, 300, 440),
+    }
+
+
+def test_fingerprint_is_stable():
+    assert layout_fingerprint(caption_of(SAMPLES[0])) == layout_fingerprint(
+        caption_of(SAMPLES[0]))
+
+
+def test_fingerprint_differs_between_layouts():
+    assert layout_fingerprint(caption_of(SAMPLES[0])) != layout_fingerprint(
+        caption_of(SAMPLES[1]))
+
+
+def test_store_get_put(rects):
+    store = LayoutTemplateStore()
+    assert store.get("abc") is None
+    store.put("abc", rects)
+    assert store.get("abc") == rects
+
+
+def test_store_evicts_oldest(rects):
+    store = LayoutTemplateStore(maxsize=1)
+    store.put("first", rects)
+    store.put("second", rects)
+    assert store.get("first") is None
+    assert store.get("second") == rects
+
+
+def test_store_persists(tmp_path, rects):
+    path = str(tmp_path / "templates.json")
+    LayoutTemplateStore(path=path).put("abc", rects)
+    assert LayoutTemplateStore(path=path).get("abc") == rects
+
+
+def test_fingerprint_is_shared_by_cases_of_a_court():
+    # Two cases with different parties and case numbers from the same court
+    captions = []
+    for seed in (0, 4):
+        data, expected = make_order(seed, sections=2)
+        document = fitz.open("pdf", data)
+        captions.append((CaptionIndex(document.load_page(0)), expected))
+        document.close()
+    (first, first_case), (second, second_case) = captions
+    assert first_case["caseNum"] != second_case["caseNum"]
+    assert first_case["plaintiff"] != second_case["plaintiff"]
+    assert layout_fingerprint(first) == layout_fingerprint(second)
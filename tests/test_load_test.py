@@ -0,0 +1,48 @@
+import boto3
+import pytest
+from scripts.load_test import FakeS3, build_workload, percentile, summarize
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+
+
+def test_workload_is_reproducible():
+    files = ["a.pdf", "b.pdf"]
+    assert build_workload(files, 20, 0.5, 0.2, seed=3) == build_workload(
+        files, 20, 0.5, 0.2, seed=3)
+    assert {endpoint for endpoint, _, _ in build_workload(files, 50, 1.0, 0.0, 1)} == {"upload"}
+
+
+def test_summarize():
+    results = [("upload", 200, 1.0), ("upload", 429, 0.1), ("order-details", 200, 2.0)]
+    rows = {row["endpoint"]: row for row in summarize(results, elapsed=2.0)}
+    assert rows["all"]["requests"] == 3
+    assert rows["all"]["throughput"] == 1.5
+    assert rows["upload"]["error_rate"] == 0.5
+    assert rows["upload"]["statuses"] == {200: 1, 429: 1}
+
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    fake = FakeS3({"order.pdf": b"%PDF-1.7 order"})
+    fake.start()
+    monkeypatch.setenv("AWS_ENDPOINT_URL", fake.url)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    yield fake
+    fake.stop()
+
+
+def test_fake_s3_with_boto3(s3, tmp_path):
+    client = boto3.client("s3")
+    assert client.head_object(Bucket="bucket", Key="7__order.pdf")["ContentLength"] == 14
+    client.download_file("bucket", "7__order.pdf", str(tmp_path / "order.pdf"))
+    assert (tmp_path / "order.pdf").read_bytes() == b"%PDF-1.7 order"
+    client.upload_file(str(tmp_path / "order.pdf"), "bucket", "7__order.pdf")
+    assert s3.uploads == 1
@@ -0,0 +1,80 @@
+import fitz
+import numpy as np
+import pytest
+from app.services.margins import crop_box_cache, find_crop_boxes, find_gutters
+
+
+def make_document(line_numbers=(True, True), footer=True):
+    """
+    Builds a pleading-style document, optionally with gutter line numbers and page numbers.
+    """
+    document = fitz.open()
+    for number, numbered in enumerate(line_numbers, 1):
+        page = document.new_page(width=612, height=792)
+        # Written column by column, so the numbers form their own blocks
+        if numbered:
+            for line in range(1, 25):
+                # Right-aligned at x=72 like pleading paper
+                x = 72 - fitz.get_text_length(str(line), fontsize=11)
+                page.insert_text((x, 60 + line * 26), str(line), fontsize=11)
+        for line in range(1, 25):
+            page.insert_text((108, 60 + line * 26),
+                             f"Body line {line} of page {number} with several words.",
+                             fontsize=11)
+        if footer:
+            page.insert_text((300, 760), str(number), fontsize=11)
+    return document
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    crop_box_cache.clear()
+
+
+def test_gutter_and_footer():
+    document = make_document()
+    for rect in find_crop_boxes(document):
+        assert 70 < rect.x0 < 108
+        assert rect.y0 == 30
+        assert 690 < rect.y1 < 760
+    page_text = document[0].get_text(clip=find_crop_boxes(document)[0])
+    assert "Body line 1 " in page_text
+    assert "\n1\n" not in page_text
+
+
+def test_page_without_gutter_uses_other_pages():
+    boxes = find_crop_boxes(make_document(line_numbers=(False, True)))
+    assert boxes[0].x0 == boxes[1].x0
+
+
+def test_document_without_gutter():
+    boxes = find_crop_boxes(make_document(line_numbers=(False,), footer=False))
+    assert boxes[0] == fitz.Rect(0, 30, 612, 762)
+
+
+def test_find_gutters_picks_rightmost_block():
+    boxes = np.array([[45, 70, 61, 87], [72, 35, 78, 47], [50, 70, 66, 87]], dtype=float)
+    pages = np.array([0, 0, 1])
+    assert list(find_gutters(boxes, pages, 3)) == [78, 66, 72]
+
+
+def test_crop_boxes_are_cached(monkeypatch):
+    document = make_document()
+    boxes = find_crop_boxes(document)
+    monkeypatch.setattr("app.services.margins.load_blocks", None)
+    assert find_crop_boxes(document) == boxes
+
+
+def test_cache_key_covers_form_xobjects():
+    # Pages which only draw another page as a form XObject share their content stream
+    documents = []
+    for footer in (True, False):
+        source = make_document(footer=footer)
+        document = fitz.open()
+        for number in range(source.page_count):
+            page = document.new_page(width=612, height=792)
+            page.show_pdf_page(page.rect, source, number)
+        documents.append(document)
+    with_footer, without_footer = (find_crop_boxes(document) for document in documents)
+    assert with_footer[0].y1 < 760
+    assert without_footer[0].y1 == 792 - 30
@@ -0,0 +1,80 @@
+import tracemalloc
+
+from app.services.memory import MemoryMeter, current_rss, peak_rss
+
+
+def test_current_rss():
+    assert current_rss() > 0
+    assert peak_rss() > 0
+
+
+def test_stage_records_figures():
+    meter = MemoryMeter(budget_mb=0, trace=True)
+    try:
+        with meter.stage("allocate"):
+            data = bytearray(8 * 1024 * 1024)
+        del data
+    finally:
+        # Tracing slows down the rest of the tests
+        tracemalloc.stop()
+
+    figures = meter.stages["allocate"]
+    assert figures["tracedPeak"] >= 8
+    assert figures["rssDelta"] == round(figures["rssAfter"] - figures["rssBefore"], 1)
+    report = meter.report()
+    assert report["budget"] is None
+    assert report["lowMemory"] is False
+    assert report["rssPeak"] >= figures["rssAfter"]
+
+
+def test_stage_without_reset_peak(monkeypatch):
+    # Python 3.8 has no tracemalloc.reset_peak
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    meter = MemoryMeter(budget_mb=0, trace=True)
+    try:
+        kept = bytearray(1024)
+        with meter.stage("allocate"):
+            data = bytearray(8 * 1024 * 1024)
+        del data
+        # The traces of allocations made before the stage are kept
+        assert tracemalloc.get_object_traceback(kept) is not None
+        with meter.stage("below the peak"):
+            data = bytearray(1024 * 1024)
+    finally:
+        tracemalloc.stop()
+    assert meter.stages["allocate"]["tracedPeak"] >= 8
+    assert 1 <= meter.stages["below the peak"]["tracedPeak"] < 8
+
+
+def test_overlapping_stages_trace_one_peak():
+    first = MemoryMeter(budget_mb=0, trace=True)
+    second = MemoryMeter(budget_mb=0, trace=True)
+    try:
+        with first.stage("outer"):
+            with second.stage("inner"):
+                data = bytearray(1024 * 1024)
+            del data
+        with second.stage("after"):
+            pass
+    finally:
+        tracemalloc.stop()
+    assert "tracedPeak" in first.stages["outer"]
+    assert "tracedPeak" not in second.stages["inner"]
+    assert "tracedPeak" in second.stages["after"]
+
+
+def test_stage_recorded_on_error():
+    meter = MemoryMeter(budget_mb=0, trace=False)
+    try:
+        with meter.stage("fails"):
+            raise ValueError("parse failed")
+    except ValueError:
+        pass
+    assert "tracedPeak" not in meter.stages["fails"]
+
+
+def test_over_budget():
+    assert not MemoryMeter(budget_mb=0).over_budget(10 ** 12)
+    meter = MemoryMeter(budget_mb=64 * 1024)
+    assert not meter.over_budget()
+    assert meter.over_budget(64 * 1024 ** 3)
@@ -0,0 +1,75 @@
+import os
+
+import fitz
+import pytest
+from app.services.page_text_cache import PageTextCache, page_text_key
+
+SAMPLE = "./Sample Files/Posner -  Scheduling Order.pdf"
+
+
+@pytest.fixture
+def document():
+    document = fitz.open(SAMPLE)
+    yield document
+    document.close()
+
+
+def test_key_is_stable_across_opens(document):
+    clip = fitz.Rect(70, 30, 612, 762)
+    other = fitz.open(SAMPLE)
+    assert page_text_key(document[1], clip) == page_text_key(other[1], clip)
+    other.close()
+
+
+def test_key_depends_on_page_and_clip(document):
+    clip = fitz.Rect(70, 30, 612, 762)
+    assert page_text_key(document[0], clip) != page_text_key(document[1], clip)
+    assert page_text_key(document[0], clip) != page_text_key(
+        document[0], fitz.Rect(80, 30, 612, 762))
+
+
+def test_memory_cache():
+    cache = PageTextCache(maxsize=1)
+    assert cache.get("a") is None
+    cache.put("a", "page a")
+    assert cache.get("a") == "page a"
+    cache.put("b", "page b")
+    assert cache.get("a") is None
+
+
+def test_disk_cache(tmp_path):
+    PageTextCache(directory=str(tmp_path)).put("a", "page a")
+    # A new process starts with an empty memory cache
+    assert PageTextCache(directory=str(tmp_path)).get("a") == "page a"
+
+
+def test_disk_cache_is_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.page_text_cache.PRUNE_EVERY", 1)
+    cache = PageTextCache(maxsize=0, directory=str(tmp_path), disk_size=2)
+    for key in "abc":
+        cache.put(key, f"page {key}")
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def show_pdf_document(text):
+    """
+    Builds a document whose page only draws another document's page as a form XObject.
+    """
+    source = fitz.open()
+    source.new_page().insert_text((72, 72), text)
+    document = fitz.open()
+    page = document.new_page()
+    page.show_pdf_page(page.rect, source, 0)
+    source.close()
+    return document
+
+
+def test_key_covers_form_xobjects():
+    first = show_pdf_document("Trial set for July 1, 2022")
+    second = show_pdf_document("Discovery closes March 3, 2023")
+    # Both pages have the content stream "q /fzFrm0 Do Q"
+    assert first[0].read_contents() == second[0].read_contents()
+    clip = first[0].rect
+    assert page_text_key(first[0], clip) != page_text_key(second[0], clip)
+    same = show_pdf_document("Trial set for July 1, 2022")
+    assert page_text_key(first[0], clip) == page_text_key(same[0], clip)
@@ -1,8 +1,13 @@
+import asyncio
+import hashlib
 import os
+import sqlite3
+import threading
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 import pytest
-from app.services.pdf_service import PdfService
+from app.services.pdf_service import PdfService, gpt_result_cache
+from app.services.revisions import revision_store
 
 # Fixture for mocking the PDF file
 @pytest.fixture
@@ -45,6 +50,10 @@ def test_parse_pdf(os_remove_mock, tempfile_mock, pdf_parser_mock, pdf_file_mock
 
     # Act
     result = pdf_service.parse_pdf(is_authorized=False)
+    # Events are EventRecord objects until the response is encoded
+    result["events"] = [event.to_dict() for event in result["events"]]
+    # The memory figures describe the server, they are only added with MEMORY_REPORT
+    assert "meta" not in result
 
     # Assert
     assert result == {
@@ -67,7 +76,7 @@ def test_parse_pdf(os_remove_mock, tempfile_mock, pdf_parser_mock, pdf_file_mock
     }
 
     # Ensure that PdfParser methods were called
-    pdf_parser_mock.assert_called_once_with("tempfile_name")
+    pdf_parser_mock.assert_called_once_with("tempfile_name", profile=None)
     pdf_parser_instance.get_case_details.assert_called_once()
     pdf_parser_instance.get_events.assert_called_once()
     pdf_parser_instance.close_pdf.assert_called_once()
@@ -79,6 +88,7 @@ def test_parse_pdf(os_remove_mock, tempfile_mock, pdf_parser_mock, pdf_file_mock
     # Ensure that the temporary file was not removed
     # os_remove_mock.assert_called_once()
 
+@patch("app.services.pdf_service.config.MEMORY_REPORT", True)
 @patch("app.services.pdf_service.PdfParser", autospec=True)
 @patch("tempfile.NamedTemporaryFile", autospec=True)
 @patch("os.remove", autospec=True)
@@ -110,6 +120,9 @@ def test_parse_pdf_gpt(os_remove_mock, tempfile_mock, pdf_parser_mock, pdf_file_
 
     # Act
     result = pdf_service.parse_pdf(is_authorized=True)
+    # Events are EventRecord objects until the response is encoded
+    result["events"] = [event.to_dict() for event in result["events"]]
+    assert set(result.pop("meta")["memory"]["stages"]) == {"read", "case", "gpt"}
 
     # Assert
     assert result == {
@@ -124,7 +137,7 @@ def test_parse_pdf_gpt(os_remove_mock, tempfile_mock, pdf_parser_mock, pdf_file_
     }
 
     # Ensure that PdfParser methods were called
-    pdf_parser_mock.assert_called_once_with("tempfile_name")
+    pdf_parser_mock.assert_called_once_with("tempfile_name", profile=None)
     pdf_parser_instance.get_case_details.assert_called_once()
     pdf_parser_instance.get_gpt_events.assert_called_once()
     pdf_parser_instance.close_pdf.assert_called_once()
@@ -136,4 +149,306 @@ def test_parse_pdf_gpt(os_remove_mock, tempfile_mock, pdf_parser_mock, pdf_file_
     # Ensure that the temporary file was not removed
     # os_remove_mock.assert_called_once()
 
+@patch("app.services.pdf_service.PdfParser", autospec=True)
+def test_parse_pdf_amended_order(pdf_parser_mock):
+    """
+    An amendment of a parsed document only reanalyses changed sentences and reports the changes.
+    """
+    revision_store.clear()
+    pdf_parser_instance = pdf_parser_mock.return_value
+    pdf_parser_instance.get_case_details.return_value = {"caseNum": "CV2022-0042"}
+    pdf_parser_instance.page_fingerprints.return_value = ["p1", "p2"]
+    pdf_parser_instance.get_events.return_value = {
+        "Disclosures": {"Complete disclosures.": datetime(2022, 7, 1)},
+        "Mediation": {"Complete mediation.": datetime(2022, 12, 30)},
+    }
+
+    first = PdfService(filepath="original.pdf", doc_hash="v1").parse_pdf(is_authorized=False)
+    assert "changes" not in first
+
+    pdf_parser_instance.page_fingerprints.return_value = ["p1", "p2-amended"]
+    pdf_parser_instance.get_events.return_value = {
+        "Disclosures": {"Complete disclosures.": datetime(2022, 7, 1)},
+        "Mediation": {"Complete mediation.": datetime(2023, 1, 31)},
+    }
+    amended = PdfService(filepath="amended.pdf", doc_hash="v2",
+                         amends="v1").parse_pdf(is_authorized=False)
+
+    previous_lines = pdf_parser_instance.get_events.call_args_list[0].kwargs["record"]
+    assert pdf_parser_instance.get_events.call_args.kwargs["reuse"] is previous_lines
+    assert amended["changes"]["pages"] == [2]
+    assert amended["changes"]["added"] == []
+    assert amended["changes"]["removed"] == []
+    assert amended["changes"]["changed"] == [{
+        "id": first["events"][1].id,
+        "subject": "Mediation",
+        "description": "Complete mediation.",
+        "date": "2023-01-31",
+        "previousDate": "2022-12-30",
+    }]
+
+    # An identical version is answered from the stored revision
+    unchanged = PdfService(filepath="amended.pdf", doc_hash="v2",
+                           amends="v2").parse_pdf(is_authorized=False)
+    assert pdf_parser_instance.get_events.call_count == 2
+    assert unchanged["changes"] == {"added": [], "removed": [], "changed": [], "pages": []}
+    assert [event.id for event in unchanged["events"]] == [
+        event.id for event in amended["events"]]
+    revision_store.clear()
+
+
+@patch("app.services.pdf_service.PdfParser", autospec=True)
+def test_parse_pdf_only_diffs_named_amendments(pdf_parser_mock):
+    """
+    Orders are only compared with the document the client says they amend,
+    and only when it is of the same case.
+    """
+    revision_store.clear()
+    pdf_parser_instance = pdf_parser_mock.return_value
+    pdf_parser_instance.get_case_details.return_value = {"caseNum": "CV2022-0042"}
+    pdf_parser_instance.page_fingerprints.return_value = ["p1"]
+    pdf_parser_instance.get_events.return_value = {
+        "Mediation": {"Complete mediation.": datetime(2022, 12, 30)}}
+    PdfService(filepath="original.pdf", doc_hash="v1").parse_pdf(is_authorized=False)
+
+    # Another filing of the same case which doesn't say it's an amendment
+    other = PdfService(filepath="other.pdf", doc_hash="v2").parse_pdf(is_authorized=False)
+    assert "changes" not in other
+    assert pdf_parser_instance.get_events.call_args.kwargs["reuse"] is None
+
+    # An order of another case naming the document
+    pdf_parser_instance.get_case_details.return_value = {"caseNum": "CV2023-0001"}
+    unrelated = PdfService(filepath="unrelated.pdf", doc_hash="v3",
+                           amends="v1").parse_pdf(is_authorized=False)
+    assert "changes" not in unrelated
+    revision_store.clear()
+
+
+@patch("app.services.pdf_service.config.MEMORY_BUDGET_MB", 1)
+@patch("app.services.pdf_service.config.MEMORY_REPORT", True)
+def test_parse_pdf_over_memory_budget(tmp_path):
+    """
+    A document expected to exceed the memory budget is parsed in low-memory mode.
+    """
+    revision_store.clear()
+    filepath = tmp_path / "order.pdf"
+    filepath.write_bytes(open("./Sample Files/Posner -  Scheduling Order.pdf", "rb").read())
+
+    result = PdfService(filepath=str(filepath)).parse_pdf(is_authorized=False)
+
+    memory = result["meta"]["memory"]
+    assert memory["lowMemory"] is True
+    assert memory["budget"] == 1.0
+    assert memory["rssPeak"] >= memory["stages"]["events"]["rssAfter"]
+    assert result["length"] > 0
+    prescreen = result["meta"]["prescreen"]
+    assert prescreen["skippedFraction"] == round(prescreen["skipped"] / prescreen["sentences"], 3)
+    revision_store.clear()
+
+
+GPT_EVENTS = [{"subject": "Mediation", "date": "2022-12-30",
+               "description": "Complete mediation."}]
+
+
+@pytest.fixture
+def hedged_parser():
+    """
+    A mocked PdfParser for the hedged GPT mode tests.
+    """
+    revision_store.clear()
+    gpt_result_cache.clear()
+    with patch("app.services.pdf_service.PdfParser", autospec=True) as pdf_parser_mock, \
+            patch("app.services.pdf_service.config.GPT_MODE", "hedged"), \
+            patch("app.services.pdf_service.case_index") as index_mock:
+        parser = pdf_parser_mock.return_value
+        parser.get_case_details.return_value = {"caseNum": "CV2022-0042"}
+        parser.page_fingerprints.return_value = ["p1"]
+        parser.get_gpt_content.return_value = "The parties shall complete mediation by 12/30/2022."
+        parser.get_events.return_value = {
+            "Mediation": {"Complete mediation.": datetime(2022, 12, 30)}}
+        parser.index = index_mock
+        yield parser
+    revision_store.clear()
+    gpt_result_cache.clear()
+
+
+@patch("app.services.pdf_service.gpt_parser.get_completion", return_value=GPT_EVENTS)
+def test_parse_pdf_hedged_gpt_in_time(get_completion, hedged_parser):
+    """
+    ChatGPT events arriving before the deadline are returned.
+    """
+    result = PdfService(filepath="order.pdf", doc_hash="abc").parse_pdf(is_authorized=True)
+
+    assert result["meta"]["events"] == {"source": "gpt"}
+    assert [event.description for event in result["events"]] == ["Complete mediation."]
+    hedged_parser.get_events.assert_called_once()
+    assert hedged_parser.index.add.call_args.args[1] == "gpt"
+
+    # The next request for the same document doesn't ask ChatGPT again
+    again = PdfService(filepath="order.pdf", doc_hash="abc").parse_pdf(is_authorized=True)
+    assert again["meta"]["events"] == {"source": "gpt", "cached": True}
+    get_completion.assert_called_once()
+
+
+@patch("app.services.pdf_service.config.GPT_DEADLINE_SECONDS", 0.05)
+def test_parse_pdf_hedged_deadline(hedged_parser):
+    """
+    Past the deadline the rule-based events are returned and the late
+    ChatGPT events upgrade the next request.
+    """
+    release, stored = threading.Event(), threading.Event()
+
+    def slow_completion(content):
+        release.wait(5)
+        return GPT_EVENTS
+
+    with patch("app.services.pdf_service.gpt_parser.get_completion", slow_completion):
+        result = PdfService(filepath="order.pdf", doc_hash="abc").parse_pdf(is_authorized=True)
+        assert result["meta"]["events"] == {"source": "rules", "gptPending": True}
+        assert result["events"][0].subject == "Mediation"
+        # The rule-based events are indexed under the parser profile
+        assert hedged_parser.index.add.call_args.args[1] == "accurate"
+
+        hedged_parser.index.add.side_effect = lambda *args: stored.set()
+        release.set()
+        assert stored.wait(5)
+    assert hedged_parser.index.add.call_args.args[1] == "gpt"
+
+    upgraded = PdfService(filepath="order.pdf", doc_hash="abc").parse_pdf(is_authorized=True)
+    assert upgraded["meta"]["events"] == {"source": "gpt", "cached": True}
+
+
+@patch("app.services.pdf_service.gpt_parser.get_completion",
+       side_effect=Exception("Invalid API key"))
+def test_parse_pdf_hedged_gpt_error(get_completion, hedged_parser):
+    """
+    A failed ChatGPT request falls back to the rule-based events.
+    """
+    result = PdfService(filepath="order.pdf", doc_hash="abc").parse_pdf(is_authorized=True)
+    assert result["meta"]["events"] == {"source": "rules", "gptError": "Invalid API key"}
+    assert result["length"] == 1
+
+
+@patch("app.services.pdf_service.config.GPT_DEADLINE_SECONDS", 0.05)
+def test_parse_pdf_async_hedged_deadline(hedged_parser):
+    """
+    The async parse doesn't wait for ChatGPT past the deadline either.
+    """
+    async def slow_completion(content):
+        await asyncio.sleep(0.3)
+        return GPT_EVENTS
+
+    async def parse():
+        service = PdfService(filepath="order.pdf", doc_hash="abc")
+        result = await service.parse_pdf_async(True)
+        # Gives the late ChatGPT request time to finish
+        await asyncio.sleep(0.5)
+        return result
+
+    with patch("app.services.pdf_service.gpt_parser.get_completion_async", slow_completion):
+        result = asyncio.run(parse())
+    assert result["meta"]["events"] == {"source": "rules", "gptPending": True}
+    assert [event["description"] for event in gpt_result_cache.get("abc")] == [
+        "Complete mediation."]
+
+
+@patch("app.services.pdf_service.gpt_parser.get_completion", return_value=GPT_EVENTS)
+def test_parse_pdf_hedged_masked_file(get_completion, hedged_parser, tmp_path):
+    """
+    The ChatGPT events are found again when the masked file is requested.
+    """
+    filepath = tmp_path / "order.pdf"
+    filepath.write_bytes(b"original")
+    hedged_parser.close_pdf.side_effect = lambda: filepath.write_bytes(b"masked")
+    masked_hash = hashlib.sha256(b"masked").hexdigest()
+
+    PdfService(filepath=str(filepath), doc_hash="original-hash",
+               hash_saved_file=True).parse_pdf(is_authorized=True)
+    again = PdfService(filepath=str(filepath), doc_hash=masked_hash,
+                       hash_saved_file=True).parse_pdf(is_authorized=True)
+
+    assert again["meta"]["events"] == {"source": "gpt", "cached": True}
+    get_completion.assert_called_once()
+
+
+@patch("app.services.pdf_service.config.GPT_DEADLINE_SECONDS", 0.05)
+def test_parse_pdf_hedged_late_before_masked_hash(hedged_parser, tmp_path):
+    """
+    ChatGPT events arriving before the masked file is hashed are recorded
+    under the masked file's hash.
+    """
+    filepath = tmp_path / "order.pdf"
+    filepath.write_bytes(b"original")
+    masked_hash = hashlib.sha256(b"masked").hexdigest()
+    release = threading.Event()
+
+    def slow_completion(content):
+        release.wait(5)
+        return GPT_EVENTS
+
+    def close_pdf():
+        # The late response is stored while the file is still being closed
+        release.set()
+        for _ in range(500):
+            if gpt_result_cache.get("original-hash") is not None:
+                break
+            threading.Event().wait(0.01)
+        filepath.write_bytes(b"masked")
+
+    hedged_parser.close_pdf.side_effect = close_pdf
+    with patch("app.services.pdf_service.gpt_parser.get_completion", slow_completion):
+        result = PdfService(filepath=str(filepath), doc_hash="original-hash",
+                            hash_saved_file=True).parse_pdf(is_authorized=True)
+
+    assert result["meta"]["events"] == {"source": "rules", "gptPending": True}
+    assert gpt_result_cache.get(masked_hash) == GPT_EVENTS
+    indexed = [call.args[:2] for call in hedged_parser.index.add.call_args_list]
+    assert indexed == [(masked_hash, "accurate"), (masked_hash, "gpt")]
+
+
+@patch("app.services.pdf_service.case_index")
+@patch("app.services.pdf_service.PdfParser", autospec=True)
+def test_parse_pdf_index_is_best_effort(pdf_parser_mock, index_mock):
+    """
+    A failing case index doesn't fail the parse.
+    """
+    revision_store.clear()
+    pdf_parser_instance = pdf_parser_mock.return_value
+    pdf_parser_instance.get_case_details.return_value = {"caseNum": "CV2022-0042"}
+    pdf_parser_instance.get_events.return_value = {
+        "Mediation": {"Complete mediation.": datetime(2022, 12, 30)}}
+    index_mock.add.side_effect = sqlite3.OperationalError("database is locked")
+
+    result = PdfService(filepath="order.pdf", doc_hash="abc").parse_pdf(is_authorized=False)
+
+    index_mock.add.assert_called_once()
+    assert result["length"] == 1
+    assert result["documentHash"] == "abc"
+    revision_store.clear()
+
+
+@patch("app.services.pdf_service.case_index")
+@patch("app.services.pdf_service.PdfParser", autospec=True)
+def test_parse_pdf_hash_saved_file(pdf_parser_mock, index_mock, tmp_path):
+    """
+    With hash_saved_file the result is recorded under the hash of the masked file.
+    """
+    revision_store.clear()
+    filepath = tmp_path / "order.pdf"
+    filepath.write_bytes(b"original")
+    pdf_parser_instance = pdf_parser_mock.return_value
+    pdf_parser_instance.get_case_details.return_value = {"caseNum": "CV2022-0042"}
+    pdf_parser_instance.get_events.return_value = {}
+    pdf_parser_instance.close_pdf.side_effect = lambda: filepath.write_bytes(b"masked")
+
+    service = PdfService(filepath=str(filepath), doc_hash="original-hash",
+                         hash_saved_file=True)
+    result = service.parse_pdf(is_authorized=False)
+
+    masked_hash = hashlib.sha256(b"masked").hexdigest()
+    assert service.index_hash == result["documentHash"] == masked_hash
+    assert index_mock.add.call_args.args[0] == masked_hash
+    assert revision_store.get(masked_hash, "accurate") is not None
+    revision_store.clear()
+
 # TODO: Add more tests to cover different scenarios
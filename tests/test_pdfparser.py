@@ -1,7 +1,10 @@
 from unittest.mock import Mock, patch
 import pytest
 import fitz
+from app.services.caption import CaptionIndex
+from app.services.layout_templates import template_store
 from app.services.pdfparser import PdfParser
+from scripts.synthetic_orders import make_order
 
 
 @pytest.fixture
@@ -171,21 +174,22 @@ def test_get_gpt_events_invalid_key(mock_config, pdf_parser):
 
 
 def test_find_court_bbox(pdf_parser, pdf_page):
-    top_half = pdf_page.get_textpage(clip=pdf_page.rect)
-    court_bbox = pdf_parser._find_court_bbox(pdf_page, top_half)
+    caption = CaptionIndex(pdf_page)
+    court_bbox = pdf_parser._find_court_bbox(caption, pdf_page.rect)
     assert isinstance(court_bbox, fitz.Rect)
 
 
 def test_find_parties_y0(pdf_parser, pdf_page):
-    top_half = pdf_page.get_textpage(clip=pdf_page.rect)
-    court_bbox = pdf_parser._find_court_bbox(pdf_page, top_half)
-    parties_y0 = pdf_parser._find_parties_y0(pdf_page, court_bbox, top_half)
+    caption = CaptionIndex(pdf_page)
+    court_bbox = pdf_parser._find_court_bbox(caption, pdf_page.rect)
+    parties_y0 = pdf_parser._find_parties_y0(
+        caption, court_bbox, pdf_page.rect)
     assert isinstance(parties_y0, (int, float))
 
 
 def test_find_case_x0_values(pdf_parser, pdf_page):
-    case_page = pdf_page.get_textpage(clip=pdf_page.rect)
-    x0_values = pdf_parser._find_case_x0_values(pdf_page, case_page)
+    caption = CaptionIndex(pdf_page)
+    x0_values = pdf_parser._find_case_x0_values(caption, pdf_page.rect)
     assert isinstance(x0_values, list)
 
 
@@ -196,9 +200,6 @@ def test_extract_case_number(pdf_parser):
 
 
 def test_extract_case_and_parties(pdf_parser, pdf_page):
-    top_half = pdf_page.get_textpage(clip=pdf_page.rect)
-    court_bbox = pdf_parser._find_court_bbox(pdf_page, top_half)
-    parties_y0 = pdf_parser._find_parties_y0(pdf_page, court_bbox, top_half)
     case_num, court_details, plaintiff, defendant = pdf_parser.extract_parties_details(
         pdf_page
     )
@@ -206,3 +207,207 @@ def test_extract_case_and_parties(pdf_parser, pdf_page):
     assert isinstance(court_details, str)
     assert isinstance(plaintiff, str)
     assert isinstance(defendant, str)
+
+
+def test_extract_parties_details_uses_template(pdf_parser, pdf_page):
+    """
+    A second page with the same layout should skip the geometry search.
+    """
+    expected = pdf_parser.extract_parties_details(pdf_page)
+    with patch.object(PdfParser, "_find_caption_rects",
+                      side_effect=AssertionError("geometry search ran")):
+        result = pdf_parser.extract_parties_details(pdf_page)
+    assert result == expected
+
+
+def test_extract_parties_details_template_of_taller_caption(tmp_path):
+    """
+    A template recorded on one order of a court isn't used on an order of
+    the same court whose parties take more lines.
+    """
+    template_store.clear()
+    parsers = []
+    for seed, plaintiff_lines in ((0, 1), (4, 2), (8, 1)):
+        path = tmp_path / f"order-{seed}.pdf"
+        path.write_bytes(make_order(seed, sections=2, plaintiff_lines=plaintiff_lines)[0])
+        parsers.append(PdfParser(str(path)))
+    first, taller, same_height = [parser.file.load_page(0) for parser in parsers]
+    try:
+        parsers[0].extract_parties_details(first)
+        result = parsers[1].extract_parties_details(taller)
+        # Read the same as without a template
+        template_store.clear()
+        assert result == parsers[1].extract_parties_details(taller)
+        assert "Plaintiff" not in result[3]
+
+        # The template of the taller caption doesn't fit the next order, whose
+        # template then serves the other orders of its height
+        with patch.object(PdfParser, "_find_caption_rects", autospec=True,
+                          side_effect=PdfParser._find_caption_rects) as search:
+            parsers[2].extract_parties_details(same_height)
+            parsers[0].extract_parties_details(first)
+        search.assert_called_once()
+    finally:
+        for parser in parsers:
+            parser.close_pdf()
+        template_store.clear()
+
+
+def test_extract_meaningful_words_batch(pdf_parser):
+    """
+    The batched POS-only path should match running the full pipeline per text.
+    """
+    texts = [
+        "In The Superior Court Of The State Of Arizona In And For The County Of Pima",
+        "Renee Hatton, Individually And On Behalf Of The Statutory Beneficiaries",
+        "V. Grobet Usa; Posner's Art Store, Inc.",
+    ]
+    expected = [
+        " ".join(token.text for token in pdf_parser.nlp(text)
+                 if token.pos_ in {"NOUN", "ADJ", "VERB", "PROPN"})
+        for text in texts
+    ]
+    assert pdf_parser.extract_meaningful_words_batch(texts) == expected
+    assert pdf_parser.extract_meaningful_words(texts[0]) == expected[0]
+
+
+def test_get_events_rules_segmenter(pdf_parser):
+    """
+    get_events with the rule-based segmenter should find the same events.
+    """
+    pdf_parser.content = pdf_parser.clean_pdf(
+        """1. Initial disclosures: The parties’ initial disclosures shall be completed by July 1, 2022.\n\
+    2. Private mediation. The  parties  shall  participate  in  mediation  using  a  private mediator  agreed  to  by  the  parties.\
+    The  parties  shall  complete  mediation  by  December  30, 2022."""
+    )
+    expected = pdf_parser.get_events()
+    pdf_parser.segmenter = "rules"
+    result = pdf_parser.get_events()
+    assert result.keys() == expected.keys()
+    assert list(result["Private mediation"].values()) == list(
+        expected["Private mediation"].values())
+
+
+def test_unknown_segmenter():
+    with pytest.raises(Exception) as exc_info:
+        PdfParser("./Sample Files/Posner -  Scheduling Order.pdf",
+                  segmenter="unknown")
+    assert "Unknown sentence segmenter" in str(exc_info.value)
+
+
+@pytest.mark.parametrize("profile", ["balanced", "fast"])
+def test_extract_date_profiles(profile):
+    """
+    Every profile should find plain dates.
+    """
+    parser = PdfParser("./Sample Files/Posner -  Scheduling Order.pdf",
+                       profile=profile)
+    result = parser.extract_date("The hearing is scheduled for 2022-07-31.")
+    assert result[0][0] == "2022-07-31"
+
+
+@patch("app.services.pdfparser.config.EVENT_PARALLEL_MIN_CHARS", 0)
+def test_get_events_parallel(pdf_parser):
+    """
+    Processing the sections on worker processes should give the same events.
+    """
+    from app.services import event_workers
+    try:
+        stats, parallel_stats = {}, {}
+        assert pdf_parser.get_events(workers=2, stats=parallel_stats) == pdf_parser.get_events(
+            workers=0, stats=stats)
+        assert parallel_stats == stats
+    finally:
+        event_workers.shutdown_pools()
+
+
+def test_get_events_reuses_recorded_sentences(pdf_parser):
+    """
+    Paragraphs and sentences recorded for a previous version are not split
+    or analysed again.
+    """
+    pdf_parser.content = pdf_parser.clean_pdf(
+        "1. Initial disclosures: The parties shall complete initial disclosures by July 1, 2022.\n"
+        "2. Private mediation. The parties shall complete mediation by December 30, 2022."
+    )
+    record = {}
+    expected = pdf_parser.get_events(record=record)
+    assert record
+
+    with patch.object(pdf_parser, "_line_tasks") as line_tasks, \
+            patch.object(pdf_parser, "_sentences") as sentences:
+        assert pdf_parser.get_events(reuse=record) == expected
+        line_tasks.assert_not_called()
+        sentences.assert_not_called()
+
+
+def test_read_pdf_uses_page_text_cache():
+    """
+    Pages read before are not extracted again.
+    """
+    first = PdfParser("./Sample Files/Posner -  Scheduling Order.pdf")
+    get_text = fitz.Page.get_text
+
+    def blocks_only(page, option="text", **kwargs):
+        assert option == "blocks"
+        return get_text(page, option, **kwargs)
+
+    with patch.object(fitz.Page, "get_text", blocks_only):
+        second = PdfParser("./Sample Files/Posner -  Scheduling Order.pdf")
+    assert second.content == first.content
+
+
+def test_read_pdf_without_line_numbers(tmp_path):
+    """
+    Orders without a line-number gutter are read instead of failing.
+    """
+    document = fitz.open()
+    document.new_page(width=612, height=792).insert_text(
+        (72, 100), "1. Trial. Trial begins on July 1, 2022.")
+    document.save(tmp_path / "order.pdf")
+    parser = PdfParser(str(tmp_path / "order.pdf"))
+    assert "Trial begins on July 1, 2022." in parser.content
+
+
+@patch("app.services.pdfparser.config.LOW_MEMORY_CHUNK_CHARS", 80)
+def test_low_memory_sentences(pdf_parser):
+    """
+    Low-memory processing gives spaCy short chunks but finds the same dates.
+    """
+    def dates(events):
+        return {event: sorted(tasks.values()) for event, tasks in events.items()}
+
+    expected = pdf_parser.get_events()
+    pdf_parser.low_memory = True
+
+    with patch.object(pdf_parser, "split_sentences",
+                      wraps=pdf_parser.split_sentences) as split_sentences:
+        assert dates(pdf_parser.get_events()) == dates(expected)
+    longest = max(len(para) for para in pdf_parser.clean_pdf(pdf_parser.content).splitlines())
+    assert max(len(call.args[0]) for call in split_sentences.call_args_list) < longest / 2
+
+
+def test_low_memory_page_sentences(pdf_parser):
+    """
+    Sentences running over a page break are kept whole when splitting page by page.
+    """
+    sentences = pdf_parser.split_sentences(pdf_parser.clean_pdf(pdf_parser.content))
+    pdf_parser.low_memory = True
+    page_sentences = list(pdf_parser._page_sentences())
+    assert [" ".join(s.split()) for s in page_sentences] == [
+        " ".join(s.split()) for s in sentences]
+
+
+def test_get_events_prescreen(pdf_parser):
+    """
+    The prescreen skips sentences without dates and finds the same events.
+    """
+    pdf_parser.prescreen = False
+    expected = pdf_parser.get_events()
+    pdf_parser.prescreen = True
+    stats = {}
+
+    with patch.object(pdf_parser, "_line_tasks", wraps=pdf_parser._line_tasks) as line_tasks:
+        assert pdf_parser.get_events(stats=stats) == expected
+    assert 0 < stats["skipped"] < stats["sentences"]
+    assert line_tasks.call_count <= stats["sentences"] - stats["skipped"]
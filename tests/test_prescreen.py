@@ -0,0 +1,34 @@
+import pytest
+from dateparser.search import search_dates
+
+from app.services.prescreen import has_digit, may_contain_date
+
+
+@pytest.mark.parametrize("sentence", [
+    "The parties shall complete mediation by December 30, 2022.",
+    "Motions are due by Sept 1 2023",
+    "The hearing is scheduled for 2022-07-31.",
+    "Disclosures are due 7/1/2022.",
+    # Separators are replaced by spaces before the prescreen in get_events
+    "Disclosures are due 7 1 2022",
+    "Filed 20220701",
+])
+def test_may_contain_date(sentence):
+    assert may_contain_date(sentence)
+
+
+@pytest.mark.parametrize("sentence", [
+    "Counsel shall confer in good faith before any discovery dispute.",
+    "Each party is limited to 10 depositions of up to 7 hours.",
+    "Briefs are limited to 17 pages under LRCiv 7",
+    "A conference will be held on Monday at 9:00 am.",
+])
+def test_no_date(sentence):
+    assert not may_contain_date(sentence)
+    assert not search_dates(sentence, settings={
+        "STRICT_PARSING": True, "PARSERS": ["absolute-time"]})
+
+
+def test_has_digit():
+    assert has_digit("Due in 30 days.")
+    assert not has_digit("The parties shall confer.")
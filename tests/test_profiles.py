@@ -0,0 +1,40 @@
+import pytest
+import spacy
+from app.services.profiles import DATE_PATTERNS, PROFILES, get_profile
+
+
+def test_get_profile():
+    profile = get_profile("fast")
+    assert profile["name"] == "fast"
+    assert profile["date_entities"] == "ruler"
+
+
+def test_get_profile_default():
+    assert get_profile()["name"] in PROFILES
+
+
+def test_get_profile_unknown():
+    with pytest.raises(ValueError) as exc_info:
+        get_profile("turbo")
+    assert "Unknown parser profile" in str(exc_info.value)
+
+
+def test_accurate_profile_keeps_full_pipeline():
+    profile = get_profile("accurate")
+    assert profile["exclude"] == []
+    assert profile["date_disable"] == []
+    assert profile["task_disable"] == []
+    assert profile["line_dates"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("The Hearing Is Scheduled For 2022-07-31.", "2022-07-31"),
+    ("Disclosures Due By Monday, July 1, 2022.", "Monday, July 1, 2022"),
+    ("Mediation By The 1st Of Jan. 2023.", "1st Of Jan. 2023"),
+    ("Trial On 07/01/2022 At The Court.", "07/01/2022"),
+    ("Completed By July 1 2022", "July 1 2022"),
+])
+def test_date_patterns(text, expected):
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns(DATE_PATTERNS)
+    assert [ent.text for ent in nlp(text).ents if ent.label_ == "DATE"] == [expected]
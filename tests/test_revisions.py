@@ -0,0 +1,62 @@
+from app.services.events import EventRecord
+from app.services.revisions import Revision, RevisionStore, diff_events, page_fingerprint
+
+
+def test_changed_pages():
+    revision = Revision(["a", "b", "c"], {}, [])
+    assert revision.changed_pages(["a", "b", "c"]) == []
+    assert revision.changed_pages(["a", "x", "c"]) == [2]
+    assert revision.changed_pages(["a", "b", "c", "d"]) == [4]
+    assert revision.changed_pages(["a"]) == [2, 3]
+
+
+def test_page_fingerprint():
+    assert page_fingerprint("page one") == page_fingerprint("page one")
+    assert page_fingerprint("page one") != page_fingerprint("page two")
+
+
+def test_diff_events():
+    previous = [
+        EventRecord("Mediation", "2022-12-30", "Complete mediation."),
+        EventRecord("Disclosures", "2022-07-01", "Complete disclosures."),
+        EventRecord("Trial", "2023-03-01", "Trial starts."),
+    ]
+    events = [
+        EventRecord("Mediation", "2022-12-30", "Complete mediation."),
+        EventRecord("Disclosures", "2022-08-01", "Complete disclosures."),
+        EventRecord("Motions", "2023-01-15", "File dispositive motions."),
+    ]
+    changes = diff_events(previous, events)
+
+    assert changes["added"] == [events[2]]
+    assert changes["removed"] == [previous[2]]
+    assert changes["changed"] == [{
+        "id": previous[1].id,
+        "subject": "Disclosures",
+        "description": "Complete disclosures.",
+        "date": "2022-08-01",
+        "previousDate": "2022-07-01",
+    }]
+    # Matched events keep the id of the previous version
+    assert events[0].id == previous[0].id
+    assert events[1].id == previous[1].id
+
+
+def test_diff_events_duplicates():
+    previous = [EventRecord("Hearing", "2022-01-01", "Attend."),
+                EventRecord("Hearing", "2022-02-01", "Attend.")]
+    events = [EventRecord("Hearing", "2022-02-01", "Attend.")]
+    changes = diff_events(previous, events)
+    assert changes["changed"] == []
+    assert changes["removed"] == [previous[0]]
+    assert events[0].id == previous[1].id
+
+
+def test_revision_store_is_keyed_by_profile():
+    store = RevisionStore(maxsize=2)
+    revision = Revision(["a"], {}, [])
+    store.put("CV2022-1", "fast", revision)
+    assert store.get("CV2022-1", "fast") is revision
+    assert store.get("CV2022-1", "accurate") is None
+    store.clear()
+    assert store.get("CV2022-1", "fast") is None
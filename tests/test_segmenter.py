@@ -0,0 +1,45 @@
+from app.services.segmenter import split_sentences
+
+
+def test_split_simple_sentences():
+    text = "The parties shall confer. Plaintiff shall file a report! Is that clear?"
+    assert split_sentences(text) == [
+        "The parties shall confer.",
+        "Plaintiff shall file a report!",
+        "Is that clear?",
+    ]
+
+
+def test_numbered_paragraph_stays_with_sentence():
+    text = "12. Dispositive motions shall be filed by May 1, 2023. Responses follow."
+    assert split_sentences(text) == [
+        "12. Dispositive motions shall be filed by May 1, 2023.",
+        "Responses follow.",
+    ]
+
+
+def test_legal_abbreviations():
+    text = ("Case No. CV2021-0954 v. Windmill Dairy is governed by Fed. R. Civ. P. 16(b). "
+            "The Court so orders.")
+    assert split_sentences(text) == [
+        "Case No. CV2021-0954 v. Windmill Dairy is governed by Fed. R. Civ. P. 16(b).",
+        "The Court so orders.",
+    ]
+
+
+def test_times_and_dates():
+    text = ("The trial begins at 9:30 a.m. on Jan. 5, 2024 in Courtroom 5A. "
+            "Counsel shall appear.")
+    assert split_sentences(text) == [
+        "The trial begins at 9:30 a.m. on Jan. 5, 2024 in Courtroom 5A.",
+        "Counsel shall appear.",
+    ]
+
+
+def test_lowercase_continuation_is_not_split():
+    text = "Disclosures are due under Rule 26. and must be served."
+    assert split_sentences(text) == [text]
+
+
+def test_empty_text():
+    assert split_sentences("   ") == []
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_shared():
+    flights = SingleFlight()
+    calls = []
+
+    def parse(name):
+        calls.append(name)
+        time.sleep(0.2)
+        return {"name": name}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("key", parse, "order")))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["order"]
+    assert [result for result, _ in results] == [{"name": "order"}] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    # Nothing is kept once the call is done
+    assert flights.do("key", parse, "again") == ({"name": "again"}, False)
+
+
+def test_errors_are_shared():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("Invalid PDF")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("key", fail)
+        except ValueError as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    leader.join()
+    waiter.join()
+
+    assert len(errors) == 2
+    assert errors[0] is errors[1]
+
+
+def test_do_async():
+    flights = SingleFlight()
+    calls = []
+
+    async def parse(name):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return name
+
+    async def main():
+        return await asyncio.gather(*(flights.do_async("key", parse, "order")
+                                      for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert calls == ["order"]
+    assert [result for result, _ in results] == ["order"] * 3
+    assert [shared for _, shared in results] == [False, True, True]
+
+
+def test_do_async_leader_cancelled():
+    flights = SingleFlight()
+    calls = []
+
+    async def parse(name):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return name
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do_async("key", parse, "first"))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flights.do_async("key", parse, "second"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    # The waiter makes the call itself
+    assert asyncio.run(main()) == ("second", False)
+    assert calls == ["first", "second"]